@@ -0,0 +1,43 @@
+"""Posiciones dispersas y únicas en playlist_songs
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+Renumera las posiciones existentes (que podían repetirse tras borrar
+canciones) con un hueco de 1024 entre canciones y agrega el índice único
+(playlist_id, position) que usa playlist_order.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+POSITION_GAP = 1024
+
+
+def upgrade() -> None:
+    op.execute(sa.text(
+        "UPDATE playlist_songs SET position = ranked.rn * :gap "
+        "FROM ("
+        "  SELECT id, ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY position, id) AS rn"
+        "  FROM playlist_songs"
+        ") AS ranked "
+        "WHERE playlist_songs.id = ranked.id"
+    ).bindparams(gap=POSITION_GAP))
+    op.create_index(
+        'uq_playlist_songs_playlist_position',
+        'playlist_songs',
+        ['playlist_id', 'position'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_playlist_songs_playlist_position', table_name='playlist_songs')
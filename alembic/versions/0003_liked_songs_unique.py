@@ -0,0 +1,32 @@
+"""Índice único (user_id, song_id) en liked_songs
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+Elimina likes duplicados (se conserva el más antiguo) y agrega el índice
+único que usan like_song y la caché de favoritos.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.text(
+        "DELETE FROM liked_songs WHERE id NOT IN ("
+        "  SELECT MIN(id) FROM liked_songs GROUP BY user_id, song_id"
+        ")"
+    ))
+    op.create_index('uq_liked_songs_user_song', 'liked_songs', ['user_id', 'song_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_liked_songs_user_song', table_name='liked_songs')
@@ -0,0 +1,38 @@
+"""Tabla song_similarities para canciones similares
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+La llena scripts/build_similarities.py (ver recommendations.py).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'song_similarities',
+        sa.Column('song_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('similar_song_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['similar_song_id'], ['songs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('song_id', 'rank')
+    )
+    op.create_index('ix_song_similarities_similar_song_id', 'song_similarities', ['similar_song_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_song_similarities_similar_song_id', table_name='song_similarities')
+    op.drop_table('song_similarities')
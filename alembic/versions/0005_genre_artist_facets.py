@@ -0,0 +1,102 @@
+"""Tablas de facetas genres y artists, enlazadas desde songs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+Crea las tablas normalizadas, agrega songs.genre_id y songs.artist_id y las
+llena a partir del texto libre existente. song_count cuenta las canciones
+aprobadas; desde aquí lo mantiene facets.py de forma incremental.
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+EMPTY_GENRES = {"", "sin género", "sin genero", "none"}
+
+
+def _fold(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", _fold(value)).strip("-")
+
+
+def _create_facet_table(name: str) -> None:
+    op.create_table(
+        name,
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('slug', sa.String(), nullable=False),
+        sa.Column('song_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(f'ix_{name}_id', name, ['id'])
+    op.create_index(f'ix_{name}_slug', name, ['slug'], unique=True)
+
+
+def _backfill(conn, table: str, column: str, fk_column: str, skip_empty_genres: bool) -> None:
+    facets = sa.table(table, sa.column('id'), sa.column('name'), sa.column('slug'))
+    songs = sa.table('songs', sa.column(column), sa.column(fk_column))
+
+    ids_by_slug = {}
+    values = conn.execute(sa.select(songs.c[column]).where(songs.c[column].isnot(None)).distinct()).scalars()
+    for raw in values:
+        name = " ".join(raw.split())
+        slug = _slug(name)
+        if not slug or (skip_empty_genres and _fold(name) in EMPTY_GENRES):
+            continue
+        if slug not in ids_by_slug:
+            ids_by_slug[slug] = conn.execute(
+                sa.insert(facets).values(name=name, slug=slug).returning(facets.c.id)
+            ).scalar()
+        conn.execute(
+            sa.update(songs).where(songs.c[column] == raw).values({fk_column: ids_by_slug[slug]})
+        )
+
+    conn.execute(sa.text(
+        f"UPDATE {table} SET song_count = ("
+        f"  SELECT COUNT(*) FROM songs WHERE songs.{fk_column} = {table}.id AND songs.is_approved"
+        f")"
+    ))
+
+
+def upgrade() -> None:
+    _create_facet_table('genres')
+    _create_facet_table('artists')
+
+    with op.batch_alter_table('songs') as batch:
+        batch.add_column(sa.Column('genre_id', sa.Integer(), nullable=True))
+        batch.add_column(sa.Column('artist_id', sa.Integer(), nullable=True))
+        batch.create_foreign_key('fk_songs_genre_id', 'genres', ['genre_id'], ['id'])
+        batch.create_foreign_key('fk_songs_artist_id', 'artists', ['artist_id'], ['id'])
+        batch.create_index('ix_songs_genre_id', ['genre_id'])
+        batch.create_index('ix_songs_artist_id', ['artist_id'])
+
+    conn = op.get_bind()
+    _backfill(conn, 'genres', 'genre', 'genre_id', skip_empty_genres=True)
+    _backfill(conn, 'artists', 'artist', 'artist_id', skip_empty_genres=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('songs') as batch:
+        batch.drop_index('ix_songs_artist_id')
+        batch.drop_index('ix_songs_genre_id')
+        batch.drop_constraint('fk_songs_artist_id', type_='foreignkey')
+        batch.drop_constraint('fk_songs_genre_id', type_='foreignkey')
+        batch.drop_column('artist_id')
+        batch.drop_column('genre_id')
+    op.drop_table('artists')
+    op.drop_table('genres')
@@ -0,0 +1,66 @@
+"""ON DELETE CASCADE en las claves foráneas de álbumes, canciones, playlists y favoritos
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+Borrar un usuario, un álbum, una canción o una playlist pasa a ser una sola
+sentencia: la base elimina las filas hijas. Los modelos usan
+passive_deletes=True para que el ORM no las cargue antes de borrar. Se indexan
+las columnas referenciantes, que PostgreSQL recorre en cada borrado en
+cascada.
+
+Las restricciones de 0001 no tienen nombre: en PostgreSQL se llaman
+<tabla>_<columna>_fkey y en SQLite la misma convención permite encontrarlas al
+recrear la tabla (modo batch).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+# tabla -> [(columna, tabla referenciada)]
+CASCADES = {
+    'albums': [('creator_id', 'users')],
+    'songs': [('album_id', 'albums'), ('creator_id', 'users')],
+    'playlists': [('owner_id', 'users')],
+    'playlist_songs': [('playlist_id', 'playlists'), ('song_id', 'songs')],
+    'liked_songs': [('user_id', 'users'), ('song_id', 'songs')],
+}
+# Columnas sin índice propio (playlist_id y user_id ya encabezan un índice único)
+INDEXES = [
+    ('albums', 'creator_id'),
+    ('songs', 'album_id'),
+    ('songs', 'creator_id'),
+    ('playlists', 'owner_id'),
+    ('playlist_songs', 'song_id'),
+    ('liked_songs', 'song_id'),
+]
+
+
+def _replace_foreign_keys(ondelete: Union[str, None]) -> None:
+    for table, columns in CASCADES.items():
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+            for column, referred in columns:
+                name = f'{table}_{column}_fkey'
+                batch.drop_constraint(name, type_='foreignkey')
+                batch.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    _replace_foreign_keys('CASCADE')
+    for table, column in INDEXES:
+        op.create_index(f'ix_{table}_{column}', table, [column])
+
+
+def downgrade() -> None:
+    for table, column in reversed(INDEXES):
+        op.drop_index(f'ix_{table}_{column}', table_name=table)
+    _replace_foreign_keys(None)
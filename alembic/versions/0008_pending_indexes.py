@@ -0,0 +1,36 @@
+"""Índices parciales con las canciones y los álbumes pendientes de aprobación
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+La cola de moderación (moderation.py) recorre los pendientes por id. El
+índice solo contiene esas filas, así que sigue siendo pequeño aunque el
+catálogo aprobado crezca.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('songs', 'albums')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.create_index(
+            f'ix_{table}_pending', table, ['id'],
+            postgresql_where=sa.text('is_approved = false'),
+            sqlite_where=sa.text('is_approved = 0'),
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_pending', table_name=table)
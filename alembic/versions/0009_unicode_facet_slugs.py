@@ -0,0 +1,98 @@
+"""Slugs de facetas en cualquier alfabeto y enlace de las canciones que quedaron sin faceta
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00
+
+Hasta aquí el slug solo conservaba [a-z0-9]: "周杰伦" o "Ёлка" daban un slug
+vacío (la canción se quedaba sin faceta de género o artista) y "J-ポップ" daba
+"j", el mismo que el artista "J". Se recalcula el slug de cada faceta con la
+regla de facets.facet_slug y se vuelve a enlazar cada canción con la faceta
+de su texto, creándola si hace falta; después se recuentan las canciones y se
+borran las facetas que ya no usa ninguna.
+
+Es una migración de datos: el downgrade no restaura los slugs anteriores.
+"""
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+EMPTY_GENRES = {"", "sin género", "sin genero", "none"}
+ACCENTS = range(0x0300, 0x0370)
+
+
+def _fold(value: str) -> str:
+    if not value.isascii():
+        decomposed = unicodedata.normalize("NFKD", value)
+        value = unicodedata.normalize("NFC", "".join(char for char in decomposed if ord(char) not in ACCENTS))
+    return " ".join(value.casefold().split())
+
+
+def _slug(value: str) -> str:
+    words = "".join(
+        char if char.isalnum() or unicodedata.category(char).startswith("M") else " "
+        for char in _fold(value)
+    )
+    return "-".join(words.split())
+
+
+def _reslug(conn, table: str, column: str, fk_column: str, skip_empty_genres: bool) -> None:
+    facets = sa.table(table, sa.column('id'), sa.column('name'), sa.column('slug'), sa.column('song_count'))
+    songs = sa.table('songs', sa.column(column), sa.column(fk_column), sa.column('is_approved'))
+
+    # Slugs nuevos de las facetas existentes; si dos coinciden se queda la de menor id.
+    # Las descartadas (slug vacío o repetido) se quedan sin canciones y se borran al final
+    ids_by_slug = {}
+    for facet_id, name, slug in conn.execute(sa.select(facets.c.id, facets.c.name, facets.c.slug).order_by(facets.c.id)):
+        new_slug = _slug(name)
+        if new_slug and new_slug not in ids_by_slug:
+            ids_by_slug[new_slug] = facet_id
+        if new_slug != slug or ids_by_slug.get(new_slug) != facet_id:
+            conn.execute(sa.update(facets).where(facets.c.id == facet_id).values(slug=f"~{facet_id}"))
+    # Segunda pasada: el slug es único y un nombre puede tomar el que antes tenía otra faceta
+    for new_slug, facet_id in ids_by_slug.items():
+        conn.execute(sa.update(facets).where(facets.c.id == facet_id, facets.c.slug != new_slug).values(slug=new_slug))
+
+    values = conn.execute(sa.select(songs.c[column]).where(songs.c[column].isnot(None)).distinct()).scalars()
+    for raw in values:
+        name = " ".join(raw.split())
+        slug = _slug(name)
+        if not slug or (skip_empty_genres and _fold(name) in EMPTY_GENRES):
+            target = None
+        elif slug in ids_by_slug:
+            target = ids_by_slug[slug]
+        else:
+            target = ids_by_slug[slug] = conn.execute(
+                sa.insert(facets).values(name=name, slug=slug, song_count=0).returning(facets.c.id)
+            ).scalar()
+        conn.execute(
+            sa.update(songs)
+            .where(songs.c[column] == raw, sa.or_(songs.c[fk_column].is_(None), songs.c[fk_column] != target)
+                   if target is not None else songs.c[fk_column].isnot(None))
+            .values({fk_column: target})
+        )
+
+    conn.execute(sa.text(f"DELETE FROM {table} WHERE id NOT IN (SELECT {fk_column} FROM songs WHERE {fk_column} IS NOT NULL)"))
+    conn.execute(sa.text(
+        f"UPDATE {table} SET song_count = ("
+        f"  SELECT COUNT(*) FROM songs WHERE songs.{fk_column} = {table}.id AND songs.is_approved"
+        f")"
+    ))
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    _reslug(conn, 'genres', 'genre', 'genre_id', skip_empty_genres=True)
+    _reslug(conn, 'artists', 'artist', 'artist_id', skip_empty_genres=False)
+
+
+def downgrade() -> None:
+    pass
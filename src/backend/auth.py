@@ -35,4 +35,24 @@ def verify_token(token: str) -> Optional[TokenData]:
             return None
         return TokenData(email=email)
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+
+# Tokens de subida directa (ver routes/upload.py). No llevan "sub", así no
+# sirven como token de acceso, y "typ" evita usar uno de acceso como de subida
+UPLOAD_TOKEN_TYPE = "upload"
+
+
+def create_upload_token(data: dict, expires_delta: timedelta) -> str:
+    to_encode = {**data, "typ": UPLOAD_TOKEN_TYPE, "exp": datetime.utcnow() + expires_delta}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def verify_upload_token(token: str) -> Optional[dict]:
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("typ") != UPLOAD_TOKEN_TYPE or "sub" in payload:
+        return None
+    return payload
@@ -0,0 +1,95 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Los benchmarks se ejecutan como scripts desde src/backend, por ejemplo:
+    python benchmarks/bench_serialization.py --rows 1000
+"""
+import os
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Valores por defecto para poder importar config.py sin un archivo .env
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DB_NAME", "bench")
+os.environ.setdefault("DB_USER", "bench")
+os.environ.setdefault("DB_PASSWORD", "bench")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base, enable_sqlite_foreign_keys
+from models import User, UserRole, Song
+
+
+def memory_engine(url: str = "sqlite://"):
+    """
+    Engine SQLite con el esquema completo. Por defecto en memoria; con una URL
+    de archivo permite sembrar una vez y medir en otro proceso
+    """
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    enable_sqlite_foreign_keys(engine)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def memory_session(url: str = "sqlite://"):
+    return sessionmaker(autocommit=False, autoflush=False, bind=memory_engine(url))()
+
+
+def seed_creator(db) -> User:
+    creator = User(
+        email="creator@bench.local",
+        username="bench_creator",
+        hashed_password="x",
+        role=UserRole.CREATOR,
+    )
+    db.add(creator)
+    db.commit()
+    return creator
+
+
+def seed_songs(db, count: int, creator: User | None = None) -> list[int]:
+    """Inserta `count` canciones aprobadas y devuelve sus ids"""
+    creator = creator or seed_creator(db)
+    base_date = datetime(2024, 1, 1)
+    db.bulk_insert_mappings(Song, [
+        {
+            "title": f"Canción {i}",
+            "artist": f"Artista {i % 97}",
+            "duration": 120 + i % 240,
+            "file_path": f"/uploads/songs/{i}.mp3",
+            "cover_url": f"/uploads/covers/songs/{i}.png" if i % 3 else None,
+            "genre": ("rock", "pop", "jazz", None)[i % 4],
+            "creator_id": creator.id,
+            "is_approved": True,
+            "play_count": (count - i) * 7,
+            "created_at": base_date + timedelta(minutes=i),
+        }
+        for i in range(count)
+    ])
+    db.commit()
+    return [row[0] for row in db.query(Song.id).order_by(Song.id).all()]
+
+
+def peak_rss_mb() -> float:
+    """RSS máximo del proceso en MB (ru_maxrss está en KB en Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(func, repeat: int) -> float:
+    """Ejecuta `func` `repeat` veces y devuelve los segundos por ejecución"""
+    func()  # calentamiento
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
@@ -0,0 +1,111 @@
+"""
+Benchmark de exportación e importación masiva del catálogo (catalog_io.py).
+
+Genera un NDJSON sintético con el número de filas pedido (sobre todo
+liked_songs y playlist_songs, como en producción), lo importa en una base
+vacía y lo vuelve a exportar, midiendo filas por segundo de cada fase y el RSS
+máximo. Con --url se usa esa base (p. ej. PostgreSQL, para medir COPY; debe
+estar vacía y migrada); si no, un SQLite temporal.
+
+Uso:
+    python benchmarks/bench_catalog_io.py --rows 1000000
+    python benchmarks/bench_catalog_io.py --rows 10000000 --url postgresql://...
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _common import peak_rss_mb
+
+from sqlalchemy import create_engine
+
+from catalog_io import export_lines, import_lines
+from database import Base
+from serialization import dumps
+
+# Proporción de filas por tabla
+SHARES = {
+    "users": 0.01, "genres": 0.0, "artists": 0.0, "albums": 0.005, "songs": 0.08,
+    "playlists": 0.005, "playlist_songs": 0.30, "liked_songs": 0.60,
+}
+
+
+def write_synthetic(path: str, total: int, seed: int) -> int:
+    """Escribe el NDJSON sintético; devuelve las filas escritas"""
+    rng = random.Random(seed)
+    sizes = {table: max(int(total * share), 1) for table, share in SHARES.items()}
+    sizes["genres"], sizes["artists"] = 40, max(sizes["songs"] // 20, 1)
+    stamp = "2024-01-01T00:00:00+00:00"
+    written = 0
+
+    def generate(table, index):
+        if table == "users":
+            return [index, f"user{index}@example.com", f"user{index}", "x", "USER", True, None, stamp, None]
+        if table in ("genres", "artists"):
+            return [index, f"{table} {index}", f"{table}-{index}", 0]
+        if table == "albums":
+            return [index, f"Album {index}", None, None, None, rng.randint(1, sizes["users"]), True, stamp, None]
+        if table == "songs":
+            return [index, f"Song {index}", f"Artist {index % sizes['artists']}", 200, f"/uploads/songs/{index}.mp3",
+                    None, None, rng.randint(1, sizes["genres"]), rng.randint(1, sizes["artists"]),
+                    rng.randint(1, sizes["albums"]), rng.randint(1, sizes["users"]), True,
+                    int(rng.paretovariate(1.2)), stamp, None]
+        if table == "playlists":
+            return [index, f"Playlist {index}", None, None, True, rng.randint(1, sizes["users"]), stamp, None]
+        if table == "playlist_songs":
+            # Posiciones únicas por playlist: la fila i va a la playlist i % n en la posición i
+            return [index, index % sizes["playlists"] + 1, rng.randint(1, sizes["songs"]), index * 1024, stamp]
+        # liked_songs: pares (usuario, canción) únicos recorriendo las canciones por usuario
+        per_user = sizes["liked_songs"] // sizes["users"] + 1
+        return [index, (index - 1) // per_user + 1, (index - 1) % per_user % sizes["songs"] + 1, stamp]
+
+    with open(path, "wb") as output:
+        for table in SHARES:
+            columns = [column.name for column in Base.metadata.tables[table].columns]
+            output.write(dumps({"table": table, "columns": columns}) + b"\n")
+            chunk = []
+            for index in range(1, sizes[table] + 1):
+                chunk.append(dumps(generate(table, index)))
+                if len(chunk) == 10_000:
+                    output.write(b"\n".join(chunk) + b"\n")
+                    chunk = []
+            if chunk:
+                output.write(b"\n".join(chunk) + b"\n")
+            written += sizes[table]
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--url", help="base de datos destino (vacía); por defecto SQLite temporal")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.ndjson")
+        rows = write_synthetic(path, args.rows, args.seed)
+        print(f"NDJSON sintético: {rows:,} filas, {os.path.getsize(path) / 2**20:.0f} MB")
+
+        url = args.url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_engine(url)
+        if args.url is None:
+            Base.metadata.create_all(engine)
+
+        with open(path, "rb") as source:
+            summary = import_lines(engine, source)
+        print(f"importación ({engine.dialect.name}): {summary['seconds']} s  {summary['rows_per_sec']:,} filas/s")
+
+        started = time.perf_counter()
+        exported = 0
+        for chunk in export_lines(engine):
+            exported += chunk.count(b"\n")
+        seconds = time.perf_counter() - started
+        print(f"exportación: {seconds:.1f} s  {round(exported / seconds):,} líneas/s")
+        print(f"RSS máximo {peak_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
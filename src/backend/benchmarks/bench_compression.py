@@ -0,0 +1,60 @@
+"""
+Benchmark de compresión de respuestas JSON del catálogo.
+
+Comprime el listado de canciones (el mismo cuerpo que devuelve GET /songs)
+con gzip y brotli a varios niveles y muestra el tiempo por respuesta y el
+tamaño resultante, para elegir COMPRESSION_GZIP_LEVEL y
+COMPRESSION_BROTLI_QUALITY. La última fila es el coste de un acierto en la
+caché de cuerpos comprimidos (hash del cuerpo y búsqueda).
+
+Uso:
+    python benchmarks/bench_compression.py --rows 200 --repeat 200
+"""
+import argparse
+
+from _common import measure, memory_session, seed_songs
+
+from compression import CompressedBodyCache, brotli, compress
+from models import Song
+from serialization import SONG_RESPONSE_COLUMNS, song_list_response
+
+GZIP_LEVELS = (1, 5, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 11)
+
+
+def catalog_body(rows: int) -> bytes:
+    db = memory_session()
+    seed_songs(db, rows)
+    songs = db.query(*SONG_RESPONSE_COLUMNS).order_by(Song.play_count.desc()).limit(rows).all()
+    return song_list_response(songs).body
+
+
+def report(label: str, seconds: float, size: int, original: int):
+    print(f"{label:>14}: {seconds * 1000:>8.3f} ms/respuesta  {size:>9,} bytes  ({size / original:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    body = catalog_body(args.rows)
+    print(f"Cuerpo sin comprimir: {len(body):,} bytes ({args.rows} canciones)")
+    candidates = [("gzip", level) for level in GZIP_LEVELS]
+    if brotli is not None:
+        candidates += [("br", quality) for quality in BROTLI_QUALITIES]
+    else:
+        print("brotli no está instalado: solo gzip")
+    for encoding, level in candidates:
+        run = lambda: compress(body, encoding, level, level)
+        report(f"{encoding} {level}", measure(run, args.repeat), len(run()), len(body))
+
+    cache = CompressedBodyCache(64 * 1024 * 1024)
+    compressed = compress(body, "gzip", 5, 4)
+    cache.put(cache.key("gzip", body), compressed)
+    report("caché", measure(lambda: cache.get(cache.key("gzip", body)), args.repeat), len(compressed), len(body))
+
+
+if __name__ == "__main__":
+    main()
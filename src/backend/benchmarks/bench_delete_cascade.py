@@ -0,0 +1,103 @@
+"""
+Benchmark del borrado de una canción popular.
+
+Compara la cascada del ORM (cargar cada favorito y cada entrada de playlist
+como objeto y borrarlos por clave primaria, lo que hacía
+cascade="all, delete-orphan" sin passive_deletes) con un único DELETE que la
+base propaga con ON DELETE CASCADE. Cada modo corre en un subproceso propio
+sobre una base recién sembrada, así el RSS máximo refleja solo el borrado.
+
+Uso:
+    python benchmarks/bench_delete_cascade.py --likes 50000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import memory_session, peak_rss_mb, seed_songs
+
+from sqlalchemy import delete, insert
+
+from models import LikedSong, Playlist, PlaylistSong, Song, User, UserRole
+
+MODES = ("orm", "cascade")
+
+
+def seed(db, likes: int) -> int:
+    """Una canción con `likes` favoritos y otras tantas entradas de playlist"""
+    song_id = seed_songs(db, 1)[0]
+    db.execute(insert(User), [
+        {"email": f"fan{i}@bench.local", "username": f"fan{i}", "hashed_password": "x", "role": UserRole.USER}
+        for i in range(likes)
+    ])
+    user_ids = [row.id for row in db.query(User.id).filter(User.role == UserRole.USER)]
+    db.execute(insert(Playlist), [{"name": f"Lista {user_id}", "owner_id": user_id} for user_id in user_ids])
+    playlist_ids = [row.id for row in db.query(Playlist.id)]
+    db.execute(insert(LikedSong), [{"user_id": user_id, "song_id": song_id} for user_id in user_ids])
+    db.execute(insert(PlaylistSong), [
+        {"playlist_id": playlist_id, "song_id": song_id, "position": 1024} for playlist_id in playlist_ids
+    ])
+    db.commit()
+    return song_id
+
+
+def delete_orm(db, song_id: int) -> None:
+    song = db.get(Song, song_id)
+    for child in list(song.playlist_songs) + list(song.liked_by):
+        db.delete(child)
+    db.delete(song)
+    db.commit()
+
+
+def delete_cascade(db, song_id: int) -> None:
+    db.execute(delete(Song).where(Song.id == song_id))
+    db.commit()
+
+
+def run_mode(mode: str, likes: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = memory_session(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        song_id = seed(db, likes)
+        db.expunge_all()
+        baseline_rss = peak_rss_mb()
+        started = time.perf_counter()
+        (delete_orm if mode == "orm" else delete_cascade)(db, song_id)
+        seconds = time.perf_counter() - started
+        remaining = db.query(LikedSong).count() + db.query(PlaylistSong).count()
+    return {
+        "mode": mode,
+        "ms": round(seconds * 1000, 1),
+        "rss_growth_mb": round(peak_rss_mb() - baseline_rss, 1),
+        "remaining": remaining,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--likes", type=int, default=50000)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.likes)))
+        return
+
+    print(f"Canción con {args.likes:,} favoritos y {args.likes:,} entradas de playlist")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--likes", str(args.likes)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output)
+        print(
+            f"{result['mode']:>8}: {result['ms']:>9} ms  +{result['rss_growth_mb']} MB RSS  "
+            f"(filas hijas restantes: {result['remaining']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
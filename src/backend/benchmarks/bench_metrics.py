@@ -0,0 +1,97 @@
+"""
+Benchmark del costo de MetricsMiddleware (metrics.py).
+
+Llama a las apps ASGI directamente, sin red ni servidor, con y sin el
+middleware, y reporta el costo añadido por petición:
+- una app ASGI mínima que responde 200 al instante (el peor caso relativo),
+- la app de FastAPI con una ruta async sin base de datos.
+Después de calentar (las series ya existen) mide con tracemalloc cuánto crece
+la memoria retenida en otras tantas peticiones; debe quedarse en ~0.
+
+Uso:
+    python benchmarks/bench_metrics.py --requests 50000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import _common  # noqa: F401  (entorno y sys.path)
+
+from fastapi import FastAPI
+
+from metrics import Metrics, MetricsMiddleware
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def fastapi_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/songs/{song_id}")
+    async def song(song_id: int):
+        return {"id": song_id}
+
+    return app
+
+
+def make_scope(path: str) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"bench")], "server": ("bench", 80),
+        "client": ("127.0.0.1", 1234),
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def drive(app, path: str, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(make_scope(path), receive, send)
+    return time.perf_counter() - started
+
+
+def run(name: str, app, path: str, requests: int) -> None:
+    loop = asyncio.new_event_loop()
+    wrapped = MetricsMiddleware(app, Metrics())
+    results = {}
+    for label, target in (("sin métricas", app), ("con métricas", wrapped)):
+        loop.run_until_complete(drive(target, path, min(requests, 2000)))  # calentamiento
+        results[label] = min(loop.run_until_complete(drive(target, path, requests)) for _ in range(3))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    loop.run_until_complete(drive(wrapped, path, requests))
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    loop.close()
+
+    base, with_metrics = (results[label] / requests * 1e6 for label in ("sin métricas", "con métricas"))
+    print(
+        f"{name:<12} sin métricas {base:7.2f} µs  con métricas {with_metrics:7.2f} µs  "
+        f"costo +{with_metrics - base:5.2f} µs/petición  memoria retenida {retained / 1024:.1f} KB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=50_000)
+    args = parser.parse_args()
+
+    run("asgi mínima", bare_app, "/health", args.requests)
+    run("fastapi", fastapi_app(), "/songs/42", args.requests // 5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark del orden de playlists sobre una playlist grande.
+
+Mide ms por operación y filas escritas por operación para agregar al final,
+insertar en un índice, mover y quitar canciones con playlist_order.py, y lo
+compara con renumerar posiciones densas (el esquema anterior) al insertar.
+
+Uso:
+    python benchmarks/bench_playlist_ordering.py --tracks 10000 --ops 500
+"""
+import argparse
+import random
+import time
+
+from _common import memory_session, seed_songs
+
+from sqlalchemy import event, update
+
+from models import Playlist, PlaylistSong
+from playlist_order import POSITION_GAP, insert_song, lock_playlist, move_songs
+
+
+class WriteCounter:
+    """Suma las filas afectadas por INSERT/UPDATE/DELETE"""
+
+    def __init__(self, engine):
+        self.rows = 0
+        event.listen(engine, "after_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(" ", 1)[0]
+        if verb == "INSERT":
+            # Con RETURNING el rowcount de SQLite no es fiable
+            self.rows += len(parameters) if executemany else 1
+        elif verb in ("UPDATE", "DELETE"):
+            self.rows += max(cursor.rowcount, 0)
+
+
+def build_playlist(tracks: int):
+    db = memory_session()
+    song_ids = seed_songs(db, tracks + 1000)
+    playlist = Playlist(name="bench", owner_id=1)
+    db.add(playlist)
+    db.commit()
+    db.bulk_insert_mappings(PlaylistSong, [
+        {"playlist_id": playlist.id, "song_id": song_id, "position": (i + 1) * POSITION_GAP}
+        for i, song_id in enumerate(song_ids[:tracks])
+    ])
+    db.commit()
+    return db, playlist.id, song_ids[:tracks], song_ids[tracks:]
+
+
+def run(name: str, db, counter: WriteCounter, ops: int, operation):
+    counter.rows = 0
+    start = time.perf_counter()
+    for i in range(ops):
+        operation(i)
+        db.commit()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed / ops * 1000:>8.3f} ms/op  {counter.rows / ops:>10.1f} filas/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tracks", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    db, playlist_id, in_playlist, spare = build_playlist(args.tracks)
+    counter = WriteCounter(db.get_bind())
+    print(f"Playlist de {args.tracks:,} canciones, {args.ops} operaciones por caso\n")
+
+    def append(i):
+        lock_playlist(db, playlist_id)
+        insert_song(db, playlist_id, spare.pop(), None)
+
+    def insert_middle(i):
+        lock_playlist(db, playlist_id)
+        insert_song(db, playlist_id, spare.pop(), args.tracks // 2)
+
+    def move(i):
+        lock_playlist(db, playlist_id)
+        move_songs(db, playlist_id, [(rnd.choice(in_playlist), rnd.randrange(args.tracks))])
+
+    def remove(i):
+        song_id = in_playlist.pop(rnd.randrange(len(in_playlist)))
+        db.query(PlaylistSong).filter(
+            PlaylistSong.playlist_id == playlist_id, PlaylistSong.song_id == song_id
+        ).delete()
+
+    ops = min(args.ops, len(spare) // 3)
+    run("agregar al final", db, counter, ops, append)
+    run("insertar en el medio", db, counter, ops, insert_middle)
+    run("mover (índice aleatorio)", db, counter, args.ops, move)
+    run("quitar", db, counter, args.ops, remove)
+
+    # Esquema anterior: posiciones densas, insertar desplaza las siguientes
+    db.query(PlaylistSong).delete()
+    db.bulk_insert_mappings(PlaylistSong, [
+        {"playlist_id": playlist_id, "song_id": song_id, "position": i + 1}
+        for i, song_id in enumerate(in_playlist)
+    ])
+    db.commit()
+    middle = len(in_playlist) // 2
+
+    def dense_insert(i):
+        # Dos pasadas (por negativos) para no chocar con el índice único
+        db.execute(
+            update(PlaylistSong)
+            .where(PlaylistSong.playlist_id == playlist_id, PlaylistSong.position >= middle)
+            .values(position=-PlaylistSong.position - 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(PlaylistSong)
+            .where(PlaylistSong.playlist_id == playlist_id, PlaylistSong.position < 0)
+            .values(position=-PlaylistSong.position)
+            .execution_options(synchronize_session=False)
+        )
+        db.add(PlaylistSong(playlist_id=playlist_id, song_id=spare.pop(), position=middle))
+
+    run("densas: insertar en el medio", db, counter, min(ops, 50), dense_insert)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark del índice de sugerencias (search_index.py).
+
+Construye el índice con títulos sintéticos (palabras de un vocabulario con
+frecuencias tipo Zipf, acentos incluidos y play_count también tipo Zipf) y mide
+el tiempo de construcción, la memoria que ocupa el índice según tracemalloc y
+la latencia de búsqueda para prefijos de 1 a 8 caracteres tomados de títulos
+reales del índice. No toca la base de datos.
+
+Uso:
+    python benchmarks/bench_search_index.py --titles 100000,1000000
+"""
+import argparse
+import itertools
+import json
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import _common  # noqa: F401  (entorno y sys.path)
+
+from search_index import ALBUM, ARTIST, SONG, _Snapshot, document_keys, suggest_index
+
+SYLLABLES = ["la", "mo", "re", "sol", "can", "ción", "co", "ra", "zón", "noche", "luz", "mar",
+             "ti", "em", "po", "bo", "hé", "mia", "rock", "love", "night", "fire", "dan", "ce"]
+
+
+def vocabulary(rng: random.Random, size: int = 20_000) -> list:
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(size)]
+
+
+def synthetic_documents(titles: int, seed: int):
+    """Canciones más un artista cada 10 canciones y un álbum cada 12"""
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+    def label():
+        return " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(1, 5))).capitalize()
+
+    def plays():
+        return int(rng.paretovariate(1.2)) - 1
+
+    for doc_id in range(1, titles + 1):
+        yield SONG, doc_id, label(), plays()
+    for doc_id in range(1, titles // 10 + 1):
+        yield ARTIST, doc_id, label(), plays() * 10
+    for doc_id in range(1, titles // 12 + 1):
+        yield ALBUM, doc_id, label(), plays() * 10
+
+
+def run_size(titles: int, queries: int, seed: int) -> dict:
+    documents = list(synthetic_documents(titles, seed))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    snapshot = _Snapshot(iter(documents))
+    build_seconds = time.perf_counter() - start
+    index_bytes, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    suggest_index._snapshot = snapshot
+    rng = random.Random(seed + 1)
+    latencies = {}
+    for length in (1, 2, 3, 4, 6, 8):
+        samples = []
+        for _ in range(queries):
+            keys = document_keys(rng.choice(documents)[2])
+            prefix = rng.choice(keys)[:length]
+            began = time.perf_counter()
+            suggest_index.suggest(prefix, 10)
+            samples.append(time.perf_counter() - began)
+        samples.sort()
+        latencies[length] = {
+            "p50_us": round(samples[len(samples) // 2] * 1e6, 1),
+            "p99_us": round(samples[int(len(samples) * 0.99)] * 1e6, 1),
+        }
+
+    return {
+        "titles": titles,
+        "documents": len(snapshot),
+        "keys": len(snapshot.key_docs),
+        "build_seconds": round(build_seconds, 2),
+        "index_mb": round(index_bytes / 2**20, 1),
+        "build_peak_mb": round(build_peak / 2**20, 1),
+        "latency": latencies,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--titles", default="100000,1000000")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_size(args.single, args.queries, args.seed)))
+        return
+
+    for titles in (int(value) for value in args.titles.split(",")):
+        output = subprocess.run(
+            [sys.executable, __file__, "--single", str(titles),
+             "--queries", str(args.queries), "--seed", str(args.seed)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output)
+        print(
+            f"{result['titles']:>10,} títulos  {result['keys']:>10,} claves  "
+            f"construcción {result['build_seconds']} s  índice {result['index_mb']} MB  "
+            f"(pico {result['build_peak_mb']} MB)"
+        )
+        for length, latency in result["latency"].items():
+            print(f"    prefijo de {length} caracteres: p50 {latency['p50_us']} µs  p99 {latency['p99_us']} µs")
+
+
+if __name__ == "__main__":
+    main()
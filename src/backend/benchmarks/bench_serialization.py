@@ -0,0 +1,109 @@
+"""
+Benchmark de serialización de listados de canciones.
+
+Compara la ruta ORM (objetos Song + validación con SongResponse + JSONResponse,
+igual que hace FastAPI con `response_model`) con la ruta rápida de
+serialization.py (tuplas de columnas + orjson). La base SQLite se siembra una
+vez en un archivo temporal y cada modo corre en un subproceso propio, así el
+RSS máximo de cada uno refleja solo la consulta y la serialización.
+
+Uso:
+    python benchmarks/bench_serialization.py --rows 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from _common import measure, memory_session, peak_rss_mb, seed_songs
+
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models import Song
+from schemas import SongResponse
+from serialization import SONG_RESPONSE_COLUMNS, song_list_response
+
+MODES = ("orm", "fast")
+
+
+def orm_body(db, rows: int, loop) -> bytes:
+    songs = db.query(Song).order_by(Song.play_count.desc()).limit(rows).all()
+    field = create_response_field(name="response", type_=List[SongResponse])
+    content = loop.run_until_complete(
+        serialize_response(field=field, response_content=songs)
+    )
+    db.expunge_all()
+    return JSONResponse(content).body
+
+
+def fast_body(db, rows: int) -> bytes:
+    songs = db.query(*SONG_RESPONSE_COLUMNS).order_by(Song.play_count.desc()).limit(rows).all()
+    return song_list_response(songs).body
+
+
+def run_mode(mode: str, url: str, rows: int, repeat: int) -> dict:
+    db = memory_session(url)
+    loop = asyncio.new_event_loop()
+    if mode == "orm":
+        build = lambda: orm_body(db, rows, loop)
+    else:
+        build = lambda: fast_body(db, rows)
+    baseline_rss = peak_rss_mb()
+    seconds = measure(build, repeat)
+    return {
+        "mode": mode,
+        "rows": rows,
+        "ms_per_response": round(seconds * 1000, 3),
+        "objects_per_sec": round(rows / seconds),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - baseline_rss, 1),
+    }
+
+
+def check_identical(db, rows: int) -> bool:
+    return orm_body(db, rows, asyncio.new_event_loop()) == fast_body(db, rows)
+
+
+def report(result: dict):
+    print(
+        f"{result['mode']:>5}: {result['objects_per_sec']:>10,} objetos/s  "
+        f"{result['ms_per_response']:>8} ms/respuesta  "
+        f"RSS máx {result['peak_rss_mb']} MB (+{result['rss_growth_mb']} MB)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.db, args.rows, args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db = memory_session(url)
+        seed_songs(db, args.rows)
+        print(f"Salida idéntica byte a byte: {check_identical(db, args.rows)}")
+        db.close()
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--db", url,
+                 "--rows", str(args.rows), "--repeat", str(args.repeat)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            report(json.loads(output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark de escalado del servidor de producción (serve.py) con los workers.
+
+Siembra una vez un catálogo sintético (igual que loadtest.py) y, para cada
+cantidad de workers, arranca `python serve.py` con WEB_WORKERS=n, aplica la
+misma carga en lazo cerrado y reporta peticiones/s, p50/p99 y la aceleración
+respecto a un worker.
+
+El cliente corre en la misma máquina y también usa CPU: con pocos núcleos el
+techo lo pone la máquina, no el servidor. Compara en una máquina con más
+núcleos que workers, o apunta el cliente desde otra con loadtest.py
+--base-url.
+
+La concurrencia por defecto se queda por debajo del pool de conexiones de un
+worker (5 + 10 de overflow): las rutas async que consultan la base de forma
+síncrona esperan la conexión bloqueando el bucle, y con más clientes que
+conexiones un worker se atasca hasta el timeout del pool (30 s).
+
+Uso:
+    python benchmarks/bench_serve_scaling.py --workers 1,2,4,8 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+
+from loadtest import MIXES, free_port, run_load, seed, summarize, wait_until_healthy
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_serve(directory: str, db_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": db_url,
+        "BACKEND_HOST": "127.0.0.1",
+        "BACKEND_PORT": str(port),
+        "WEB_WORKERS": str(workers),
+    }
+    return subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, "serve.py")], cwd=directory, env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", default="1,2,4", help="cantidades de workers separadas por comas")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--mix", choices=MIXES, default="read")
+    parser.add_argument("--songs", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="serve-scaling-") as directory:
+        db_url = f"sqlite:///{os.path.join(directory, 'scaling.db')}"
+        print(f"Sembrando {args.songs:,} canciones ...")
+        data = seed(db_url, args.songs, args.seed, directory, 1024 * 1024)
+
+        for workers in (int(value) for value in args.workers.split(",")):
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_serve(directory, db_url, port, workers)
+            try:
+                wait_until_healthy(base_url, server)
+                samples, seconds = asyncio.run(run_load(
+                    base_url, data, MIXES[args.mix], args.concurrency, args.duration, args.warmup, args.seed
+                ))
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            total = summarize(samples, seconds)["total"]
+            results.append((workers, total))
+            print(f"  {workers} workers: {total['rps']} req/s")
+
+    print(f"\nmezcla {args.mix}, {args.concurrency} clientes, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8} {'aceleración':>12}")
+    base_rps = results[0][1]["rps"] or 1
+    for workers, total in results:
+        print(
+            f"{workers:>7} {total['rps']:>9} {total['p50_ms']:>8} {total['p99_ms']:>8} "
+            f"{total['errors']:>8} {total['rps'] / base_rps:>11.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
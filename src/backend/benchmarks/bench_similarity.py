@@ -0,0 +1,79 @@
+"""
+Benchmark del cálculo de canciones similares frente al tamaño del dataset.
+
+Genera interacciones sintéticas (popularidad de canciones tipo Zipf) y mide el
+tiempo de top_k_neighbours y el RSS máximo para cada tamaño, cada uno en su
+propio subproceso. No toca la base de datos.
+
+Uso:
+    python benchmarks/bench_similarity.py --likes 100000,1000000,3000000
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from _common import peak_rss_mb
+
+import numpy as np
+
+from recommendations import top_k_neighbours
+
+
+def synthetic_interactions(likes: int, seed: int):
+    """~25 favoritos por usuario y un catálogo de likes/20 canciones"""
+    rng = np.random.default_rng(seed)
+    n_songs = max(likes // 20, 100)
+    n_users = max(likes // 25, 10)
+    baskets = rng.integers(0, n_users, size=likes, dtype=np.int64)
+    songs = (rng.zipf(1.3, size=likes) - 1) % n_songs
+    return baskets, songs.astype(np.int64), n_songs
+
+
+def run_size(likes: int, top_k: int, block_size: int, seed: int) -> dict:
+    baskets, songs, n_songs = synthetic_interactions(likes, seed)
+    start = time.perf_counter()
+    rows = 0
+    for block in top_k_neighbours(baskets, songs, top_k=top_k, block_size=block_size):
+        rows += block[1].size
+    seconds = time.perf_counter() - start
+    return {
+        "likes": likes,
+        "songs": n_songs,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "likes_per_sec": round(likes / seconds),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--likes", default="100000,1000000")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--block-size", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_size(args.single, args.top_k, args.block_size, args.seed)))
+        return
+
+    for likes in (int(value) for value in args.likes.split(",")):
+        output = subprocess.run(
+            [sys.executable, __file__, "--single", str(likes), "--top-k", str(args.top_k),
+             "--block-size", str(args.block_size), "--seed", str(args.seed)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output)
+        print(
+            f"{result['likes']:>12,} likes  {result['songs']:>10,} canciones  "
+            f"{result['seconds']:>8} s  {result['likes_per_sec']:>10,} likes/s  "
+            f"RSS máx {result['peak_rss_mb']} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark de arranque: desde un intérprete nuevo hasta la primera petición.
+
+Modo en proceso (por defecto): en un subproceso limpio mide por separado
+`import main`, el arranque del lifespan (TestClient) y la primera petición
+a /health y a /ready (esta última esperando a que el índice de sugerencias
+esté listo). Modo --server: lanza `uvicorn main:app` y mide hasta el primer
+200 de /health y de /ready, que es lo que ve un orquestador.
+
+La base es un SQLite temporal con el esquema creado de antemano (en
+producción lo crea Alembic) y --songs canciones para el índice.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --server --runs 3
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import memory_session, seed_songs
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_TIMEOUT = 60
+
+
+def child() -> None:
+    """Corre en un intérprete nuevo: las importaciones aún no están en caché"""
+    started = time.perf_counter()
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+    from fastapi.testclient import TestClient
+    imported = time.perf_counter()
+    with TestClient(main.app) as client:
+        lifespan = time.perf_counter()
+        assert client.get("/health").status_code == 200
+        health = time.perf_counter()
+        while client.get("/ready").status_code != 200:
+            if time.perf_counter() - started > READY_TIMEOUT:
+                raise RuntimeError("Not ready in time")
+            time.sleep(0.005)
+        ready = time.perf_counter()
+    print(json.dumps({
+        "import": imported - started,
+        "lifespan": lifespan - imported,
+        "first_health": health - started,
+        "ready": ready - started,
+    }))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_server(directory: str, env: dict) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--port", str(port), "--log-level", "warning"],
+        cwd=directory, env=env,
+    )
+    result = {}
+    try:
+        for name, path in (("first_health", "/health"), ("ready", "/ready")):
+            while name not in result:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {process.returncode}")
+                if time.perf_counter() - started > READY_TIMEOUT:
+                    raise RuntimeError("Not ready in time")
+                try:
+                    if httpx.get(f"http://127.0.0.1:{port}{path}", timeout=1).status_code == 200:
+                        result[name] = time.perf_counter() - started
+                        continue
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--songs", type=int, default=20_000)
+    parser.add_argument("--server", action="store_true", help="medir un proceso uvicorn real")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        db = memory_session(url)
+        seed_songs(db, args.songs)
+        db.close()
+        env = {**os.environ, "DATABASE_URL": url}
+
+        runs = []
+        for _ in range(args.runs):
+            if args.server:
+                runs.append(run_server(directory, env))
+            else:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child"],
+                    cwd=directory, env=env, check=True, capture_output=True, text=True,
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{args.runs} arranques, {args.songs:,} canciones ({'uvicorn' if args.server else 'en proceso'}), mediana:")
+    for key in runs[0]:
+        print(f"  {key:<14} {statistics.median(run[key] for run in runs) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
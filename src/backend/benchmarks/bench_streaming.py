@@ -0,0 +1,98 @@
+"""
+Benchmark de memoria de los listados en streaming (streaming.py).
+
+Compara, para varios tamaños de resultado, cargar la lista completa como
+objetos ORM y serializarla de una vez (lo que hacen los listados paginados
+con un límite grande) frente a recorrerla con query_chunks/iterate_closing,
+descartando los trozos como haría el socket. Cada combinación corre en su
+propio subproceso para que el RSS máximo sea comparable.
+
+Uso:
+    python benchmarks/bench_streaming.py --rows 10000,100000,300000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import memory_engine, memory_session, peak_rss_mb, seed_songs
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Song
+from schemas import SongResponse
+from serialization import SONG_RESPONSE_COLUMNS, dumps, serialize_song_row
+from streaming import iterate_closing, query_chunks
+
+MODES = ("orm", "stream")
+
+
+def run_orm(engine) -> int:
+    with Session(engine) as db:
+        songs = db.query(Song).order_by(Song.id).all()
+        body = dumps([SongResponse.model_validate(song).model_dump(mode="json") for song in songs])
+    return len(body)
+
+
+def run_stream(engine) -> int:
+    async def consume():
+        sent = 0
+        chunks = query_chunks(engine, select(*SONG_RESPONSE_COLUMNS).order_by(Song.id), serialize_song_row)
+        async for chunk in iterate_closing(chunks):
+            sent += len(chunk)
+        return sent
+    return asyncio.run(consume())
+
+
+def run_mode(mode: str, url: str, rows: int) -> dict:
+    engine = memory_engine(url)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    sent = run_orm(engine) if mode == "orm" else run_stream(engine)
+    seconds = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "rows": rows,
+        "bytes": sent,
+        "seconds": round(seconds, 2),
+        "rss_growth_mb": round(peak_rss_mb() - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", default="10000,100000,300000")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.db, args.single)))
+        return
+
+    for rows in (int(value) for value in args.rows.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            db = memory_session(url)
+            seed_songs(db, rows)
+            db.close()
+            for mode in MODES:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--mode", mode, "--db", url, "--single", str(rows)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output)
+                print(
+                    f"{result['rows']:>8,} filas  {result['mode']:>6}: {result['seconds']:>6} s  "
+                    f"{result['bytes'] / 2**20:>6.1f} MB enviados  RSS +{result['rss_growth_mb']} MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+Prueba de carga HTTP contra la API levantada localmente con datos sembrados.
+
+Pasos:
+1. Crea un directorio temporal y siembra la base (SQLite ahí mismo, o la que
+   se pase con --db-url, que debe estar vacía) con el generador determinista
+   de synthetic_catalog.py, incluidos audios y portadas de relleno en uploads/.
+2. Arranca `uvicorn main:app` en un subproceso con ese directorio como cwd,
+   sin límites de tasa ni control de admisión salvo con --limits: todos los
+   clientes salen de 127.0.0.1 y compartirían el cubo por IP, así que se
+   mediría sobre todo lo barato que es un 429.
+3. Durante --duration segundos, --concurrency clientes (httpx asíncrono, en
+   lazo cerrado) repiten escenarios elegidos al azar según la mezcla:
+   navegación del catálogo, búsqueda, ráfagas de play/like, edición de
+   playlists, reproducción con saltos (Range) y subidas de portadas.
+4. Informa peticiones/s y p50/p95/p99 por ruta (los 429 en su propia
+   columna, aparte del resto de 4xx), y guarda todo en JSON.
+   Con --compare se muestran las diferencias contra un resultado anterior.
+
+Los tokens se firman directamente con auth.create_access_token (el login con
+bcrypt no forma parte de la mezcla). El cliente corre en la misma máquina que
+el servidor y compite por CPU: compara siempre resultados de la misma máquina.
+
+Uso:
+    python benchmarks/loadtest.py --duration 30 --concurrency 32 --output results.json
+    python benchmarks/loadtest.py --mix read --workers 4 --compare results.json
+    python benchmarks/loadtest.py --base-url http://localhost:8000 --db-url postgresql://...
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import _common  # noqa: F401  (entorno y sys.path)
+
+import httpx
+from sqlalchemy import create_engine, select
+
+from auth import create_access_token
+from database import Base
+from models import Playlist, Song, User, UserRole
+from synthetic_catalog import WORDS, CatalogGenerator, create_media, load_catalog
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Peso relativo de cada escenario en cada mezcla
+MIXES = {
+    "default": {"browse": 30, "search": 20, "play": 15, "like": 10, "playlist": 10, "stream": 10, "upload": 5},
+    "read": {"browse": 50, "search": 30, "stream": 20},
+    "write": {"play": 40, "like": 30, "playlist": 25, "upload": 5},
+}
+RANGE_SIZE = 256 * 1024
+HOT_SONGS = 10_000  # Canciones más escuchadas de las que salen la mayoría de las peticiones
+# PNG de 1x1 píxel
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d4944415478da63f8cfc0f01f0005000201a5e1c6a40000000049454e44ae426082"
+)
+
+
+# ---------------------------------------------------------------- preparación
+
+def seed(db_url: str, songs: int, seed_value: int, directory: str, audio_size: int) -> dict:
+    """Siembra la base y devuelve lo que necesitan los escenarios"""
+    engine = create_engine(db_url)
+    Base.metadata.create_all(engine)
+    media, covers = create_media(Path(directory) / "uploads", 4, audio_size, 16 * 1024, seed_value)
+    generator = CatalogGenerator(songs=songs, seed=seed_value, media_files=media, cover_files=covers)
+    summary = load_catalog(engine, generator)
+
+    with engine.connect() as conn:
+        users = conn.execute(select(User.id, User.email, User.role)).all()
+        playlists = conn.execute(select(Playlist.id, Playlist.owner_id)).all()
+        popular = conn.execute(
+            select(Song.id).where(Song.is_approved == True).order_by(Song.play_count.desc()).limit(HOT_SONGS)
+        ).scalars().all()
+    engine.dispose()
+
+    owners = defaultdict(list)
+    for playlist_id, owner_id in playlists:
+        owners[owner_id].append(playlist_id)
+    return {
+        "tables": summary["tables"],
+        "songs": summary["tables"]["songs"],
+        "popular": popular,
+        "users": [(user_id, email) for user_id, email, _ in users],
+        "creators": [(user_id, email) for user_id, email, role in users if role == UserRole.CREATOR],
+        "playlists": dict(owners),
+        "media": media,
+        "audio_size": audio_size,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(directory: str, db_url: str, port: int, workers: int, limits: bool = False) -> subprocess.Popen:
+    env = {**os.environ, "DATABASE_URL": db_url}
+    if not limits:
+        env.update(RATE_LIMIT_ENABLED="false", ADMISSION_ENABLED="false")
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+        "--log-level", "warning", "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=directory, env=env)
+
+
+def wait_until_healthy(base_url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become healthy in time")
+
+
+# ------------------------------------------------------------------ escenarios
+
+class Context:
+    def __init__(self, client: httpx.AsyncClient, data: dict, rng: random.Random):
+        self.client = client
+        self.data = data
+        self.rng = rng
+        self.samples = defaultdict(list)  # ruta -> [(segundos, status)]
+        self.recording = False
+        self.tokens = {}
+        self.emails = {user_id: email for user_id, email in data["users"]}
+
+    def auth(self, user: tuple) -> dict:
+        user_id, email = user
+        if user_id not in self.tokens:
+            self.tokens[user_id] = create_access_token({"sub": email}, expires_delta=timedelta(hours=12))
+        return {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+    def song_id(self) -> int:
+        # Popularidad sesgada: pocas canciones concentran la mayoría de las peticiones
+        index = int(self.rng.paretovariate(1.1)) - 1
+        if index < len(self.data["popular"]):
+            return self.data["popular"][index]
+        return self.rng.randint(1, self.data["songs"])
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        if self.recording:
+            self.samples[route].append((time.perf_counter() - started, status))
+        return response
+
+
+async def browse(ctx: Context) -> None:
+    order = ctx.rng.choice(["play_count", "created_at", "title"])
+    await ctx.request("GET /songs/", "GET", "/songs/", params={"limit": 50, "order_by": order})
+    await ctx.request("GET /songs/{id}", "GET", f"/songs/{ctx.song_id()}")
+    if ctx.rng.random() < 0.3:
+        await ctx.request("GET /albums/", "GET", "/albums/")
+    if ctx.rng.random() < 0.3:
+        await ctx.request("GET /facets/genres", "GET", "/facets/genres")
+
+
+async def search(ctx: Context) -> None:
+    typed = " ".join(ctx.rng.choices(WORDS, k=ctx.rng.randint(1, 2)))
+    # Cada tecla pide sugerencias; al final se busca el texto completo
+    for length in range(3, len(typed) + 1, 2):
+        await ctx.request("GET /search/suggest", "GET", "/search/suggest", params={"q": typed[:length]})
+    await ctx.request("GET /songs/?search", "GET", "/songs/", params={"search": typed, "limit": 20})
+
+
+async def play(ctx: Context) -> None:
+    headers = ctx.auth(ctx.rng.choice(ctx.data["users"]))
+    for _ in range(ctx.rng.randint(1, 5)):
+        await ctx.request("POST /songs/{id}/play", "POST", f"/songs/{ctx.song_id()}/play", headers=headers)
+
+
+async def like(ctx: Context) -> None:
+    headers = ctx.auth(ctx.rng.choice(ctx.data["users"]))
+    song_id = ctx.song_id()
+    await ctx.request("POST /songs/{id}/like", "POST", f"/songs/{song_id}/like", headers=headers)
+    await ctx.request("GET /songs/?with_liked", "GET", "/songs/", params={"with_liked": True, "limit": 50},
+                      headers=headers)
+    await ctx.request("DELETE /songs/{id}/like", "DELETE", f"/songs/{song_id}/like", headers=headers)
+
+
+async def playlist(ctx: Context) -> None:
+    owner_id = ctx.rng.choice(list(ctx.data["playlists"]))
+    playlist_id = ctx.rng.choice(ctx.data["playlists"][owner_id])
+    headers = ctx.auth((owner_id, ctx.emails[owner_id]))
+    song_id = ctx.rng.randint(1, ctx.data["songs"])
+    await ctx.request("POST /playlists/{id}/songs/{id}", "POST", f"/playlists/{playlist_id}/songs/{song_id}",
+                      params={"index": ctx.rng.randint(0, 50)}, headers=headers)
+    await ctx.request("PATCH /playlists/{id}/order", "PATCH", f"/playlists/{playlist_id}/order",
+                      json={"moves": [{"song_id": song_id, "to_index": ctx.rng.randint(0, 50)}]}, headers=headers)
+    await ctx.request("GET /playlists/{id}", "GET", f"/playlists/{playlist_id}", headers=headers)
+    await ctx.request("DELETE /playlists/{id}/songs/{id}", "DELETE", f"/playlists/{playlist_id}/songs/{song_id}",
+                      headers=headers)
+
+
+async def stream(ctx: Context) -> None:
+    # Empieza desde el principio y salta un par de veces
+    media = ctx.rng.choice(ctx.data["media"])
+    size = ctx.data["audio_size"]
+    for offset in [0] + sorted(ctx.rng.sample(range(0, size - RANGE_SIZE, RANGE_SIZE), 2)):
+        await ctx.request("GET /uploads (range)", "GET", media,
+                          headers={"Range": f"bytes={offset}-{offset + RANGE_SIZE - 1}"})
+
+
+async def upload(ctx: Context) -> None:
+    headers = ctx.auth(ctx.rng.choice(ctx.data["creators"]))
+    await ctx.request("POST /upload/cover", "POST", "/upload/cover", headers=headers,
+                      files={"file": ("cover.png", PNG, "image/png")})
+
+
+SCENARIOS = {
+    "browse": browse, "search": search, "play": play, "like": like,
+    "playlist": playlist, "stream": stream, "upload": upload,
+}
+
+
+async def run_load(base_url: str, data: dict, mix: dict, concurrency: int,
+                   duration: float, warmup: float, seed_value: int) -> tuple:
+    names, weights = list(mix), list(mix.values())
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        contexts = [Context(client, data, random.Random(seed_value + i)) for i in range(concurrency)]
+        stop_at = time.monotonic() + warmup + duration
+
+        async def user_loop(ctx: Context):
+            while time.monotonic() < stop_at:
+                scenario = SCENARIOS[ctx.rng.choices(names, weights)[0]]
+                await scenario(ctx)
+
+        async def start_recording():
+            await asyncio.sleep(warmup)
+            for ctx in contexts:
+                ctx.recording = True
+            return time.monotonic()
+
+        recording = asyncio.create_task(start_recording())
+        await asyncio.gather(*(user_loop(ctx) for ctx in contexts))
+        measured = time.monotonic() - await recording
+
+    samples = defaultdict(list)
+    for ctx in contexts:
+        for route, values in ctx.samples.items():
+            samples[route].extend(values)
+    return samples, measured
+
+
+# -------------------------------------------------------------------- informe
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def summarize(samples: dict, seconds: float) -> dict:
+    routes = {}
+    for route, values in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in values)
+        routes[route] = {
+            "requests": len(values),
+            "rps": round(len(values) / seconds, 1),
+            "errors": sum(1 for _, status in values if status == 0 or status >= 500),
+            "rate_limited": sum(1 for _, status in values if status == 429),
+            "client_errors": sum(1 for _, status in values if 400 <= status < 500 and status != 429),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    everything = sorted(latency for values in samples.values() for latency, _ in values)
+    total = {
+        "requests": len(everything),
+        "rps": round(len(everything) / seconds, 1),
+        "errors": sum(route["errors"] for route in routes.values()),
+        "rate_limited": sum(route["rate_limited"] for route in routes.values()),
+        "p50_ms": round(percentile(everything, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(everything, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(everything, 0.99) * 1000, 2),
+    }
+    return {"total": total, "routes": routes}
+
+
+def print_report(result: dict, previous: dict | None = None) -> None:
+    header = f"{'ruta':<34} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'5xx':>6} {'429':>6} {'4xx':>6}"
+    print(header)
+    print("-" * len(header))
+    rows = list(result["routes"].items()) + [("TOTAL", {**result["total"], "client_errors": ""})]
+    for route, stats in rows:
+        line = (f"{route:<34} {stats['rps']:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+                f"{stats['p99_ms']:>8} {stats['errors']:>6} {stats['rate_limited']:>6} "
+                f"{stats['client_errors']:>6}")
+        before = previous and (previous["total"] if route == "TOTAL" else previous["routes"].get(route))
+        if before:
+            line += (f"   req/s {stats['rps'] - before['rps']:+.1f}"
+                     f"  p95 {stats['p95_ms'] - before['p95_ms']:+.2f} ms")
+        print(line)
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--duration", type=float, default=30, help="segundos medidos")
+    parser.add_argument("--warmup", type=float, default=5, help="segundos iniciales sin medir")
+    parser.add_argument("--concurrency", type=int, default=32, help="clientes simultáneos")
+    parser.add_argument("--mix", choices=MIXES, default="default")
+    parser.add_argument("--songs", type=int, default=50_000, help="canciones del catálogo sintético")
+    parser.add_argument("--audio-size", type=int, default=4 * 1024 * 1024, help="bytes de cada audio de relleno")
+    parser.add_argument("--workers", type=int, default=1, help="workers de uvicorn")
+    parser.add_argument("--limits", action="store_true",
+                        help="mantener los límites de tasa y el control de admisión del servidor")
+    parser.add_argument("--db-url", help="base vacía a sembrar; por defecto SQLite temporal")
+    parser.add_argument("--base-url", help="usar un servidor ya levantado (no siembra ni arranca nada)")
+    parser.add_argument("--data", help="con --base-url: JSON como el que devuelve seed() (songs, popular, users, ...)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="guardar el resultado en este JSON")
+    parser.add_argument("--compare", help="resultado JSON anterior para comparar")
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as source:
+            previous = json.load(source)
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as directory:
+        server = None
+        if args.base_url:
+            if not args.data:
+                parser.error("--base-url requiere --data")
+            with open(args.data) as source:
+                data = json.load(source)
+            data["playlists"] = {int(owner): ids for owner, ids in data["playlists"].items()}
+            base_url = args.base_url
+        else:
+            db_url = args.db_url or f"sqlite:///{os.path.join(directory, 'loadtest.db')}"
+            print(f"Sembrando {args.songs:,} canciones en {db_url.split('@')[-1]} ...")
+            data = seed(db_url, args.songs, args.seed, directory, args.audio_size)
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(directory, db_url, port, args.workers, args.limits)
+
+        try:
+            if server is not None:
+                wait_until_healthy(base_url, server)
+            print(f"Carga: mezcla {args.mix}, {args.concurrency} clientes, {args.duration:.0f} s ...")
+            samples, seconds = asyncio.run(run_load(
+                base_url, data, MIXES[args.mix], args.concurrency, args.duration, args.warmup, args.seed
+            ))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    result = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration": round(seconds, 2),
+            "workers": args.workers,
+            "limits": None if args.base_url else args.limits,
+            "songs": data["songs"],
+            "database": "external" if args.base_url else (args.db_url or "sqlite").split(":")[0],
+        },
+        **summarize(samples, seconds),
+    }
+    print_report(result, previous)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+        print(f"Resultado guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
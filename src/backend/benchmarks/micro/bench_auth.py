@@ -0,0 +1,31 @@
+"""JWT y contraseñas (auth.py)"""
+from datetime import timedelta
+
+from auth import create_access_token, get_password_hash, verify_password, verify_token
+from conftest import PASSWORD
+
+
+def bench_create_access_token(benchmark):
+    token = benchmark(create_access_token, {"sub": "listener@bench.local"}, timedelta(minutes=30))
+    assert token.count(".") == 2
+
+
+def bench_verify_token(benchmark, token):
+    data = benchmark(verify_token, token)
+    assert data.email == "listener@bench.local"
+
+
+def bench_verify_token_invalid(benchmark):
+    assert benchmark(verify_token, "not.a.token") is None
+
+
+# bcrypt tarda cientos de ms por diseño: pocas rondas bastan para detectar cambios de coste
+def bench_get_password_hash(benchmark):
+    hashed = benchmark.pedantic(get_password_hash, args=(PASSWORD,), rounds=5, warmup_rounds=1)
+    assert hashed.startswith("$2b$")
+
+
+def bench_verify_password(benchmark, user):
+    assert benchmark.pedantic(
+        verify_password, args=(PASSWORD, user.hashed_password), rounds=5, warmup_rounds=1
+    )
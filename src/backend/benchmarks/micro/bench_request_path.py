@@ -0,0 +1,68 @@
+"""Respuesta de /uploads con sus cabeceras CORS y cadena de dependencias de autenticación"""
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from conftest import run_sync
+from dependencies import get_current_user, require_role
+from models import UserRole
+from routes.media import MEDIA_CORS_HEADERS
+from storage import LocalStorage
+
+MEDIA_KEY = "songs/bench.mp3"
+
+
+@pytest.fixture(scope="module")
+def media_storage(tmp_path_factory):
+    root = tmp_path_factory.mktemp("uploads")
+    (root / "songs").mkdir()
+    (root / MEDIA_KEY).write_bytes(b"\0" * 1024 * 1024)
+    return LocalStorage(root)
+
+
+def make_request(path: str, headers: list) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"host", b"testserver"), *headers],
+        "scheme": "http",
+        "server": ("testserver", 80),
+    })
+
+
+@pytest.mark.parametrize("range_header", [None, b"bytes=0-1023"], ids=["full", "range"])
+def bench_media_response(benchmark, media_storage, range_header):
+    # Lo que hace GET /uploads/<clave> por petición: stat del archivo y FileRangeResponse
+    headers = [(b"range", range_header)] if range_header else []
+    request = make_request(f"/uploads/{MEDIA_KEY}", headers)
+
+    response = benchmark(lambda: media_storage.response(request, MEDIA_KEY, MEDIA_CORS_HEADERS))
+    assert response.status_code == (206 if range_header else 200)
+    assert response.headers["access-control-allow-origin"] == "*"
+
+
+def bench_get_current_user(benchmark, db, user, token):
+    current = benchmark(lambda: run_sync(get_current_user(token=token, db=db)))
+    assert current.id == user.id
+
+
+def bench_require_role_chain(benchmark, db, user, token):
+    # get_current_user seguido del comprobador de rol, como en las rutas de creadores
+    checker = require_role([UserRole.CREATOR, UserRole.ADMIN])
+
+    def run():
+        return run_sync(checker(current_user=run_sync(get_current_user(token=token, db=db))))
+
+    assert benchmark(run).id == user.id
+
+
+def bench_get_current_user_rejected(benchmark, db):
+    def run():
+        try:
+            run_sync(get_current_user(token="not.a.token", db=db))
+        except HTTPException as exc:
+            return exc.status_code
+
+    assert benchmark(run) == 401
@@ -0,0 +1,20 @@
+"""Validación de respuestas con SongResponse, como hace FastAPI con response_model"""
+from typing import List
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from conftest import run_sync
+from schemas import SongResponse
+
+
+def bench_song_response_model_validate(benchmark, songs):
+    result = benchmark(lambda: [SongResponse.model_validate(song) for song in songs])
+    assert len(result) == 100
+
+
+def bench_song_response_serialize_list(benchmark, songs):
+    # Validación y volcado a JSON de una lista de 100 canciones, el camino completo de response_model
+    field = create_response_field(name="response", type_=List[SongResponse])
+    content = benchmark(lambda: run_sync(serialize_response(field=field, response_content=songs)))
+    assert len(content) == 100
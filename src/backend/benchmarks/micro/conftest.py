@@ -0,0 +1,87 @@
+"""
+Micro-benchmarks (pytest-benchmark) de las piezas que corren en cada petición.
+
+Se ejecutan desde src/backend:
+    pytest benchmarks/micro --benchmark-save=baseline    # guarda una línea base
+    pytest benchmarks/micro                              # mide y compara con la última guardada
+
+Las ejecuciones guardadas quedan en benchmarks/micro/baselines/<máquina>/. Cada
+corrida se compara con la más reciente y falla si la mediana de algún
+benchmark empeora más que el umbral de pytest.ini (--benchmark-compare-fail).
+Solo tiene sentido comparar resultados de la misma máquina: guarda la línea
+base en la rama principal y compara la rama de trabajo justo después.
+
+Todo corre sobre SQLite en memoria y sin red. Las corrutinas que no esperan
+nada de verdad (dependencias, middleware con un call_next inmediato) se
+ejecutan con run_sync, sin bucle de eventos, para no medir el bucle.
+"""
+import glob
+import os
+import sys
+from datetime import timedelta
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import memory_session, seed_songs  # noqa: E402  (entorno y sys.path)
+
+from auth import create_access_token, get_password_hash  # noqa: E402
+from models import Song, User, UserRole  # noqa: E402
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+PASSWORD = "bench-password"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Las líneas base viven junto a los benchmarks sin importar desde dónde se llame pytest
+    if config.option.benchmark_storage == "file://./.benchmarks":
+        config.option.benchmark_storage = f"file://{BASELINES_DIR}"
+    # Sin ninguna línea base guardada no hay con qué comparar: se mide y se informa sin fallar
+    if config.option.benchmark_storage == f"file://{BASELINES_DIR}" and not glob.glob(
+        os.path.join(BASELINES_DIR, "*", "*.json")
+    ):
+        config.option.benchmark_compare = None
+        config.option.benchmark_compare_fail = None
+
+
+def run_sync(coro):
+    """Ejecuta una corrutina que termina sin suspenderse y devuelve su resultado"""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("Coroutine suspended; it needs a real event loop")
+
+
+@pytest.fixture(scope="session")
+def db():
+    session = memory_session()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def user(db) -> User:
+    user = User(
+        email="listener@bench.local",
+        username="bench_listener",
+        hashed_password=get_password_hash(PASSWORD),
+        role=UserRole.CREATOR,
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture(scope="session")
+def token(user) -> str:
+    return create_access_token({"sub": user.email}, expires_delta=timedelta(hours=1))
+
+
+@pytest.fixture(scope="session")
+def songs(db, user) -> list[Song]:
+    seed_songs(db, 100, user)
+    return db.query(Song).order_by(Song.id).all()
@@ -0,0 +1,209 @@
+"""
+Exportación e importación masiva del catálogo en NDJSON.
+
+Formato: por cada tabla una línea de cabecera {"table": ..., "columns": [...]}
+seguida de una línea por fila con los valores como arreglo JSON, en el orden
+de las columnas. Fechas en ISO 8601 y enums por nombre (como los guarda la
+base de datos). Las tablas van en orden de dependencias, así una importación
+nunca apunta a filas que aún no existen.
+
+La exportación lee con un cursor del lado del servidor y produce un trozo
+por cada FETCH_SIZE filas, con memoria constante. La importación también es en
+streaming, en una sola transacción:
+- PostgreSQL (psycopg2): COPY ... FROM STDIN en lotes de BATCH_SIZE filas.
+- Otros motores: executemany en lotes.
+
+Los ids se desplazan por el máximo id actual de cada tabla (en una base vacía
+se conservan) y las claves foráneas se desplazan igual. Géneros y artistas se
+fusionan por slug con los existentes. Al terminar se reajustan las secuencias
+de PostgreSQL y los conteos de facetas. song_similarities no se exporta, se
+recalcula con scripts/build_similarities.py.
+"""
+import csv
+import io
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import DateTime, func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from database import Base
+from facets import recount
+from serialization import dumps, loads
+
+CATALOG_TABLES = (
+    "users", "genres", "artists", "albums", "songs", "playlists", "playlist_songs", "liked_songs",
+)
+# Tablas que se fusionan con las existentes por esta columna en vez de desplazar ids
+MERGE_KEYS = {"genres": "slug", "artists": "slug"}
+
+FETCH_SIZE = 10_000
+BATCH_SIZE = 20_000
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.name
+    return value
+
+
+def export_lines(engine: Engine, tables: Sequence[str] = CATALOG_TABLES) -> Iterator[bytes]:
+    """Produce el catálogo en NDJSON, un trozo de bytes por cada FETCH_SIZE filas"""
+    with engine.connect() as conn:
+        for name in tables:
+            table = Base.metadata.tables[name]
+            yield dumps({"table": name, "columns": [column.name for column in table.columns]}) + b"\n"
+            result = conn.execution_options(stream_results=True).execute(
+                select(table).order_by(table.c.id)
+            )
+            for rows in result.partitions(FETCH_SIZE):
+                yield b"".join(dumps([_encode(value) for value in row]) + b"\n" for row in rows)
+
+
+class _TableImport:
+    """Estado de la tabla que se está importando: columnas, remapeo y lote pendiente"""
+
+    def __init__(self, importer: "CatalogImporter", name: str, columns: Sequence[str]):
+        self.table = Base.metadata.tables[name]
+        unknown = set(columns) - set(self.table.columns.keys())
+        if unknown:
+            raise ValueError(f"Unknown columns for {name}: {sorted(unknown)}")
+        self.name = name
+        self.columns = list(columns)
+        self.id_index = self.columns.index("id")
+        self.rows = []
+
+        # Claves foráneas a desplazar: índice de columna -> tabla referenciada
+        self.foreign = [
+            (index, fk.column.table.name)
+            for index, column in enumerate(self.columns)
+            for fk in self.table.c[column].foreign_keys
+        ]
+        self.dates = [
+            index for index, column in enumerate(self.columns)
+            if isinstance(self.table.c[column].type, DateTime)
+        ]
+        self.merge_index = self.columns.index(MERGE_KEYS[name]) if name in MERGE_KEYS else None
+        self.existing = {}
+        if self.merge_index is not None:
+            merge_column = self.table.c[MERGE_KEYS[name]]
+            self.existing = dict(importer.conn.execute(select(merge_column, self.table.c.id)).all())
+
+
+class CatalogImporter:
+    def __init__(self, conn: Connection, batch_size: int = BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.use_copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+        self.offsets = {}  # tabla -> desplazamiento de ids
+        self.merged = {}  # tabla fusionada -> {id importado: id final}
+        self.current: Optional[_TableImport] = None
+        self.summary = {}
+
+    def start_table(self, name: str, columns: Sequence[str]) -> None:
+        self.flush()
+        if name not in CATALOG_TABLES:
+            raise ValueError(f"Unknown table: {name}")
+        table = Base.metadata.tables[name]
+        self.offsets[name] = self.conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+        self.merged[name] = {}
+        self.current = _TableImport(self, name, columns)
+        self.summary[name] = 0
+
+    def add_row(self, row: list) -> None:
+        current = self.current
+        if current is None:
+            raise ValueError("Row found before any table header")
+        row_id = row[current.id_index]
+        if current.merge_index is not None:
+            existing = current.existing.get(row[current.merge_index])
+            if existing is not None:
+                self.merged[current.name][row_id] = existing
+                return
+        row[current.id_index] = row_id + self.offsets[current.name]
+
+        for index, referenced in current.foreign:
+            value = row[index]
+            if value is not None:
+                merged = self.merged.get(referenced)
+                if merged and value in merged:
+                    row[index] = merged[value]
+                else:
+                    row[index] = value + self.offsets.get(referenced, 0)
+        if not self.use_copy:
+            for index in current.dates:
+                if isinstance(row[index], str):
+                    row[index] = datetime.fromisoformat(row[index])
+
+        current.rows.append(row)
+        if len(current.rows) >= self.batch_size:
+            self.flush()
+
+    def _copy(self, current: _TableImport) -> None:
+        buffer = io.StringIO()
+        # Con QUOTE_NONNUMERIC las cadenas van entre comillas y None queda vacío sin comillas,
+        # que es como COPY distingue NULL de ''
+        csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(current.rows)
+        buffer.seek(0)
+        cursor = self.conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {current.name} ({', '.join(current.columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+    def flush(self) -> None:
+        current = self.current
+        if current is None or not current.rows:
+            return
+        if self.use_copy:
+            self._copy(current)
+        else:
+            self.conn.execute(
+                insert(current.table), [dict(zip(current.columns, row)) for row in current.rows]
+            )
+        self.summary[current.name] += len(current.rows)
+        current.rows = []
+
+    def finish(self) -> None:
+        self.flush()
+        if self.conn.dialect.name == "postgresql":
+            for name in self.summary:
+                self.conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {name}), 1), "
+                    f"(SELECT MAX(id) FROM {name}) IS NOT NULL)"
+                ))
+        if self.summary.keys() & {"genres", "artists", "songs"}:
+            recount(self.conn)
+
+
+def import_lines(engine: Engine, lines: Iterable[bytes], batch_size: int = BATCH_SIZE) -> dict:
+    """Importa un NDJSON del catálogo en una transacción; devuelve filas por tabla y tiempos"""
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        importer = CatalogImporter(conn, batch_size)
+        for line in lines:
+            if not line.strip():
+                continue
+            item = loads(line)
+            if isinstance(item, dict):
+                importer.start_table(item["table"], item["columns"])
+            else:
+                importer.add_row(item)
+        importer.finish()
+
+    seconds = time.perf_counter() - started
+    rows = sum(importer.summary.values())
+    return {
+        "tables": importer.summary,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds) if seconds else rows,
+    }
@@ -0,0 +1,297 @@
+"""
+Compresión negociada (brotli o gzip) de las respuestas de la API.
+
+CompressionMiddleware elige la codificación según Accept-Encoding (brotli si
+el cliente lo acepta y el paquete está instalado, si no gzip) y comprime las
+respuestas de tipo texto (JSON, NDJSON, texto) a partir de
+COMPRESSION_MIN_SIZE bytes. Los niveles están pensados para latencia, no para
+la máxima reducción: gzip 5 y brotli 4 comprimen el JSON del catálogo casi
+tanto como los niveles altos con una fracción del tiempo de CPU.
+
+Quedan fuera, explícitamente:
+- audio, imágenes y vídeo (ya comprimidos) y cualquier tipo no textual;
+- las peticiones con Range y las respuestas 206, cuyos rangos se refieren a
+  los bytes sin comprimir;
+- los eventos (text/event-stream), que deben llegar sin esperar al compresor;
+- las respuestas que ya traen Content-Encoding, y HEAD.
+
+Las respuestas públicas (GET sin Authorization, 200, sin Set-Cookie ni
+Cache-Control private/no-store) guardan su versión comprimida en una caché
+LRU por proceso, con clave el hash del cuerpo sin comprimir y la
+codificación: el mismo listado o álbum servido otra vez no se recomprime, y
+un cuerpo distinto nunca recibe una versión que no le corresponde. Los
+cuerpos grandes se comprimen en el threadpool para no bloquear el bucle de
+eventos; las respuestas en streaming se comprimen trozo a trozo, sin caché.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional, sin él solo se ofrece gzip
+    brotli = None
+
+# Por orden de preferencia a igual calidad (q) en Accept-Encoding
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/problem+json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+})
+EXCLUDED_TYPES = frozenset({"text/event-stream"})
+# Status sin cuerpo o cuyo cuerpo no se puede recodificar
+EXCLUDED_STATUSES = frozenset({204, 206, 304})
+# A partir de este tamaño se comprime fuera del bucle de eventos
+THREADPOOL_MIN_SIZE = 128 * 1024
+GZIP_WBITS = 31  # 16 + MAX_WBITS: cabecera y cola de gzip
+
+RawHeaders = List[Tuple[bytes, bytes]]
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Codificación preferida por el cliente entre las disponibles, o None"""
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in ENCODINGS:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in EXCLUDED_TYPES:
+        return False
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+class CompressedBodyCache:
+    """LRU de cuerpos comprimidos, acotada en bytes; la clave es (codificación, hash del original)"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(encoding: str, body: bytes) -> Tuple[str, bytes]:
+        return encoding, hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+            return compressed
+
+    def put(self, key: Tuple[str, bytes], compressed: bytes) -> None:
+        if len(compressed) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = compressed
+            self._bytes += len(compressed)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class Compressor:
+    """Compresor incremental de una codificación con los niveles configurados"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=brotli_quality)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, GZIP_WBITS)
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, mode=brotli.MODE_TEXT, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+def _header(headers: RawHeaders, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _add_vary(headers: RawHeaders) -> RawHeaders:
+    for index, (key, value) in enumerate(headers):
+        if key.lower() == b"vary":
+            if b"accept-encoding" not in value.lower() and value.strip() != b"*":
+                headers[index] = (key, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+def _encoded_headers(headers: RawHeaders, encoding: str, length: Optional[int]) -> RawHeaders:
+    """Cabeceras de la versión comprimida: sin Content-Length si va en streaming y con ETag débil"""
+    result: RawHeaders = []
+    for key, value in headers:
+        name = key.lower()
+        if name == b"content-length":
+            continue
+        if name == b"etag" and not value.startswith(b"W/"):
+            # La versión comprimida no es idéntica byte a byte a la original
+            value = b"W/" + value
+        result.append((key, value))
+    result.append((b"content-encoding", encoding.encode()))
+    if length is not None:
+        result.append((b"content-length", str(length).encode()))
+    return _add_vary(result)
+
+
+def _cacheable(request_headers: RawHeaders, method: str, status: int, headers: RawHeaders) -> bool:
+    """Respuesta igual para cualquier cliente: se puede reutilizar su versión comprimida"""
+    if method != "GET" or status != 200:
+        return False
+    if _header(request_headers, b"authorization") is not None or _header(headers, b"set-cookie") is not None:
+        return False
+    cache_control = (_header(headers, b"cache-control") or b"").lower()
+    return b"no-store" not in cache_control and b"private" not in cache_control
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+        cache: Optional[CompressedBodyCache] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        request_headers = scope["headers"]
+        if _header(request_headers, b"range") is not None:
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = _header(request_headers, b"accept-encoding")
+        encoding = negotiate(accept_encoding.decode("latin-1")) if accept_encoding else None
+
+        start: Optional[dict] = None
+        # None: aún no se sabe; False: se deja pasar tal cual; un Compressor: streaming comprimido
+        mode = None
+
+        async def send_wrapper(message):
+            nonlocal start, mode
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if (
+                    message["status"] in EXCLUDED_STATUSES
+                    or _header(headers, b"content-encoding") is not None
+                    or not is_compressible((_header(headers, b"content-type") or b"").decode("latin-1"))
+                ):
+                    mode = False
+                    await send(message)
+                    return
+                if encoding is None:
+                    # Otro cliente sí recibiría la versión comprimida
+                    mode = False
+                    await send({**message, "headers": _add_vary(headers)})
+                    return
+                start = {**message, "headers": headers}
+                return
+
+            if message["type"] != "http.response.body" or mode is False:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if mode is None:
+                if not more_body:
+                    await self.send_whole(start, body, encoding, request_headers, scope["method"], send)
+                    return
+                mode = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                await send({**start, "headers": _encoded_headers(start["headers"], encoding, None)})
+
+            chunk = mode.compress(body) if body else b""
+            if not more_body:
+                chunk += mode.finish()
+            metrics.compression_input_bytes += len(body)
+            metrics.compression_output_bytes += len(chunk)
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def send_whole(self, start: dict, body: bytes, encoding: str, request_headers: RawHeaders,
+                         method: str, send) -> None:
+        """Envía una respuesta de un solo mensaje, comprimida si llega al tamaño mínimo"""
+        headers = start["headers"]
+        if len(body) < self.minimum_size:
+            await send({**start, "headers": _add_vary(headers)})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        key = None
+        compressed = None
+        if self.cache is not None and _cacheable(request_headers, method, start["status"], headers):
+            key = self.cache.key(encoding, body)
+            compressed = self.cache.get(key)
+            if compressed is not None:
+                metrics.compression_cache_hits += 1
+            else:
+                metrics.compression_cache_misses += 1
+        if compressed is None:
+            if len(body) >= THREADPOOL_MIN_SIZE:
+                compressed = await run_in_threadpool(compress, body, encoding, self.gzip_level, self.brotli_quality)
+            else:
+                compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            if key is not None:
+                self.cache.put(key, compressed)
+
+        metrics.compression_input_bytes += len(body)
+        metrics.compression_output_bytes += len(compressed)
+        await send({**start, "headers": _encoded_headers(headers, encoding, len(compressed))})
+        await send({"type": "http.response.body", "body": compressed})
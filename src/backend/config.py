@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 import os
 from pathlib import Path
 
@@ -22,6 +22,17 @@ class Settings(BaseSettings):
     
     BACKEND_HOST: str = "0.0.0.0"
     BACKEND_PORT: int = 8000
+    
+    # Servidor de producción (ver serve.py)
+    WEB_WORKERS: int = 0  # 0 = uno por CPU
+    WEB_PRELOAD: bool = True
+    WEB_KEEPALIVE: int = 5
+    WEB_BACKLOG: int = 2048
+    WEB_MAX_REQUESTS: int = 10000  # 0 = no reciclar workers
+    WEB_MAX_REQUESTS_JITTER: int = 1000
+    WEB_TIMEOUT: int = 60
+    WEB_GRACEFUL_TIMEOUT: int = 30
+    SHUTDOWN_DRAIN_SECONDS: float = 5  # espera extra en el lifespan (ver lifecycle.py)
     FRONTEND_PORT: int = 5173
     
     ENVIRONMENT: str = "development"
@@ -29,6 +40,79 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = 10485760
     UPLOAD_DIR: str = "./uploads"
     
+    # Almacenamiento de archivos subidos (ver storage.py)
+    STORAGE_BACKEND: str = "local"  # local o s3
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: Optional[str] = None  # p. ej. http://localhost:9000 para MinIO
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    STORAGE_PUBLIC_BASE_URL: Optional[str] = None  # bucket público o CDN; si no, URLs firmadas
+    STORAGE_PRESIGN_EXPIRES: int = 900
+    MEDIA_DELETE_GRACE_SECONDS: float = 3600  # un archivo más reciente no se borra (ver tasks.delete_media)
+    
+    # Caché de favoritos por usuario (ver liked_cache.py). Con EVENTS_BACKEND=redis los
+    # workers se avisan de cada like; sin él, con varios workers, un like de otro worker
+    # tarda en verse lo que dure la entrada, así que se usa el TTL corto
+    LIKED_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    LIKED_CACHE_TTL_SECONDS: int = 300  # un solo worker o con el puente de Redis
+    LIKED_CACHE_UNSHARED_TTL_SECONDS: float = 5  # varios workers sin puente
+    
+    # Índice de sugerencias de búsqueda (ver search_index.py)
+    SUGGEST_INDEX_REFRESH_SECONDS: float = 60  # 0 = solo se reconstruye por cambios locales
+    
+    # Canciones similares (ver recommendations.py)
+    SIMILAR_SONGS_TOP_K: int = 50
+    SIMILARITY_METHOD: str = "cosine"  # cosine o pmi
+    SIMILARITY_BLOCK_SIZE: int = 2048
+    
+    # Métricas de Prometheus en /metrics (ver metrics.py)
+    METRICS_ENABLED: bool = True
+    
+    # Perfilador de SQL por petición (ver sql_profiler.py); apagado no registra nada
+    SQL_PROFILER_ENABLED: bool = False
+    SQL_PROFILER_REPEAT_THRESHOLD: int = 10
+    SQL_SLOW_QUERY_MS: float = 200
+    SQL_SERVER_TIMING: bool = False
+    
+    # Límites de tasa por usuario/IP y control de admisión (ver rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory o redis
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMITS: Dict[str, str] = {
+        "play": "120/minute:30",
+        "like": "60/minute:20",
+        "playlist_songs": "120/minute:30",
+    }
+    RATE_LIMIT_IP_FACTOR: float = 5
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENCY: int = 14  # pool por defecto (5 + 10 de overflow) menos una para tareas de fondo
+    ADMISSION_MAX_WAIT_MS: int = 500
+    ADMISSION_MAX_QUEUE: int = 200
+    
+    # Cola de trabajos en segundo plano (ver jobs.py y worker.py)
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 10
+    JOB_RETRY_MAX_SECONDS: float = 3600
+    JOB_LEASE_SECONDS: float = 600  # un trabajo en marcha más tiempo se da por abandonado
+    JOB_POLL_INTERVAL: float = 1.0
+    WORKER_METRICS_PORT: int = 0  # 0 = el worker no expone /metrics
+    
+    # Compresión de las respuestas de la API (ver compression.py)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes; por debajo no compensa
+    COMPRESSION_GZIP_LEVEL: int = 5
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    
+    # Eventos en vivo por server-sent events (ver events.py)
+    EVENTS_FLUSH_INTERVAL: float = 0.25  # segundos; ventana en la que se agrupan y fusionan eventos
+    EVENTS_HEARTBEAT_SECONDS: float = 15
+    EVENTS_MAX_TOPICS: int = 50  # temas por conexión
+    EVENTS_MAX_QUEUE: int = 256  # bloques sin leer antes de cortar a un cliente lento
+    EVENTS_BACKEND: str = "memory"  # memory (cada worker por su cuenta) o redis (todos los workers)
+    EVENTS_REDIS_URL: str = "redis://localhost:6379/0"
+
     class Config:
         env_file = str(ENV_FILE)
         env_file_encoding = 'utf-8'
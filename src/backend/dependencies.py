@@ -7,6 +7,7 @@ from models import User, UserRole
 from auth import verify_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 
 async def get_current_user(
@@ -33,6 +34,19 @@ async def get_current_user(
     return user
 
 
+def user_from_token(db: Session, token: Optional[str]) -> Optional[User]:
+    """Usuario activo del token, o None si falta o no es válido"""
+    if token is None:
+        return None
+    token_data = verify_token(token)
+    if token_data is None or token_data.email is None:
+        return None
+    user = db.query(User).filter(User.email == token_data.email).first()
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -0,0 +1,392 @@
+"""
+Eventos en vivo por server-sent events (GET /events, ver routes/events.py).
+
+Los clientes se suscriben a temas:
+- "catalog": canciones y álbumes aprobados o retirados del catálogo;
+- "song:<id>": contadores de una canción (reproducciones);
+- "playlist:<id>": cambios en una playlist (canciones, orden, borrado).
+
+Las rutas publican con `events.publish(tema, evento, datos, key)` después del
+commit; publicar solo guarda el evento en un buffer del proceso y no espera a
+nadie. Cada EVENTS_FLUSH_INTERVAL un único publicador vacía el buffer:
+- Los eventos con la misma (evento, key) dentro de la ventana se fusionan y
+  gana el último. Cien reproducciones de una canción en un cuarto de segundo
+  son un solo evento con el contador final.
+- Cada tema se codifica una sola vez y ese mismo bloque de bytes se pone en la
+  cola de todos sus suscriptores.
+- Si nadie escucha el tema en este proceso (y no hay puente), publicar no
+  hace nada.
+
+Un suscriptor ocioso es una corrutina esperando un asyncio.Event y otra
+esperando la desconexión; no tiene temporizadores propios. El latido (un
+comentario SSE cada EVENTS_HEARTBEAT_SECONDS, para que los proxies no corten
+la conexión) lo envía el publicador a todos a la vez con el mismo bloque. Un
+cliente que no lee y acumula EVENTS_MAX_QUEUE bloques se desconecta;
+EventSource reconecta solo.
+
+Con EVENTS_BACKEND=redis el publicador además envía cada lote a un canal de
+Redis y reparte los lotes que llegan de otros workers, así un cliente conectado
+a un worker ve lo que pasa en todos. Sin Redis (memory) cada worker solo ve sus
+propias escrituras. El mismo puente lleva temas internos que no se pueden
+suscribir por GET /events: "liked" avisa a los demás workers de que los
+favoritos de un usuario cambiaron (ver liked_cache.py); se atienden con
+`events.on_remote(tema, handler)`.
+
+Las conexiones abiertas retrasarían el apagado del worker: `close_streams`
+(registrado en lifecycle.on_stopping) las termina en cuanto el servidor deja de
+aceptar conexiones.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from starlette.responses import Response
+
+from config import settings
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+CATALOG = "catalog"
+LIKED = "liked"  # interno, solo entre workers
+REDIS_CHANNEL = "events"
+RETRY_MILLISECONDS = 3000  # espera de EventSource antes de reconectar
+REDIS_RECONNECT_SECONDS = 1.0
+HEARTBEAT = b": ping\n\n"
+
+
+def song_topic(song_id: int) -> str:
+    return f"song:{song_id}"
+
+
+def playlist_topic(playlist_id: int) -> str:
+    return f"playlist:{playlist_id}"
+
+
+def encode_events(topic: str, events: Iterable[Tuple[str, Any]]) -> bytes:
+    """Bloque SSE con los eventos de un tema; el tema va en los datos para que el cliente los enrute"""
+    return b"".join(
+        b"event: " + event.encode() + b"\ndata: " + dumps({"topic": topic, "data": data}) + b"\n\n"
+        for event, data in events
+    )
+
+
+class Subscriber:
+    __slots__ = ("topics", "chunks", "wakeup", "closed")
+
+    def __init__(self, topics: Set[str]):
+        self.topics = topics
+        self.chunks: deque = deque()
+        self.wakeup = asyncio.Event()
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+        self.wakeup.set()
+
+
+class RedisBridge:
+    """Reparte los lotes entre workers por pub/sub de Redis (requiere el paquete redis)"""
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:
+            raise RuntimeError("EVENTS_BACKEND=redis requires the 'redis' package") from exc
+        self._client = redis_asyncio.from_url(url)
+
+    async def publish(self, message: bytes) -> None:
+        await self._client.publish(REDIS_CHANNEL, message)
+
+    async def listen(self, handle) -> None:
+        """Llama a `handle(mensaje)` por cada lote publicado; reconecta si Redis se cae"""
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(REDIS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event bridge disconnected, retrying in %ss", REDIS_RECONNECT_SECONDS)
+                await asyncio.sleep(REDIS_RECONNECT_SECONDS)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class EventHub:
+    def __init__(
+        self,
+        flush_interval: float,
+        heartbeat_seconds: float,
+        max_queue: int,
+        bridge: Optional[RedisBridge] = None,
+    ):
+        self.flush_interval = flush_interval
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_queue = max_queue
+        self.bridge = bridge
+        self.origin = uuid.uuid4().hex
+        self._topics: Dict[str, Set[Subscriber]] = {}
+        self._subscribers: Set[Subscriber] = set()
+        # tema -> (evento, key) -> (evento, datos), en orden de publicación
+        self._pending: Dict[str, Dict[Hashable, Tuple[str, Any]]] = {}
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[int] = None
+        self._dirty: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._remote_handlers: Dict[str, Callable[[List[Tuple[str, Any]]], None]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.get_ident()
+        self._dirty = asyncio.Event()
+        self._tasks = [self._loop.create_task(self._run())]
+        if self.bridge is not None:
+            self._tasks.append(self._loop.create_task(self.bridge.listen(self._receive)))
+
+    def close_streams(self) -> None:
+        """Termina todas las conexiones abiertas (apagado del worker)"""
+        for subscriber in list(self._subscribers):
+            subscriber.close()
+
+    async def stop(self) -> None:
+        self.close_streams()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        if self.bridge is not None:
+            await self.bridge.close()
+
+    def on_remote(self, topic: str, handler: Callable[[List[Tuple[str, Any]]], None]) -> None:
+        """Llama a `handler(eventos)` con los lotes de `topic` que publican otros workers (solo con puente)"""
+        self._remote_handlers[topic] = handler
+
+    def subscribe(self, topics: Iterable[str]) -> Subscriber:
+        subscriber = Subscriber(set(topics))
+        self._subscribers.add(subscriber)
+        for topic in subscriber.topics:
+            self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        for topic in subscriber.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, topic: str, event: str, data: Any, key: Optional[Hashable] = None) -> None:
+        """
+        Agrega un evento al próximo lote. Con `key`, los eventos iguales de la
+        misma ventana se fusionan (gana el último); sin ella se envían todos
+        """
+        if self._loop is None or (self.bridge is None and topic not in self._topics):
+            return
+        if threading.get_ident() != self._thread:
+            # Rutas síncronas (threadpool): el buffer solo se toca desde el bucle
+            self._loop.call_soon_threadsafe(self.publish, topic, event, data, key)
+            return
+        pending = self._pending.setdefault(topic, {})
+        if key is None:
+            key = next(self._sequence)
+        else:
+            key = (event, key)
+            pending.pop(key, None)  # el último va al final, en su orden de publicación
+        pending[key] = (event, data)
+        self.published += 1
+        self._dirty.set()
+
+    def _push(self, subscribers: Iterable[Subscriber], chunk: bytes) -> None:
+        for subscriber in list(subscribers):
+            if subscriber.closed:
+                continue  # la respuesta aún no ha salido de su bucle
+            if len(subscriber.chunks) >= self.max_queue:
+                # Cliente que no lee: se corta y EventSource reconecta
+                self.dropped += 1
+                subscriber.close()
+                continue
+            subscriber.chunks.append(chunk)
+            subscriber.wakeup.set()
+
+    def _deliver(self, batch: Dict[str, List[Tuple[str, Any]]]) -> None:
+        for topic, events in batch.items():
+            subscribers = self._topics.get(topic)
+            if subscribers:
+                self._push(subscribers, encode_events(topic, events))
+
+    def _receive(self, message: bytes) -> None:
+        """Lote publicado por algún worker a través del puente"""
+        try:
+            batch = json.loads(message)
+        except ValueError:
+            logger.warning("Ignoring malformed event batch")
+            return
+        if batch.get("origin") == self.origin:
+            return
+        self._deliver(batch["topics"])
+        for topic, events in batch["topics"].items():
+            handler = self._remote_handlers.get(topic)
+            if handler is not None:
+                try:
+                    handler(events)
+                except Exception:
+                    logger.exception("Remote handler for %s failed", topic)
+
+    async def _flush(self) -> None:
+        self._dirty.clear()
+        pending, self._pending = self._pending, {}
+        batch = {topic: list(events.values()) for topic, events in pending.items()}
+        self._deliver(batch)
+        if self.bridge is not None:
+            try:
+                await self.bridge.publish(dumps({"origin": self.origin, "topics": batch}))
+            except Exception:
+                logger.exception("Could not publish %d event topics to the bridge", len(batch))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + self.heartbeat_seconds
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), max(0.0, next_heartbeat - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+            else:
+                # Ventana de agrupación: lo que llegue mientras tanto va en el mismo lote
+                await asyncio.sleep(self.flush_interval)
+                await self._flush()
+            if loop.time() >= next_heartbeat:
+                self._push(self._subscribers, HEARTBEAT)
+                next_heartbeat = loop.time() + self.heartbeat_seconds
+
+    def render_metrics(self) -> str:
+        lines = [
+            "# HELP events_subscribers Open event streams in this worker.",
+            "# TYPE events_subscribers gauge",
+            f"events_subscribers {len(self._subscribers)}",
+            "# HELP events_published_total Events published by this worker, before coalescing.",
+            "# TYPE events_published_total counter",
+            f"events_published_total {self.published}",
+            "# HELP events_dropped_subscribers_total Event streams closed because the client fell behind.",
+            "# TYPE events_dropped_subscribers_total counter",
+            f"events_dropped_subscribers_total {self.dropped}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class EventStreamResponse(Response):
+    """Respuesta text/event-stream de un suscriptor; termina cuando el cliente se va o el hub la cierra"""
+
+    media_type = "text/event-stream"
+
+    def __init__(self, hub: EventHub, topics: Iterable[str], status_code: int = 200):
+        self.hub = hub
+        self.topics = set(topics)
+        self.status_code = status_code
+        self.background = None
+        # Sin cuerpo fijo no hay Content-Length; X-Accel-Buffering evita el buffer de nginx
+        self.init_headers({"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @staticmethod
+    async def _wait_disconnect(receive, subscriber: Subscriber) -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        subscriber.close()
+
+    async def __call__(self, scope, receive, send) -> None:
+        subscriber = self.hub.subscribe(self.topics)
+        watcher = asyncio.get_running_loop().create_task(self._wait_disconnect(receive, subscriber))
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({
+                "type": "http.response.body",
+                "body": f"retry: {RETRY_MILLISECONDS}\n\n".encode(),
+                "more_body": True,
+            })
+            while not subscriber.closed:
+                await subscriber.wakeup.wait()
+                subscriber.wakeup.clear()
+                if subscriber.chunks and not watcher.done():
+                    body = b"".join(subscriber.chunks)
+                    subscriber.chunks.clear()
+                    await send({"type": "http.response.body", "body": body, "more_body": True})
+            if not watcher.done():
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.hub.unsubscribe(subscriber)
+            watcher.cancel()
+
+
+def create_event_hub() -> EventHub:
+    if settings.EVENTS_BACKEND == "redis":
+        bridge = RedisBridge(settings.EVENTS_REDIS_URL)
+    elif settings.EVENTS_BACKEND == "memory":
+        bridge = None
+    else:
+        raise ValueError(f"Unknown EVENTS_BACKEND: {settings.EVENTS_BACKEND}")
+    return EventHub(
+        settings.EVENTS_FLUSH_INTERVAL,
+        settings.EVENTS_HEARTBEAT_SECONDS,
+        settings.EVENTS_MAX_QUEUE,
+        bridge,
+    )
+
+
+events = create_event_hub()
+
+
+# Eventos que publican las rutas, siempre después del commit
+
+def song_counters(song_id: int, play_count: int) -> None:
+    events.publish(song_topic(song_id), "counters", {"id": song_id, "play_count": play_count}, key=song_id)
+
+
+def songs_approved(songs: Iterable) -> None:
+    for song in songs:
+        events.publish(CATALOG, "song_approved", {"id": song.id, "title": song.title, "artist": song.artist}, key=song.id)
+
+
+def songs_removed(song_ids: Iterable[int]) -> None:
+    for song_id in song_ids:
+        events.publish(CATALOG, "song_removed", {"id": song_id}, key=song_id)
+        events.publish(song_topic(song_id), "song_removed", {"id": song_id}, key=song_id)
+
+
+def albums_approved(albums: Iterable) -> None:
+    for album in albums:
+        events.publish(CATALOG, "album_approved", {"id": album.id, "title": album.title}, key=album.id)
+
+
+def albums_removed(album_ids: Iterable[int]) -> None:
+    for album_id in album_ids:
+        events.publish(CATALOG, "album_removed", {"id": album_id}, key=album_id)
+
+
+def playlist_changed(playlist_id: int, change: str) -> None:
+    """change: songs, order o deleted; el cliente vuelve a pedir la playlist"""
+    events.publish(playlist_topic(playlist_id), "playlist_changed", {"id": playlist_id, "change": change}, key=change)
+
+
+def liked_changed(user_id: Optional[int]) -> None:
+    """Favoritos de un usuario (None: de todos) cambiados; solo lo reciben los demás workers"""
+    events.publish(LIKED, "changed", {"user_id": user_id}, key=user_id)
@@ -0,0 +1,126 @@
+"""
+Facetas de género y artista del catálogo.
+
+Song.genre y Song.artist siguen siendo texto libre, pero cada canción apunta
+además a una fila normalizada de `genres` y `artists` (por slug sin acentos ni
+mayúsculas, en cualquier alfabeto: "Ёлка" -> "елка", "J-ポップ" -> "j-ポップ").
+Cada faceta guarda cuántas canciones aprobadas tiene; el conteo
+se ajusta al crear, aprobar y borrar canciones, nunca con GROUP BY al servir.
+"""
+import unicodedata
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Artist, Genre, Song
+
+# Valores que la interfaz envía cuando no hay género
+EMPTY_GENRES = {"", "sin género", "sin genero", "none"}
+
+# Solo se quitan los acentos (diacríticos combinables); otras marcas, como el
+# dakuten japonés o el virama del devanagari, cambian la letra y se conservan
+ACCENTS = range(0x0300, 0x0370)
+
+
+def fold_text(value: str) -> str:
+    """Minúsculas, sin acentos y con espacios simples: 'Rock  Alternativo' -> 'rock alternativo'"""
+    if not value.isascii():
+        decomposed = unicodedata.normalize("NFKD", value)
+        value = unicodedata.normalize("NFC", "".join(char for char in decomposed if ord(char) not in ACCENTS))
+    return " ".join(value.casefold().split())
+
+
+def _is_word_char(char: str) -> bool:
+    # Las marcas (vocales del devanagari, virama) son parte de la palabra aunque no sean isalnum
+    return char.isalnum() or unicodedata.category(char).startswith("M")
+
+
+def facet_slug(name: str) -> str:
+    """Letras, marcas y dígitos de cualquier alfabeto unidos por guiones: 'AC/DC' -> 'ac-dc'"""
+    folded = fold_text(name)
+    return "-".join("".join(char if _is_word_char(char) else " " for char in folded).split())
+
+
+def normalize_genre(value: Optional[str]) -> Optional[str]:
+    """Género limpio para mostrar, o None si está vacío o es un marcador"""
+    if value is None:
+        return None
+    cleaned = " ".join(value.split())
+    if fold_text(cleaned) in EMPTY_GENRES or not facet_slug(cleaned):
+        return None
+    return cleaned
+
+
+def normalize_artist(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    cleaned = " ".join(value.split())
+    return cleaned if facet_slug(cleaned) else None
+
+
+def get_or_create(db: Session, model, name: Optional[str]) -> Optional[int]:
+    """Id de la faceta con ese nombre, creándola si no existe"""
+    if name is None:
+        return None
+    slug = facet_slug(name)
+    facet_id = db.execute(select(model.id).where(model.slug == slug)).scalar()
+    if facet_id is not None:
+        return facet_id
+
+    # Otra petición puede crear la misma faceta a la vez; el slug es único
+    try:
+        with db.begin_nested():
+            facet = model(name=name, slug=slug, song_count=0)
+            db.add(facet)
+        return facet.id
+    except IntegrityError:
+        return db.execute(select(model.id).where(model.slug == slug)).scalar()
+
+
+def assign_facets(db: Session, song: Song) -> None:
+    """Normaliza género y artista de la canción y enlaza sus facetas"""
+    song.genre = normalize_genre(song.genre)
+    song.genre_id = get_or_create(db, Genre, song.genre)
+    song.artist_id = get_or_create(db, Artist, normalize_artist(song.artist))
+
+
+def adjust_counts(db: Session, songs: Iterable, delta: int) -> None:
+    """
+    Suma `delta` al conteo de las facetas de las canciones dadas (objetos o
+    filas con genre_id y artist_id), agrupando en un UPDATE por faceta
+    """
+    genres, artists = Counter(), Counter()
+    for song in songs:
+        if song.genre_id is not None:
+            genres[song.genre_id] += delta
+        if song.artist_id is not None:
+            artists[song.artist_id] += delta
+
+    for model, counts in ((Genre, genres), (Artist, artists)):
+        for facet_id, change in counts.items():
+            db.execute(
+                update(model)
+                .where(model.id == facet_id)
+                .values(song_count=model.song_count + change)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def approved_song_facets(db: Session, *criteria) -> list:
+    """genre_id y artist_id de las canciones aprobadas que cumplen los criterios"""
+    return db.query(Song.genre_id, Song.artist_id).filter(Song.is_approved == True, *criteria).all()
+
+
+def recount(db: Session | Connection) -> None:
+    """Recalcula todos los conteos desde cero (backfill, importaciones)"""
+    for model, column in ((Genre, Song.genre_id), (Artist, Song.artist_id)):
+        counted = (
+            select(func.count(Song.id))
+            .where(column == model.id, Song.is_approved == True)
+            .scalar_subquery()
+        )
+        db.execute(update(model).values(song_count=counted).execution_options(synchronize_session=False))
@@ -0,0 +1,225 @@
+"""
+Cola de trabajos en segundo plano persistida en la tabla jobs.
+
+Las rutas encolan con `enqueue(db, kind, payload)` dentro de su propia
+transacción (el trabajo existe si y solo si se confirma lo que lo originó) y
+responden sin esperar; worker.py, un proceso aparte, los ejecuta:
+- `claim` toma el siguiente trabajo pendiente con SELECT ... FOR UPDATE SKIP
+  LOCKED, así varios workers sobre PostgreSQL no se pisan. SQLite ignora el
+  FOR UPDATE y serializa las escrituras: en local basta un worker.
+- El handler registrado con `@task(kind)` recibe la sesión y el payload; lo
+  que escriba se confirma en la misma transacción que marca el trabajo como
+  terminado.
+- Si falla se reintenta con espera exponencial (JOB_RETRY_BASE_SECONDS,
+  duplicándose hasta JOB_RETRY_MAX_SECONDS, con jitter) hasta max_attempts;
+  PermanentError lo da por fallido sin reintentar.
+- Un trabajo que lleva más de JOB_LEASE_SECONDS en marcha se considera
+  abandonado (el worker murió) y `requeue_stale` lo devuelve a la cola.
+  Por eso los handlers deben poder ejecutarse más de una vez.
+
+Las claves de idempotencia son únicas: encolar otra vez con la misma clave
+devuelve el trabajo existente en lugar de crear otro.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import Job
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+# Estados que se cuentan en las métricas (los terminados crecen sin límite)
+OPEN_STATUSES = (QUEUED, RUNNING, FAILED)
+
+MAX_ERROR_LENGTH = 2000
+
+Handler = Callable[[Session, dict], Optional[dict]]
+_handlers: Dict[str, Handler] = {}
+
+
+class PermanentError(Exception):
+    """Error que no se arregla reintentando (p. ej. el archivo ya no existe)"""
+
+
+def task(kind: str) -> Callable[[Handler], Handler]:
+    """Registra el handler de un tipo de trabajo; devuelve un dict JSON con el resultado o None"""
+    def register(handler: Handler) -> Handler:
+        _handlers[kind] = handler
+        return handler
+    return register
+
+
+def get_handler(kind: str) -> Optional[Handler]:
+    return _handlers.get(kind)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value: datetime) -> datetime:
+    """SQLite devuelve las fechas sin zona; se guardan siempre en UTC"""
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def retry_delay(attempts: int) -> float:
+    """Segundos hasta el siguiente intento tras `attempts` intentos fallidos"""
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict,
+    idempotency_key: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+) -> int:
+    """
+    Agrega un trabajo a la transacción de `db` y devuelve su id (el que ya
+    existía si la clave de idempotencia está repetida). No confirma: lo hace
+    quien llama
+    """
+    values = {
+        "kind": kind,
+        "payload": payload,
+        "idempotency_key": idempotency_key,
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.JOB_MAX_ATTEMPTS,
+        "run_at": utcnow() + timedelta(seconds=delay),
+        "owner_id": owner_id,
+    }
+    if idempotency_key is None:
+        return db.execute(Job.__table__.insert().values(values).returning(Job.id)).scalar_one()
+
+    dialect = db.get_bind().dialect.name
+    insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+    statement = insert(Job).values(values).on_conflict_do_nothing(
+        index_elements=["idempotency_key"]
+    ).returning(Job.id)
+    job_id = db.execute(statement).scalar()
+    if job_id is None:
+        job_id = db.execute(select(Job.id).where(Job.idempotency_key == idempotency_key)).scalar_one()
+    return job_id
+
+
+def claim(db: Session, worker_id: str, kinds: Optional[Iterable[str]] = None) -> Optional[Job]:
+    """Marca como en marcha el siguiente trabajo pendiente y lo devuelve (None si no hay)"""
+    now = utcnow()
+    query = select(Job).where(Job.status == QUEUED, Job.run_at <= now)
+    if kinds:
+        query = query.where(Job.kind.in_(list(kinds)))
+    query = query.order_by(Job.run_at).limit(1).with_for_update(skip_locked=True)
+    job = db.execute(query).scalar_one_or_none()
+    if job is None:
+        db.rollback()
+        return None
+
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == QUEUED)
+        .values(status=RUNNING, attempts=Job.attempts + 1, locked_by=worker_id, locked_at=now, started_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+    db.refresh(job)
+    return job
+
+
+def complete(db: Session, job: Job, result: Optional[dict]) -> bool:
+    """Da el trabajo por terminado y confirma junto con lo que haya escrito el handler"""
+    finished = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == RUNNING, Job.locked_by == job.locked_by)
+        .values(status=SUCCEEDED, result=result, last_error=None, locked_by=None, finished_at=utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(finished)
+
+
+def fail(db: Session, job: Job, error: str, retry: bool = True) -> str:
+    """Programa el siguiente intento o lo da por fallido; devuelve el nuevo estado"""
+    now = utcnow()
+    if retry and job.attempts < job.max_attempts:
+        values = {"status": QUEUED, "run_at": now + timedelta(seconds=retry_delay(job.attempts))}
+    else:
+        values = {"status": FAILED, "finished_at": now}
+    db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == RUNNING, Job.locked_by == job.locked_by)
+        .values(last_error=error[:MAX_ERROR_LENGTH], locked_by=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return values["status"]
+
+
+def requeue_stale(db: Session, lease_seconds: float) -> int:
+    """Devuelve a la cola (o da por fallidos si no quedan intentos) los trabajos abandonados"""
+    now = utcnow()
+    stale = (Job.status == RUNNING) & (Job.locked_at < now - timedelta(seconds=lease_seconds))
+    error = f"Lease expired after {lease_seconds:g}s"
+    failed = db.execute(
+        update(Job).where(stale, Job.attempts >= Job.max_attempts)
+        .values(status=FAILED, locked_by=None, last_error=error, finished_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.execute(
+        update(Job).where(stale)
+        .values(status=QUEUED, locked_by=None, last_error=error, run_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return failed + requeued
+
+
+def retry(db: Session, job_id: int) -> bool:
+    """Vuelve a encolar un trabajo fallido con los intentos a cero"""
+    retried = db.execute(
+        update(Job).where(Job.id == job_id, Job.status == FAILED)
+        .values(status=QUEUED, attempts=0, run_at=utcnow(), finished_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(retried)
+
+
+def render_queue_metrics(db: Session) -> str:
+    """Profundidad de la cola y antigüedad del trabajo listo más antiguo, en formato de Prometheus"""
+    now = utcnow()
+    depth = db.execute(
+        select(Job.kind, Job.status, func.count())
+        .where(Job.status.in_(OPEN_STATUSES))
+        .group_by(Job.kind, Job.status)
+    ).all()
+    oldest = db.execute(
+        select(Job.kind, func.min(Job.run_at))
+        .where(Job.status == QUEUED, Job.run_at <= now)
+        .group_by(Job.kind)
+    ).all()
+
+    lines: List[str] = [
+        "# HELP job_queue_depth Background jobs by kind and status (queued, running, failed).",
+        "# TYPE job_queue_depth gauge",
+    ]
+    for kind, status, count in sorted(depth):
+        lines.append(f'job_queue_depth{{kind="{kind}",status="{status}"}} {count}')
+    lines.append("# HELP job_queue_oldest_seconds Time the oldest runnable job has been waiting for a worker.")
+    lines.append("# TYPE job_queue_oldest_seconds gauge")
+    for kind, run_at in sorted(oldest):
+        lines.append(f'job_queue_oldest_seconds{{kind="{kind}"}} {(now - as_utc(run_at)).total_seconds():.3f}')
+    return "\n".join(lines) + "\n"
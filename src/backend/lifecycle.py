@@ -0,0 +1,126 @@
+"""
+Apagado ordenado de un worker.
+
+Secuencia cuando el worker recibe SIGTERM (despliegue, reciclaje por
+WEB_MAX_REQUESTS, escalado):
+0. En cuanto uvicorn decide salir, el worker de serve.py llama a
+   `lifecycle.stopping()`, que ejecuta los hooks de `on_stopping`: cierran
+   las conexiones que no terminan solas (los streams de events.py), que si no
+   ocuparían todo el plazo del paso 1. Sin ese worker (uvicorn directo) los
+   hooks corren al principio del paso 2.
+1. uvicorn deja de aceptar conexiones, cierra las keep-alive ociosas y espera
+   a que terminen las peticiones en curso hasta timeout_graceful_shutdown;
+   pasado ese plazo cancela las que queden (serve.py lo deja un poco por
+   debajo del graceful_timeout de gunicorn, para que nunca llegue el SIGKILL
+   antes de limpiar).
+2. Shutdown del lifespan (main.py): `lifecycle.shutdown()` marca el worker
+   como drenando (DrainMiddleware responde 503 con Connection: close a lo que
+   aún entre), espera hasta SHUTDOWN_DRAIN_SECONDS a que las peticiones
+   contadas terminen de deshacerse y ejecuta los hooks registrados con
+   `on_shutdown` (vaciado de buffers en memoria), en orden inverso al de
+   registro.
+3. Después main.py borra los .part de subidas de este proceso que hayan
+   quedado a medias y cierra el pool con engine.dispose().
+"""
+import asyncio
+import inspect
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+DRAIN_POLL_INTERVAL = 0.05
+
+
+class Lifecycle:
+    def __init__(self):
+        self.in_flight = 0
+        self.draining = False
+        self._hooks: List[Callable] = []
+        self._stopping_hooks: List[Callable] = []
+        self._stopped = False
+
+    def on_shutdown(self, hook: Callable) -> Callable:
+        """Registra una función (o corrutina) a ejecutar al apagar; sirve como decorador"""
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+        return hook
+
+    def on_stopping(self, hook: Callable) -> Callable:
+        """Registra una función síncrona a ejecutar cuando el servidor deja de aceptar conexiones"""
+        if hook not in self._stopping_hooks:
+            self._stopping_hooks.append(hook)
+        return hook
+
+    def stopping(self) -> None:
+        """Ejecuta los hooks de on_stopping una sola vez por arranque"""
+        if self._stopped:
+            return
+        self._stopped = True
+        for hook in self._stopping_hooks:
+            try:
+                hook()
+            except Exception:
+                logger.exception("Stopping hook %s failed", getattr(hook, "__qualname__", hook))
+
+    async def drain(self, timeout: float) -> bool:
+        """Rechaza peticiones nuevas y espera a las que están en curso; True si terminaron todas"""
+        self.draining = True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.in_flight and loop.time() < deadline:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        return self.in_flight == 0
+
+    async def shutdown(self, timeout: float) -> None:
+        self.stopping()
+        if not await self.drain(timeout):
+            logger.warning("Shutting down with %d requests still in flight", self.in_flight)
+        for hook in reversed(self._hooks):
+            try:
+                result = hook()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Shutdown hook %s failed", getattr(hook, "__qualname__", hook))
+
+    def reset(self) -> None:
+        """Vuelve a aceptar peticiones (un nuevo arranque del lifespan en el mismo proceso)"""
+        self.draining = False
+        self._stopped = False
+
+
+lifecycle = Lifecycle()
+
+
+class DrainMiddleware:
+    """Cuenta las peticiones en curso y responde 503 mientras el worker se apaga"""
+
+    def __init__(self, app, state: Lifecycle = lifecycle):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = self.state
+        if state.draining:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", b"1"),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server is shutting down"}'})
+            return
+
+        state.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            state.in_flight -= 1
@@ -0,0 +1,158 @@
+"""
+Caché en memoria de las canciones favoritas de cada usuario.
+
+Por usuario se guarda un arreglo ordenado y compacto de ids de canción
+(array('i'), 4 bytes por favorito) que se carga la primera vez que se consulta
+y se mantiene al día en like/unlike. La pertenencia se responde con bisect,
+también para lotes de ids. Los usuarios menos usados se desalojan (LRU) cuando
+el total supera el presupuesto de memoria.
+
+La caché es por proceso. Con EVENTS_BACKEND=redis cada like o unlike avisa a
+los demás workers por el puente de eventos (events.liked_changed) y estos
+descartan la entrada del usuario. Sin puente, con varios workers, un like hecho
+en otro proceso solo se ve cuando la entrada expira, así que entonces se usa
+LIKED_CACHE_UNSHARED_TTL_SECONDS (unos segundos) en lugar de
+LIKED_CACHE_TTL_SECONDS. En cualquier caso solo responde lecturas (is_liked,
+/songs/liked/check); like y unlike deciden con la base y después actualizan la
+caché.
+"""
+import multiprocessing
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Iterable, Set
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from events import LIKED, events
+from models import LikedSong
+
+
+class LikedSongsCache:
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # user_id -> (ids, loaded_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(ids: array) -> int:
+        return sys.getsizeof(ids)
+
+    def _load(self, db: Session, user_id: int) -> array:
+        rows = db.query(LikedSong.song_id).filter(LikedSong.user_id == user_id).order_by(LikedSong.song_id)
+        ids = array("i", (row.song_id for row in rows))
+
+        with self._lock:
+            previous = self._entries.pop(user_id, None)
+            if previous is not None:
+                self._bytes -= self._size(previous[0])
+            self._entries[user_id] = (ids, time.monotonic())
+            self._bytes += self._size(ids)
+            # Desalojar los usuarios usados hace más tiempo, nunca el actual
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+        return ids
+
+    def _get(self, db: Session, user_id: int) -> array:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        return self._load(db, user_id)
+
+    def contains(self, db: Session, user_id: int, song_id: int) -> bool:
+        ids = self._get(db, user_id)
+        index = bisect_left(ids, song_id)
+        return index < len(ids) and ids[index] == song_id
+
+    def contains_many(self, db: Session, user_id: int, song_ids: Iterable[int]) -> Set[int]:
+        """Devuelve el subconjunto de `song_ids` que el usuario tiene en favoritos"""
+        ids = self._get(db, user_id)
+        size = len(ids)
+        liked = set()
+        for song_id in song_ids:
+            index = bisect_left(ids, song_id)
+            if index < size and ids[index] == song_id:
+                liked.add(song_id)
+        return liked
+
+    def add(self, user_id: int, song_id: int) -> None:
+        """Registra un like ya confirmado; si el usuario no está cargado no hace nada"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            ids = entry[0]
+            index = bisect_left(ids, song_id)
+            if index == len(ids) or ids[index] != song_id:
+                self._bytes -= self._size(ids)
+                insort(ids, song_id)
+                self._bytes += self._size(ids)
+
+    def remove(self, user_id: int, song_id: int) -> None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            ids = entry[0]
+            index = bisect_left(ids, song_id)
+            if index < len(ids) and ids[index] == song_id:
+                self._bytes -= self._size(ids)
+                del ids[index]
+                self._bytes += self._size(ids)
+
+    def invalidate(self, user_id: int | None = None) -> None:
+        """Descarta un usuario o, sin argumentos, toda la caché"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._bytes -= self._size(entry[0])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def cache_ttl() -> float:
+    # Mismo número de workers que serve.worker_count
+    workers = settings.WEB_WORKERS or multiprocessing.cpu_count()
+    if events.bridge is None and workers > 1:
+        return settings.LIKED_CACHE_UNSHARED_TTL_SECONDS
+    return settings.LIKED_CACHE_TTL_SECONDS
+
+
+liked_songs_cache = LikedSongsCache(
+    max_bytes=settings.LIKED_CACHE_MAX_BYTES,
+    ttl_seconds=cache_ttl(),
+)
+
+
+def _invalidate_remote(batch: list) -> None:
+    """Likes y unlikes hechos en otros workers (ver events.liked_changed)"""
+    for _, data in batch:
+        liked_songs_cache.invalidate(data["user_id"])
+
+
+events.on_remote(LIKED, _invalidate_remote)
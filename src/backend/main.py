@@ -1,23 +1,102 @@
-from fastapi import FastAPI, Request
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pathlib import Path
-from routes import auth, users, songs, playlists, albums, upload
-from database import engine, Base
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
+from routes import auth, users, songs, playlists, albums, upload, facets, search, admin, jobs, media
+from routes import events as events_routes
+from database import SessionLocal, check_connection, engine
 from config import settings
+from search_index import suggest_index
+from metrics import CONTENT_TYPE, MetricsMiddleware, instrument_engine, metrics
+import sql_profiler
+from lifecycle import DrainMiddleware, lifecycle
+from rate_limit import AdmissionController, AdmissionMiddleware
+from jobs import render_queue_metrics
+from storage import storage
+from compression import CompressedBodyCache, CompressionMiddleware
+from events import events
+
+# Tiempo máximo que /ready espera a la base de datos antes de responder 503
+READY_DB_TIMEOUT = 2.0
+
+
+# Trabajo de arranque y apagado. El esquema lo gestiona Alembic (alembic upgrade head):
+# importar la app no toca la base de datos, así arranca aunque esta tarde en estar disponible
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lifecycle.reset()
+    storage.prepare()
+    storage.remove_stale_partial_uploads()
+    # El índice de sugerencias se construye en segundo plano para no retrasar el arranque
+    suggest_index.start_background_build(engine)
+    # Y se reconstruye si otro worker cambió el catálogo
+    suggest_index.start_refresh(settings.SUGGEST_INDEX_REFRESH_SECONDS)
+    if settings.METRICS_ENABLED:
+        metrics.start_loop_monitor()
+    # Publicador de eventos en vivo; sus streams se cierran en cuanto empieza el apagado
+    events.start()
+    lifecycle.on_stopping(events.close_streams)
+    yield
+    # Apagado ordenado (ver lifecycle.py): drenar, vaciar buffers, limpiar subidas y cerrar el pool
+    await lifecycle.shutdown(settings.SHUTDOWN_DRAIN_SECONDS)
+    await events.stop()
+    suggest_index.stop_refresh()
+    metrics.stop_loop_monitor()
+    storage.remove_partial_uploads()
+    engine.dispose()
 
-# Crear las tablas en la base de datos si no existen
-Base.metadata.create_all(bind=engine)
 
 # Crear la aplicación FastAPI, con metadatos básicos
 app = FastAPI(
     title="Music Streaming API",
     description="Spotify-like music streaming platform API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
-# CORS debe estar ANTES de los routers, para que aplique a todas las rutas, porque algunas devuelven archivos estáticos (archivos de audio)
+# Control de admisión: como mucho tantas peticiones a la vez como conexiones hay en el pool
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=AdmissionController(
+            settings.ADMISSION_MAX_CONCURRENCY,
+            settings.ADMISSION_MAX_WAIT_MS / 1000,
+            settings.ADMISSION_MAX_QUEUE,
+        ),
+    )
+
+# Peticiones en curso y 503 durante el apagado
+app.add_middleware(DrainMiddleware)
+
+# Compresión gzip/brotli del JSON de la API (ver compression.py); el audio y las imágenes pasan sin tocar
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        cache=CompressedBodyCache(settings.COMPRESSION_CACHE_MAX_BYTES),
+    )
+
+# Perfilador de SQL, solo si se activa en la configuración
+if settings.SQL_PROFILER_ENABLED:
+    app.add_middleware(
+        sql_profiler.SQLProfilerMiddleware,
+        repeat_threshold=settings.SQL_PROFILER_REPEAT_THRESHOLD,
+        server_timing=settings.SQL_SERVER_TIMING,
+    )
+    sql_profiler.install(engine, settings.SQL_SLOW_QUERY_MS)
+
+# Métricas por ruta; envuelve a los demás middlewares (salvo CORS) para medir toda la petición
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+
+# CORS se añade el último para que sea el más externo: así también llevan sus cabeceras
+# las respuestas que cortan otros middlewares (503 de admisión y de apagado) y los archivos de audio
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:3000"],
@@ -27,28 +106,6 @@ app.add_middleware(
     expose_headers=["*"],  # Importante para audio streaming
 )
 
-# Crear directorio de uploads si no existe, para almacenar archivos de audio
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
-# Middleware personalizado para CORS en archivos estáticos, como los archivos de audio 
-@app.middleware("http")
-async def add_cors_to_static_files(request: Request, call_next):
-    response = await call_next(request)
-    
-    # Añadir headers CORS a archivos estáticos (uploads)
-    if request.url.path.startswith("/uploads"):
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, HEAD, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        response.headers["Access-Control-Expose-Headers"] = "Content-Length, Content-Range"
-        response.headers["Accept-Ranges"] = "bytes"
-    
-    return response
-
-# Montar directorio de archivos estáticos, para servir archivos de audio
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
-
 # Incluir routers para las diferentes funcionalidades de la API
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -56,6 +113,13 @@ app.include_router(songs.router)
 app.include_router(playlists.router)
 app.include_router(albums.router)
 app.include_router(upload.router)
+app.include_router(facets.router)
+app.include_router(search.router)
+app.include_router(admin.router)
+app.include_router(jobs.router)
+app.include_router(events_routes.router)
+# Archivos subidos (/uploads/...), servidos o redirigidos según el almacenamiento (ver storage.py)
+app.include_router(media.router)
 
 # Ruta raíz simple para verificar que la API está funcionando
 @app.get("/")
@@ -71,7 +135,38 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
-# Ejecutar la aplicación con Uvicorn si se ejecuta este archivo directamente
+# Ruta de readiness: el proceso vive (/health) y además puede atender tráfico
+@app.get("/ready")
+async def readiness_check():
+    try:
+        database = await asyncio.wait_for(run_in_threadpool(check_connection), READY_DB_TIMEOUT)
+    except asyncio.TimeoutError:
+        database = False
+    if not suggest_index.ready:
+        # Reintenta si la construcción del arranque falló (p. ej. la base aún no respondía)
+        suggest_index.start_background_build()
+    checks = {"database": database, "search_index": suggest_index.ready}
+    ready = all(checks.values())
+    return JSONResponse(
+        {"status": "ready" if ready else "not ready", "checks": checks},
+        status_code=200 if ready else 503,
+    )
+
+def queue_metrics() -> str:
+    """Métricas de la cola de trabajos; vacías si la base no responde, para no perder las demás"""
+    try:
+        with SessionLocal() as db:
+            return render_queue_metrics(db)
+    except SQLAlchemyError:
+        return ""
+
+# Métricas en formato de Prometheus, para el scraper (no forma parte de la API pública)
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    body = metrics.render() + events.render_metrics() + await run_in_threadpool(queue_metrics)
+    return PlainTextResponse(body, media_type=CONTENT_TYPE)
+
+# Ejecutar la aplicación con Uvicorn si se ejecuta este archivo directamente (desarrollo; en producción, serve.py)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
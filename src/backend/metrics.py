@@ -0,0 +1,279 @@
+"""
+Métricas de la API en el formato de texto de Prometheus (GET /metrics).
+
+MetricsMiddleware es un middleware ASGI puro (sin BaseHTTPMiddleware) que por
+petición mide la latencia y la cuenta en un histograma etiquetado por plantilla
+de ruta ("/songs/{song_id}", no la URL concreta), método y estado. Las rutas
+que no existen se agrupan en "<unmatched>" para que una URL inventada no cree
+series nuevas. Además lleva:
+- peticiones en curso,
+- bytes servidos desde /uploads y bytes recibidos en /upload/...,
+- tiempo de base de datos por petición (eventos del engine sumados en un
+  objeto por petición que viaja en una ContextVar, también a los hilos del
+  threadpool),
+- retraso del bucle de eventos (una tarea que duerme LOOP_LAG_INTERVAL y mide
+  cuánto tarda de más en despertar),
+- RSS del proceso, leído al servir /metrics.
+
+Costo: los contadores se actualizan solo desde el hilo del bucle de eventos,
+así no hacen falta locks; las consultas desde el threadpool escriben únicamente
+en el objeto de su propia petición. Las series se crean la primera vez que
+aparece una combinación de etiquetas y después cada petición solo busca en
+diccionarios y suma enteros (benchmarks/bench_metrics.py).
+
+Las métricas son por proceso: con varios workers cada uno lleva las suyas y
+Prometheus ve la del worker que atienda el scrape.
+"""
+import asyncio
+import os
+import resource
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette añade el charset
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LOOP_LAG_INTERVAL = 0.5
+
+STATIC_PREFIX = "/uploads"
+UPLOAD_PREFIX = "/upload/"
+UNMATCHED = "<unmatched>"
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name: str, labels: str, lines: list) -> None:
+        separator = "," if labels else ""
+        suffix = f"{{{labels}}}" if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{suffix} {self.total}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+
+
+class _Series:
+    __slots__ = ("latency", "db")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db = Histogram(DB_BUCKETS)
+
+
+class _RequestState:
+    """Lo que se acumula durante una petición; lo escriben el middleware y los eventos del engine"""
+    __slots__ = ("status", "sent", "db_seconds")
+
+    def __init__(self):
+        self.status = 500  # si la app falla sin responder
+        self.sent = 0
+        self.db_seconds = 0.0
+
+
+_current_request: ContextVar[Optional[_RequestState]] = ContextVar("metrics_request", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def resident_memory_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Fuera de Linux solo hay el máximo (en bytes en macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Metrics:
+    def __init__(self):
+        # ruta -> método -> estado -> series
+        self.series: Dict[str, Dict[str, Dict[int, _Series]]] = {}
+        self.in_flight = 0
+        self.uploads_served_bytes = 0
+        self.uploads_ingested_bytes = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.compression_input_bytes = 0
+        self.compression_output_bytes = 0
+        self.compression_cache_hits = 0
+        self.compression_cache_misses = 0
+        self.loop_lag = Histogram(LOOP_LAG_BUCKETS)
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def observe(self, route: str, method: str, status: int, seconds: float, db_seconds: float) -> None:
+        by_method = self.series.get(route)
+        if by_method is None:
+            by_method = self.series[route] = {}
+        by_status = by_method.get(method)
+        if by_status is None:
+            by_status = by_method[method] = {}
+        series = by_status.get(status)
+        if series is None:
+            series = by_status[status] = _Series()
+        series.latency.observe(seconds)
+        series.db.observe(db_seconds)
+
+    async def _monitor_loop(self, interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.observe(max(0.0, loop.time() - expected))
+
+    def start_loop_monitor(self, interval: float = LOOP_LAG_INTERVAL) -> None:
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.get_running_loop().create_task(self._monitor_loop(interval))
+
+    def stop_loop_monitor(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+
+    def render(self) -> str:
+        lines = []
+        requests, latency, db = [], [], []
+        for route, by_method in sorted(self.series.items()):
+            for method, by_status in sorted(by_method.items()):
+                for status, series in sorted(by_status.items()):
+                    labels = f'route="{_escape(route)}",method="{method}",status="{status}"'
+                    requests.append(f"http_requests_total{{{labels}}} {series.latency.count}")
+                    series.latency.render("http_request_duration_seconds", labels, latency)
+                    series.db.render("http_request_db_seconds", labels, db)
+
+        lines.append("# HELP http_requests_total Requests handled, by route template, method and status.")
+        lines.append("# TYPE http_requests_total counter")
+        lines.extend(requests)
+        lines.append("# HELP http_request_duration_seconds Time until the response body was sent.")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        lines.extend(latency)
+        lines.append("# HELP http_request_db_seconds Time spent in database queries per request.")
+        lines.append("# TYPE http_request_db_seconds histogram")
+        lines.extend(db)
+        lines.append("# HELP http_requests_in_flight Requests currently being handled.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        lines.append(f"http_requests_in_flight {self.in_flight}")
+        lines.append("# HELP uploads_served_bytes_total Response body bytes sent from /uploads.")
+        lines.append("# TYPE uploads_served_bytes_total counter")
+        lines.append(f"uploads_served_bytes_total {self.uploads_served_bytes}")
+        lines.append("# HELP uploads_ingested_bytes_total Request body bytes received by upload endpoints.")
+        lines.append("# TYPE uploads_ingested_bytes_total counter")
+        lines.append(f"uploads_ingested_bytes_total {self.uploads_ingested_bytes}")
+        lines.append("# HELP rate_limited_requests_total Requests rejected with 429 by a rate limit.")
+        lines.append("# TYPE rate_limited_requests_total counter")
+        lines.append(f"rate_limited_requests_total {self.rate_limited}")
+        lines.append("# HELP shed_requests_total Requests rejected with 503 by admission control.")
+        lines.append("# TYPE shed_requests_total counter")
+        lines.append(f"shed_requests_total {self.shed}")
+        lines.append("# HELP compression_input_bytes_total Response body bytes before compression.")
+        lines.append("# TYPE compression_input_bytes_total counter")
+        lines.append(f"compression_input_bytes_total {self.compression_input_bytes}")
+        lines.append("# HELP compression_output_bytes_total Response body bytes after compression.")
+        lines.append("# TYPE compression_output_bytes_total counter")
+        lines.append(f"compression_output_bytes_total {self.compression_output_bytes}")
+        lines.append("# HELP compression_cache_requests_total Lookups in the compressed body cache, by result.")
+        lines.append("# TYPE compression_cache_requests_total counter")
+        lines.append(f'compression_cache_requests_total{{result="hit"}} {self.compression_cache_hits}')
+        lines.append(f'compression_cache_requests_total{{result="miss"}} {self.compression_cache_misses}')
+        lines.append("# HELP event_loop_lag_seconds Extra delay of a periodic sleep on the event loop.")
+        lines.append("# TYPE event_loop_lag_seconds histogram")
+        self.loop_lag.render("event_loop_lag_seconds", "", lines)
+        lines.append("# HELP process_resident_memory_bytes Resident memory of this worker.")
+        lines.append("# TYPE process_resident_memory_bytes gauge")
+        lines.append(f"process_resident_memory_bytes {resident_memory_bytes()}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: Metrics = metrics):
+        self.app = app
+        self.metrics = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.metrics
+        path = scope["path"]
+        static = path.startswith(STATIC_PREFIX)
+        state = _RequestState()
+        token = _current_request.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state.status = message["status"]
+            elif static:
+                state.sent += len(message.get("body", b""))
+            await send(message)
+
+        if path.startswith(UPLOAD_PREFIX):
+            inner_receive = receive
+
+            async def receive():  # noqa: F811
+                message = await inner_receive()
+                if message["type"] == "http.request":
+                    registry.uploads_ingested_bytes += len(message.get("body", b""))
+                return message
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.in_flight -= 1
+            _current_request.reset(token)
+            # El router deja en el scope la ruta que atendió la petición
+            route = scope.get("route")
+            if route is not None:
+                template = route.path
+            else:
+                template = STATIC_PREFIX if static else UNMATCHED
+            method = scope["method"]
+            registry.observe(
+                template, method if method in METHODS else "OTHER", state.status, elapsed, state.db_seconds
+            )
+            if static:
+                registry.uploads_served_bytes += state.sent
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Suma el tiempo de cada consulta a la petición en curso, si la hay"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        state = _current_request.get()
+        started = conn.info.pop("metrics_started", None)
+        if state is not None and started is not None:
+            state.db_seconds += time.perf_counter() - started
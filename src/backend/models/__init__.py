@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum, Index, Float, JSON, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -29,31 +29,61 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    playlists = relationship("Playlist", back_populates="owner", cascade="all, delete-orphan")
-    albums = relationship("Album", back_populates="creator", cascade="all, delete-orphan")
-    songs = relationship("Song", back_populates="creator", cascade="all, delete-orphan")
-    liked_songs = relationship("LikedSong", back_populates="user", cascade="all, delete-orphan")
+    # passive_deletes: al borrar, la base elimina los hijos (ON DELETE CASCADE) sin cargarlos en Python
+    playlists = relationship("Playlist", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    albums = relationship("Album", back_populates="creator", cascade="all, delete-orphan", passive_deletes=True)
+    songs = relationship("Song", back_populates="creator", cascade="all, delete-orphan", passive_deletes=True)
+    liked_songs = relationship("LikedSong", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Album(Base):
     __tablename__ = "albums"
+    # Cola de moderación: índice parcial, solo con los álbumes pendientes (ver moderation.py)
+    __table_args__ = (
+        Index("ix_albums_pending", "id",
+              postgresql_where=text("is_approved = false"), sqlite_where=text("is_approved = 0")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
     description = Column(Text, nullable=True)
     cover_image = Column(String, nullable=True)
     release_date = Column(DateTime, nullable=True)
-    creator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    creator_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     is_approved = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     creator = relationship("User", back_populates="albums")
-    songs = relationship("Song", back_populates="album", cascade="all, delete-orphan")
+    songs = relationship("Song", back_populates="album", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class Genre(Base):
+    """Género normalizado; song_count cuenta solo canciones aprobadas (ver facets.py)"""
+    __tablename__ = "genres"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    slug = Column(String, unique=True, index=True, nullable=False)
+    song_count = Column(Integer, default=0, nullable=False)
+
+
+class Artist(Base):
+    """Artista normalizado; song_count cuenta solo canciones aprobadas (ver facets.py)"""
+    __tablename__ = "artists"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    slug = Column(String, unique=True, index=True, nullable=False)
+    song_count = Column(Integer, default=0, nullable=False)
 
 
 class Song(Base):
     __tablename__ = "songs"
+    __table_args__ = (
+        Index("ix_songs_pending", "id",
+              postgresql_where=text("is_approved = false"), sqlite_where=text("is_approved = 0")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
@@ -62,8 +92,10 @@ class Song(Base):
     file_path = Column(String, nullable=False)
     cover_url = Column(String, nullable=True)
     genre = Column(String, nullable=True)
-    album_id = Column(Integer, ForeignKey("albums.id"), nullable=True)
-    creator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    genre_id = Column(Integer, ForeignKey("genres.id"), nullable=True, index=True)
+    artist_id = Column(Integer, ForeignKey("artists.id"), nullable=True, index=True)
+    album_id = Column(Integer, ForeignKey("albums.id", ondelete="CASCADE"), nullable=True, index=True)
+    creator_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     is_approved = Column(Boolean, default=False)
     play_count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -71,8 +103,8 @@ class Song(Base):
     
     creator = relationship("User", back_populates="songs")
     album = relationship("Album", back_populates="songs")
-    playlist_songs = relationship("PlaylistSong", back_populates="song", cascade="all, delete-orphan")
-    liked_by = relationship("LikedSong", back_populates="song", cascade="all, delete-orphan")
+    playlist_songs = relationship("PlaylistSong", back_populates="song", cascade="all, delete-orphan", passive_deletes=True)
+    liked_by = relationship("LikedSong", back_populates="song", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Playlist(Base):
@@ -83,20 +115,24 @@ class Playlist(Base):
     description = Column(Text, nullable=True)
     cover_image = Column(String, nullable=True)
     is_public = Column(Boolean, default=True)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     owner = relationship("User", back_populates="playlists")
-    playlist_songs = relationship("PlaylistSong", back_populates="playlist", cascade="all, delete-orphan")
+    playlist_songs = relationship("PlaylistSong", back_populates="playlist", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class PlaylistSong(Base):
     __tablename__ = "playlist_songs"
+    # Posiciones dispersas (ver playlist_order.py); el índice también sirve para ordenar
+    __table_args__ = (
+        Index("uq_playlist_songs_playlist_position", "playlist_id", "position", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    playlist_id = Column(Integer, ForeignKey("playlists.id"), nullable=False)
-    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False)
+    playlist_id = Column(Integer, ForeignKey("playlists.id", ondelete="CASCADE"), nullable=False)
+    song_id = Column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), nullable=False, index=True)
     position = Column(Integer, nullable=False)
     added_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -106,11 +142,52 @@ class PlaylistSong(Base):
 
 class LikedSong(Base):
     __tablename__ = "liked_songs"
+    # Un like por usuario y canción; el índice también sirve para cargar los favoritos de un usuario
+    __table_args__ = (
+        Index("uq_liked_songs_user_song", "user_id", "song_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    song_id = Column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), nullable=False, index=True)
     liked_at = Column(DateTime(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="liked_songs")
-    song = relationship("Song", back_populates="liked_by")
\ No newline at end of file
+    song = relationship("Song", back_populates="liked_by")
+
+
+class SongSimilarity(Base):
+    """Vecinos más similares de cada canción, calculados por recommendations.py"""
+    __tablename__ = "song_similarities"
+    
+    song_id = Column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    similar_song_id = Column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class Job(Base):
+    """Trabajo en segundo plano; lo encola jobs.enqueue y lo ejecuta worker.py"""
+    __tablename__ = "jobs"
+    # El worker busca el siguiente trabajo pendiente por (status, run_at)
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    idempotency_key = Column(String, unique=True, nullable=True)
+    status = Column(String(16), nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,125 @@
+"""
+Cola de moderación: canciones y álbumes pendientes de aprobación.
+
+La cola se recorre por id, de lo más antiguo a lo más nuevo, con paginación
+por cursor (keyset): cada página pide los ids mayores que el último visto, así
+que cuesta lo mismo en la primera página que en la milésima. La consulta usa
+el índice parcial ix_<tabla>_pending (solo las filas con is_approved = false).
+Las consultas deben filtrar con PENDING_SONG / PENDING_ALBUM, que son el mismo
+predicado que el del índice.
+
+Aprobar o rechazar un lote es una sentencia por tabla (UPDATE o DELETE ...
+WHERE id IN (...) AND pendiente ... RETURNING), que solo afecta a las filas
+que siguen pendientes. Dos admins que aprueban lo mismo a la vez no cuentan
+dos veces una canción en las facetas. Aprobar un álbum aprueba también sus
+canciones. Rechazar borra las filas: la base elimina en cascada lo que
+cuelga de ellas y los archivos se borran después en un trabajo de fondo
+(ver tasks.delete_media).
+
+Las funciones no confirman. Devuelven las filas afectadas para que la ruta
+actualice el índice de sugerencias en un solo lote después del commit.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from facets import adjust_counts
+from models import Album, Song
+from serialization import SONG_RESPONSE_COLUMNS
+from tasks import enqueue_delete_media
+
+PENDING_SONG = Song.is_approved == False
+PENDING_ALBUM = Album.is_approved == False
+
+# Columnas que necesitan las facetas (genre_id, artist_id) y el índice de sugerencias
+APPROVED_SONG_COLUMNS = (Song.id, Song.title, Song.artist, Song.artist_id, Song.genre_id, Song.play_count)
+
+
+def pending_window(db: Session, columns: Sequence, criterion, id_column, after: Optional[int], limit: int) -> Tuple[list, Optional[int]]:
+    """Hasta `limit` filas pendientes con id mayor que `after` y el cursor de la siguiente página"""
+    statement = select(*columns).where(criterion)
+    if after is not None:
+        statement = statement.where(id_column > after)
+    rows = db.execute(statement.order_by(id_column).limit(limit + 1)).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def pending_songs(db: Session, after: Optional[int], limit: int) -> Tuple[list, Optional[int]]:
+    return pending_window(db, SONG_RESPONSE_COLUMNS, PENDING_SONG, Song.id, after, limit)
+
+
+def pending_albums(db: Session, columns: Sequence, after: Optional[int], limit: int) -> Tuple[list, Optional[int]]:
+    return pending_window(db, columns, PENDING_ALBUM, Album.id, after, limit)
+
+
+def approve_songs(db: Session, song_ids: List[int]) -> list:
+    """Aprueba las canciones pendientes de la lista; devuelve las que cambiaron"""
+    approved = db.execute(
+        update(Song)
+        .where(Song.id.in_(song_ids), PENDING_SONG)
+        .values(is_approved=True)
+        .returning(*APPROVED_SONG_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).all()
+    adjust_counts(db, approved, 1)
+    return approved
+
+
+def approve_albums(db: Session, album_ids: List[int]) -> Tuple[list, list]:
+    """Aprueba los álbumes pendientes de la lista y sus canciones pendientes; devuelve ambos"""
+    albums = db.execute(
+        update(Album)
+        .where(Album.id.in_(album_ids), PENDING_ALBUM)
+        .values(is_approved=True)
+        .returning(Album.id, Album.title)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not albums:
+        return [], []
+    songs = db.execute(
+        update(Song)
+        .where(Song.album_id.in_([album.id for album in albums]), PENDING_SONG)
+        .values(is_approved=True)
+        .returning(*APPROVED_SONG_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).all()
+    adjust_counts(db, songs, 1)
+    return albums, songs
+
+
+def reject_songs(db: Session, song_ids: List[int], owner_id: int) -> List[int]:
+    """Borra las canciones pendientes de la lista; devuelve sus ids"""
+    rejected = db.execute(
+        delete(Song)
+        .where(Song.id.in_(song_ids), PENDING_SONG)
+        .returning(Song.id, Song.file_path, Song.cover_url)
+        .execution_options(synchronize_session=False)
+    ).all()
+    enqueue_delete_media(db, [url for song in rejected for url in (song.file_path, song.cover_url)], owner_id)
+    return [song.id for song in rejected]
+
+
+def reject_albums(db: Session, album_ids: List[int], owner_id: int) -> Tuple[List[int], List[int]]:
+    """
+    Borra los álbumes pendientes de la lista con todas sus canciones; devuelve
+    los ids de los álbumes y de las canciones aprobadas que desaparecen
+    """
+    pending = select(Album.id).where(Album.id.in_(album_ids), PENDING_ALBUM)
+    songs = db.execute(
+        select(Song.id, Song.is_approved, Song.genre_id, Song.artist_id, Song.file_path, Song.cover_url)
+        .where(Song.album_id.in_(pending))
+    ).all()
+    albums = db.execute(
+        delete(Album)
+        .where(Album.id.in_(album_ids), PENDING_ALBUM)
+        .returning(Album.id, Album.cover_image)
+        .execution_options(synchronize_session=False)
+    ).all()
+    approved = [song for song in songs if song.is_approved]
+    adjust_counts(db, approved, -1)
+    media = [album.cover_image for album in albums]
+    media += [url for song in songs for url in (song.file_path, song.cover_url)]
+    enqueue_delete_media(db, media, owner_id)
+    return [album.id for album in albums], [song.id for song in approved]
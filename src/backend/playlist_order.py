@@ -0,0 +1,187 @@
+"""
+Orden de canciones dentro de una playlist con posiciones dispersas.
+
+Las posiciones son enteros positivos separados por POSITION_GAP. Insertar en un
+índice usa el punto medio entre los vecinos, mover una canción solo reescribe
+su fila y quitarla no renumera nada, así que cada operación toca O(1) filas.
+Cuando dos vecinos quedan sin hueco se reparten las posiciones de una ventana
+de canciones alrededor del punto de inserción, duplicando la ventana hasta
+encontrar espacio; solo en el peor caso se renumera la playlist completa.
+
+Las escrituras bloquean la fila de la playlist (SELECT ... FOR UPDATE) para
+serializar ediciones concurrentes; la restricción única (playlist_id, position)
+protege además contra cualquier colisión.
+"""
+from typing import List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from models import Playlist, PlaylistSong
+
+POSITION_GAP = 1024
+POSITION_LIMIT = 2**31 - 1  # Integer de PostgreSQL
+REBALANCE_WINDOW = 32  # Canciones a cada lado en el primer intento de reparto
+MIN_SPACING = 32  # Separación mínima que debe dejar un reparto local
+
+
+def lock_playlist(db: Session, playlist_id: int) -> Optional[Playlist]:
+    """Carga la playlist bloqueando su fila hasta el final de la transacción"""
+    return db.query(Playlist).filter(Playlist.id == playlist_id).with_for_update().first()
+
+
+def _assign_positions(db: Session, playlist_id: int, positions: dict) -> None:
+    """Reescribe las posiciones {id: posición} de un grupo de filas"""
+    db.flush()
+    # Primero se pasan a negativo para no chocar con la restricción única
+    db.execute(
+        update(PlaylistSong)
+        .where(PlaylistSong.playlist_id == playlist_id, PlaylistSong.id.in_(positions))
+        .values(position=-PlaylistSong.position)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(PlaylistSong),
+        [{"id": row_id, "position": position} for row_id, position in positions.items()],
+    )
+    # Las filas cargadas en la sesión tienen posiciones viejas
+    db.expire_all()
+
+
+def rebalance(db: Session, playlist_id: int) -> None:
+    """Renumera la playlist completa con POSITION_GAP entre canciones"""
+    ids = [
+        row.id for row in db.query(PlaylistSong.id).filter(
+            PlaylistSong.playlist_id == playlist_id
+        ).order_by(PlaylistSong.position)
+    ]
+    if ids:
+        _assign_positions(
+            db, playlist_id, {row_id: (index + 1) * POSITION_GAP for index, row_id in enumerate(ids)}
+        )
+
+
+def _respread(db: Session, playlist_id: int, around: int) -> None:
+    """
+    Reparte uniformemente las posiciones de una ventana de canciones alrededor
+    de `around`, ampliándola hasta que quede al menos MIN_SPACING entre ellas
+    """
+    base = db.query(PlaylistSong.id, PlaylistSong.position).filter(
+        PlaylistSong.playlist_id == playlist_id
+    )
+    window = REBALANCE_WINDOW
+    while True:
+        left = base.filter(PlaylistSong.position <= around).order_by(
+            PlaylistSong.position.desc()
+        ).limit(window + 1).all()
+        right = base.filter(PlaylistSong.position > around).order_by(
+            PlaylistSong.position
+        ).limit(window + 1).all()
+        if len(left) <= window and len(right) <= window:
+            rebalance(db, playlist_id)
+            return
+
+        # Límites exclusivos: la fila justo fuera de la ventana (o los extremos)
+        low = left[window].position if len(left) > window else 0
+        rows = [row.id for row in reversed(left[:window])] + [row.id for row in right[:window]]
+        if len(right) > window:
+            spacing = (right[window].position - low) // (len(rows) + 1)
+        else:
+            spacing = POSITION_GAP  # La ventana llega al final, hay espacio libre
+            if low + (len(rows) + 1) * spacing > POSITION_LIMIT:
+                spacing = 0
+
+        if spacing >= MIN_SPACING:
+            _assign_positions(
+                db, playlist_id, {row_id: low + (i + 1) * spacing for i, row_id in enumerate(rows)}
+            )
+            return
+        window *= 2
+
+
+def _last_position(db: Session, playlist_id: int) -> int:
+    return db.query(func.max(PlaylistSong.position)).filter(
+        PlaylistSong.playlist_id == playlist_id
+    ).scalar() or 0
+
+
+def _neighbours(db: Session, playlist_id: int, index: int, exclude_id: Optional[int]) -> tuple:
+    """Posiciones de las canciones que quedarían antes y después del índice"""
+    query = db.query(PlaylistSong.position).filter(PlaylistSong.playlist_id == playlist_id)
+    if exclude_id is not None:
+        query = query.filter(PlaylistSong.id != exclude_id)
+    query = query.order_by(PlaylistSong.position)
+
+    if index <= 0:
+        following = query.limit(1).all()
+        return 0, following[0].position if following else None
+
+    rows = query.offset(index - 1).limit(2).all()
+    if not rows:
+        return _last_position(db, playlist_id), None
+    return rows[0].position, rows[1].position if len(rows) > 1 else None
+
+
+def position_for_index(
+    db: Session,
+    playlist_id: int,
+    index: Optional[int] = None,
+    exclude_id: Optional[int] = None,
+) -> int:
+    """
+    Calcula la posición para que una canción quede en `index` (0 = inicio).
+    Sin índice, o con uno mayor que la longitud, la canción va al final
+    """
+    for _ in range(2):
+        if index is None:
+            before, after = _last_position(db, playlist_id), None
+        else:
+            before, after = _neighbours(db, playlist_id, index, exclude_id)
+
+        if after is None:
+            if before + POSITION_GAP <= POSITION_LIMIT:
+                return before + POSITION_GAP
+        elif after - before > 1:
+            return (before + after) // 2
+
+        # Sin hueco entre vecinos: repartir una vez y recalcular
+        _respread(db, playlist_id, before)
+    raise RuntimeError("Could not allocate a playlist position")
+
+
+def insert_song(db: Session, playlist_id: int, song_id: int, index: Optional[int] = None) -> PlaylistSong:
+    playlist_song = PlaylistSong(
+        playlist_id=playlist_id,
+        song_id=song_id,
+        position=position_for_index(db, playlist_id, index),
+    )
+    db.add(playlist_song)
+    return playlist_song
+
+
+def move_song(db: Session, playlist_song: PlaylistSong, to_index: int) -> None:
+    """Mueve una canción al índice indicado reescribiendo solo su fila"""
+    playlist_song.position = position_for_index(
+        db, playlist_song.playlist_id, to_index, exclude_id=playlist_song.id
+    )
+    db.flush()
+
+
+def move_songs(db: Session, playlist_id: int, moves: List[tuple]) -> int:
+    """
+    Aplica en orden una lista de movimientos (song_id, to_index) dentro de la
+    transacción actual. Devuelve cuántas canciones se movieron
+    """
+    entries = {
+        entry.song_id: entry for entry in db.query(PlaylistSong).filter(
+            PlaylistSong.playlist_id == playlist_id,
+            PlaylistSong.song_id.in_({song_id for song_id, _ in moves})
+        )
+    }
+    missing = [song_id for song_id, _ in moves if song_id not in entries]
+    if missing:
+        raise KeyError(missing)
+
+    for song_id, to_index in moves:
+        move_song(db, entries[song_id], to_index)
+    return len(moves)
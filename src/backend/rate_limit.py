@@ -0,0 +1,228 @@
+"""
+Límites de tasa por usuario y por IP, y control de admisión global.
+
+Límites de tasa (429): cubetas de tokens por ruta con nombre (política). Cada
+política de RATE_LIMITS es "N/unidad" o "N/unidad:ráfaga" (segundo, minuto,
+hora); p. ej. "60/minute:20" rellena un token por segundo con hasta 20
+acumulados. Se aplica como dependencia de la ruta:
+
+    @router.post("/{song_id}/play", dependencies=[Depends(rate_limit("play"))])
+
+y consume un token de la cubeta del usuario y otro de la de su IP (con la
+tasa multiplicada por RATE_LIMIT_IP_FACTOR, porque detrás de una IP puede
+haber muchos usuarios). Si alguna está vacía responde 429 con Retry-After.
+Las cubetas viven en memoria del proceso (RATE_LIMIT_BACKEND=memory, cada
+worker lleva las suyas) o en Redis (redis, compartidas entre workers y
+máquinas; la recarga y el consumo son un script Lua atómico que usa el reloj
+de Redis).
+
+Admisión (503): AdmissionMiddleware deja pasar a la vez como mucho tantas
+peticiones como conexiones tiene el pool (ADMISSION_MAX_CONCURRENCY, por
+defecto el pool de SQLAlchemy menos una conexión para tareas de fondo). Las demás esperan en una cola del bucle de
+eventos, que no bloquea a nadie, en vez de esperar al pool dentro de la ruta
+bloqueando el bucle. Si la espera pasa de ADMISSION_MAX_WAIT_MS o la cola
+está llena se descarta la petición con 503 y Retry-After. Los estáticos, las
+subidas y las sondas (/health, /ready, /metrics) no pasan por la cola.
+"""
+import asyncio
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Depends, HTTPException, Request, status
+
+from config import settings
+from dependencies import get_current_user
+from metrics import metrics
+from models import User
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+MEMORY_MAX_KEYS = 100_000
+RETRY_AFTER_SECONDS = 1
+# Las subidas quedan fuera: un cliente lento retendría un hueco mientras envía el cuerpo.
+# Los streams de eventos también: duran minutos y no usan la base después de abrirse
+ADMISSION_EXEMPT_PREFIXES = ("/uploads", "/upload/", "/events", "/health", "/ready", "/metrics")
+
+_POLICY = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour)\s*(?::\s*(\d+))?\s*$")
+
+# Recarga y consumo atómicos; devuelve los segundos a esperar (0 si se admite)
+_REDIS_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class Policy(NamedTuple):
+    rate: float  # tokens por segundo
+    burst: int
+
+    def scaled(self, factor: float) -> "Policy":
+        return Policy(self.rate * factor, max(1, round(self.burst * factor)))
+
+
+def parse_policy(value: str) -> Policy:
+    """'60/minute' o '60/minute:20' -> Policy; sin ráfaga, la ráfaga es N"""
+    match = _POLICY.match(value)
+    if not match:
+        raise ValueError(f"Invalid rate limit {value!r}, expected N/second|minute|hour[:burst]")
+    count, period, burst = match.groups()
+    return Policy(int(count) / PERIODS[period], int(burst) if burst else int(count))
+
+
+class MemoryBackend:
+    """Cubetas en un diccionario LRU del proceso"""
+
+    def __init__(self, max_keys: int = MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # clave -> [tokens, actualizada]
+        self._lock = threading.Lock()
+
+    async def acquire(self, key: str, policy: Policy) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(policy.burst), now]
+                # Desalojar una cubeta poco usada equivale a dejarla llena
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(policy.burst, bucket[0] + (now - bucket[1]) * policy.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / policy.rate
+
+
+class RedisBackend:
+    """Cubetas compartidas en Redis (requiere el paquete redis)"""
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from exc
+        self._client = redis_asyncio.from_url(url)
+        self._script = self._client.register_script(_REDIS_SCRIPT)
+
+    async def acquire(self, key: str, policy: Policy) -> float:
+        return float(await self._script(keys=[f"rate:{key}"], args=[policy.rate, policy.burst]))
+
+
+class RateLimiter:
+    def __init__(self, backend, policies: Dict[str, str], ip_factor: float):
+        self.backend = backend
+        self.policies = {name: parse_policy(value) for name, value in policies.items()}
+        self.ip_factor = ip_factor
+
+    async def check(self, name: str, user_id: int, ip: Optional[str]) -> float:
+        """Segundos que hay que esperar, o 0 si la petición entra"""
+        policy = self.policies.get(name)
+        if policy is None:
+            return 0.0
+        wait = await self.backend.acquire(f"{name}:user:{user_id}", policy)
+        if ip is not None:
+            wait = max(wait, await self.backend.acquire(f"{name}:ip:{ip}", policy.scaled(self.ip_factor)))
+        return wait
+
+
+def create_rate_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        backend = RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+    elif settings.RATE_LIMIT_BACKEND == "memory":
+        backend = MemoryBackend()
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}")
+    return RateLimiter(backend, settings.RATE_LIMITS, settings.RATE_LIMIT_IP_FACTOR)
+
+
+rate_limiter = create_rate_limiter()
+
+
+def rate_limit(name: str):
+    """Dependencia que aplica la política `name` al usuario autenticado y a su IP"""
+    async def limiter(request: Request, current_user: User = Depends(get_current_user)) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        ip = request.client.host if request.client else None
+        wait = await rate_limiter.check(name, current_user.id, ip)
+        if wait > 0:
+            metrics.rate_limited += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+    return limiter
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int, max_wait: float, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def acquire(self) -> bool:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(ADMISSION_EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire():
+            metrics.shed += 1
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(RETRY_AFTER_SECONDS).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server is overloaded, retry later"}'})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
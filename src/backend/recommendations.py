@@ -0,0 +1,206 @@
+"""
+Recomendaciones "canciones similares" por co-ocurrencia (item a item).
+
+Cada usuario (sus favoritos) y cada playlist es una "canasta" de canciones. Con
+la matriz dispersa X (canastas x canciones) la co-ocurrencia es C = Xᵀ·X; se
+normaliza con coseno o PMI y se guardan los TOP_K vecinos de cada canción en
+la tabla song_similarities, que es lo único que leen los endpoints.
+
+C nunca se materializa completa: se calcula por bloques de filas
+(SIMILARITY_BLOCK_SIZE canciones a la vez), se recorta al top-K y se escribe,
+así que la memoria queda acotada por las interacciones (unas decenas de bytes
+cada una) más un bloque. El modo incremental solo recalcula las canciones con interacciones
+nuevas desde el último cálculo y las que co-ocurren con ellas (su conteo entra en
+el coseno o el PMI de cada par). Las interacciones borradas (quitar un favorito o
+una canción de una playlist) no dejan rastro, así que solo las recoge el cálculo
+completo, que conviene correr periódicamente.
+
+NumPy y SciPy solo se importan aquí, nunca desde las rutas.
+
+Uso:
+    python scripts/build_similarities.py [--incremental]
+"""
+import time
+from datetime import datetime, timezone
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy import delete, func, insert, select, union
+from sqlalchemy.engine import Engine
+
+from config import settings
+from models import LikedSong, PlaylistSong, SongSimilarity
+
+FETCH_SIZE = 50_000
+
+
+def _fetch_pairs(conn, statement) -> Iterator[np.ndarray]:
+    """Lee pares (canasta, canción) en trozos con un cursor del lado del servidor"""
+    result = conn.execution_options(stream_results=True).execute(statement)
+    while True:
+        rows = result.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        yield np.array(rows, dtype=np.int64).reshape(-1, 2)
+
+
+def load_interactions(conn) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Devuelve dos arreglos paralelos (canasta, canción). Los usuarios usan ids
+    pares y las playlists impares para que ambos espacios no se mezclen
+    """
+    chunks = []
+    for chunk in _fetch_pairs(conn, select(LikedSong.user_id, LikedSong.song_id)):
+        chunk[:, 0] *= 2
+        chunks.append(chunk)
+    for chunk in _fetch_pairs(conn, select(PlaylistSong.playlist_id, PlaylistSong.song_id)):
+        chunk[:, 0] = chunk[:, 0] * 2 + 1
+        chunks.append(chunk)
+
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.concatenate(chunks)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _top_k_per_row(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray, top_k: int):
+    """Se queda con los `top_k` mayores puntajes de cada fila (vectorizado)"""
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    if rows.size == 0:
+        return rows, cols, scores, rows
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    lengths = np.diff(np.r_[starts, rows.size])
+    rank = np.arange(rows.size) - np.repeat(starts, lengths)
+    keep = rank < top_k
+    return rows[keep], cols[keep], scores[keep], rank[keep]
+
+
+def top_k_neighbours(
+    baskets: np.ndarray,
+    songs: np.ndarray,
+    top_k: int = 20,
+    method: str = "cosine",
+    block_size: int = 2048,
+    only_songs: Optional[np.ndarray] = None,
+) -> Iterator[Tuple[np.ndarray, ...]]:
+    """
+    Calcula los vecinos más similares por bloques de canciones.
+    Produce por bloque (ids del bloque, song_id, similar_song_id, score, rank).
+    Con `only_songs` (ordenado) solo se calculan las filas de esas canciones y
+    de las que comparten alguna canasta con ellas
+    """
+    if songs.size == 0:
+        return
+    song_ids, song_index = np.unique(songs, return_inverse=True)
+    _, basket_index = np.unique(baskets, return_inverse=True)
+    n_baskets, n_songs = basket_index.max() + 1, song_ids.size
+
+    x = sp.csr_matrix(
+        (np.ones(songs.size, dtype=np.float32), (basket_index, song_index)),
+        shape=(n_baskets, n_songs),
+    )
+    x.sum_duplicates()
+    x.data[:] = 1.0  # Una canción repetida en una canasta cuenta una vez
+    xt = x.T.tocsr()
+    counts = np.asarray(x.sum(axis=0), dtype=np.float64).ravel()
+
+    if only_songs is None:
+        targets = np.arange(n_songs)
+    else:
+        positions = np.searchsorted(song_ids, only_songs)
+        valid = positions < n_songs
+        positions = positions[valid]
+        targets = positions[song_ids[positions] == only_songs[valid]]
+        # Los vecinos de una canción cambiada también cambian: la co-ocurrencia o el conteo del par
+        partners = [targets]
+        for start in range(0, targets.size, block_size):
+            partners.append((xt[targets[start:start + block_size]] @ x).indices)
+        targets = np.unique(np.concatenate(partners))
+
+    for start in range(0, targets.size, block_size):
+        block = targets[start:start + block_size]
+        co = (xt[block] @ x).tocoo()
+        rows, cols, values = co.row, co.col, co.data.astype(np.float64)
+        # Sin la diagonal (una canción no es similar a sí misma)
+        mask = block[rows] != cols
+        rows, cols, values = rows[mask], cols[mask], values[mask]
+
+        left, right = counts[block[rows]], counts[cols]
+        if method == "pmi":
+            scores = np.log(values * n_baskets / (left * right))
+        else:
+            scores = values / np.sqrt(left * right)
+
+        rows, cols, scores, rank = _top_k_per_row(rows, cols, scores, top_k)
+        yield song_ids[block], song_ids[block[rows]], song_ids[cols], scores, rank
+
+
+def _dirty_songs(conn, since: datetime) -> np.ndarray:
+    statement = union(
+        select(LikedSong.song_id).where(LikedSong.liked_at > since),
+        select(PlaylistSong.song_id).where(PlaylistSong.added_at > since),
+    )
+    return np.array(sorted(row[0] for row in conn.execute(statement)), dtype=np.int64)
+
+
+def build_similarities(
+    engine: Engine,
+    incremental: bool = False,
+    top_k: Optional[int] = None,
+    method: Optional[str] = None,
+    block_size: Optional[int] = None,
+) -> dict:
+    """
+    Recalcula song_similarities. Devuelve un resumen con tiempos y conteos.
+    En modo incremental, si nunca se calculó se hace un cálculo completo
+    """
+    top_k = top_k or settings.SIMILAR_SONGS_TOP_K
+    method = method or settings.SIMILARITY_METHOD
+    block_size = block_size or settings.SIMILARITY_BLOCK_SIZE
+    started = time.perf_counter()
+    computed_at = datetime.now(timezone.utc)
+
+    with engine.connect() as conn:
+        only_songs = None
+        if incremental:
+            since = conn.execute(select(func.max(SongSimilarity.computed_at))).scalar()
+            if since is not None:
+                only_songs = _dirty_songs(conn, since)
+                if only_songs.size == 0:
+                    return {"mode": "incremental", "songs": 0, "rows": 0, "seconds": 0.0}
+        baskets, songs = load_interactions(conn)
+    loaded = time.perf_counter()
+
+    written = songs_done = 0
+    table = SongSimilarity.__table__
+    for block_songs, song_col, similar_col, scores, rank in top_k_neighbours(
+        baskets, songs, top_k=top_k, method=method, block_size=block_size, only_songs=only_songs
+    ):
+        block_songs = block_songs.tolist()
+        rows = [
+            {"song_id": a, "similar_song_id": b, "score": s, "rank": r, "computed_at": computed_at}
+            for a, b, s, r in zip(song_col.tolist(), similar_col.tolist(), scores.tolist(), rank.tolist())
+        ]
+        # Cada bloque se reemplaza en su propia transacción
+        with engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.song_id.in_(block_songs)))
+            if rows:
+                conn.execute(insert(table), rows)
+        written += len(rows)
+        songs_done += len(block_songs)
+
+    if only_songs is None:
+        # Canciones que ya no tienen interacciones conservan filas viejas
+        with engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.computed_at < computed_at))
+
+    return {
+        "mode": "full" if only_songs is None else "incremental",
+        "interactions": int(songs.size),
+        "songs": songs_done,
+        "rows": written,
+        "load_seconds": round(loaded - started, 3),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
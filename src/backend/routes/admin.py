@@ -0,0 +1,196 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional
+from database import engine, get_db
+from models import Album, Song, User, UserRole
+from schemas import (
+    AlbumSummaryResponse, ModerationRequest, ModerationResult, PendingAlbumsPage, PendingSongsPage, UserResponse
+)
+from dependencies import require_role
+from catalog_io import CATALOG_TABLES, export_lines, import_lines
+from serialization import SONG_RESPONSE_COLUMNS, FastJSONResponse, row_serializer, schema_columns, serialize_song_row
+from streaming import stream_query, streaming_response
+from liked_cache import liked_songs_cache
+from search_index import ALBUM, index_songs, suggest_index, unindex_songs
+import moderation
+import events
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+USER_COLUMNS = schema_columns(UserResponse, User)
+serialize_user_row = row_serializer(UserResponse)
+ALBUM_COLUMNS = schema_columns(AlbumSummaryResponse, Album)
+serialize_album_row = row_serializer(AlbumSummaryResponse)
+
+# ndjson: un objeto por línea; json: un único arreglo enviado por partes
+STREAM_FORMAT = Query("ndjson", pattern="^(ndjson|json)$")
+
+MODERATION_PAGE_SIZE = 50
+MAX_MODERATION_PAGE_SIZE = 500
+
+
+@router.get("/users/stream")
+async def stream_users(
+    format: str = STREAM_FORMAT,
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Todos los usuarios en streaming, por id, sin paginar"""
+    return stream_query(engine, select(*USER_COLUMNS).order_by(User.id), serialize_user_row, format)
+
+
+@router.get("/songs/pending/stream")
+async def stream_pending_songs(
+    format: str = STREAM_FORMAT,
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Canciones pendientes de aprobación en streaming, de la más antigua a la más nueva"""
+    statement = select(*SONG_RESPONSE_COLUMNS).where(moderation.PENDING_SONG).order_by(Song.id)
+    return stream_query(engine, statement, serialize_song_row, format)
+
+
+@router.get("/albums/pending/stream")
+async def stream_pending_albums(
+    format: str = STREAM_FORMAT,
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Álbumes pendientes de aprobación en streaming (sin sus canciones)"""
+    statement = select(*ALBUM_COLUMNS).where(moderation.PENDING_ALBUM).order_by(Album.id)
+    return stream_query(engine, statement, serialize_album_row, format)
+
+
+@router.get("/moderation/songs", response_model=PendingSongsPage)
+async def get_pending_songs(
+    after: Optional[int] = None,
+    limit: int = Query(MODERATION_PAGE_SIZE, ge=1, le=MAX_MODERATION_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """
+    Siguiente página de canciones pendientes, de la más antigua a la más nueva
+    - after: next_cursor de la respuesta anterior (omitir para empezar desde el inicio)
+    """
+    songs, next_cursor = moderation.pending_songs(db, after, limit)
+    return FastJSONResponse({"items": [serialize_song_row(row) for row in songs], "next_cursor": next_cursor})
+
+
+@router.get("/moderation/albums", response_model=PendingAlbumsPage)
+async def get_pending_albums(
+    after: Optional[int] = None,
+    limit: int = Query(MODERATION_PAGE_SIZE, ge=1, le=MAX_MODERATION_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Siguiente página de álbumes pendientes (sin sus canciones), del más antiguo al más nuevo"""
+    albums, next_cursor = moderation.pending_albums(db, ALBUM_COLUMNS, after, limit)
+    return FastJSONResponse({"items": [serialize_album_row(row) for row in albums], "next_cursor": next_cursor})
+
+
+@router.post("/moderation/songs/approve", response_model=ModerationResult)
+async def approve_songs(
+    request: ModerationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Aprueba un lote de canciones en una sola sentencia"""
+    songs = moderation.approve_songs(db, request.ids)
+    db.commit()
+    index_songs(songs)
+    events.songs_approved(songs)
+    return {"songs": [song.id for song in songs], "albums": []}
+
+
+@router.post("/moderation/songs/reject", response_model=ModerationResult)
+async def reject_songs(
+    request: ModerationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Borra un lote de canciones pendientes; sus archivos se eliminan en segundo plano"""
+    song_ids = moderation.reject_songs(db, request.ids, current_user.id)
+    db.commit()
+    return {"songs": song_ids, "albums": []}
+
+
+@router.post("/moderation/albums/approve", response_model=ModerationResult)
+async def approve_albums(
+    request: ModerationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Aprueba un lote de álbumes junto con sus canciones pendientes"""
+    albums, songs = moderation.approve_albums(db, request.ids)
+    db.commit()
+    suggest_index.add_many((ALBUM, album.id, album.title, 0) for album in albums)
+    index_songs(songs)
+    events.albums_approved(albums)
+    events.songs_approved(songs)
+    return {"songs": [song.id for song in songs], "albums": [album.id for album in albums]}
+
+
+@router.post("/moderation/albums/reject", response_model=ModerationResult)
+async def reject_albums(
+    request: ModerationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Borra un lote de álbumes pendientes con todas sus canciones"""
+    album_ids, song_ids = moderation.reject_albums(db, request.ids, current_user.id)
+    db.commit()
+    unindex_songs(song_ids)
+    # Solo las canciones aprobadas estaban en el catálogo; los álbumes pendientes no
+    events.songs_removed(song_ids)
+    return {"songs": song_ids, "albums": album_ids}
+
+
+@router.get("/catalog/export")
+async def export_catalog(
+    tables: Optional[str] = Query(None, description="Tablas separadas por comas; por defecto todas"),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """
+    Descarga el catálogo en NDJSON (ver catalog_io.py) en streaming.
+    Incluye los hashes de contraseña de los usuarios
+    """
+    selected = tables.split(",") if tables else list(CATALOG_TABLES)
+    unknown = set(selected) - set(CATALOG_TABLES)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown tables: {', '.join(sorted(unknown))}"
+        )
+
+    # El generador abre su propia conexión: la sesión de la petición ya se cerró al enviar
+    return streaming_response(
+        export_lines(engine, selected),
+        headers={"Content-Disposition": 'attachment; filename="catalog.ndjson"'}
+    )
+
+
+@router.post("/catalog/import")
+def import_catalog(
+    file: UploadFile = File(...),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """
+    Importa un NDJSON exportado con /admin/catalog/export o scripts/catalog.py.
+    Todo o nada: ante cualquier error no se guarda ninguna fila
+    """
+    try:
+        summary = import_lines(engine, file.file)
+    except (ValueError, KeyError) as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid catalog file: {error}"
+        )
+    except IntegrityError as error:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Catalog conflicts with existing data: {error.orig}"
+        )
+
+    liked_songs_cache.invalidate()
+    events.liked_changed(None)
+    suggest_index.start_background_build(engine)
+    return summary
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import delete, func
 from sqlalchemy.orm import Session
 from typing import List
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
-from models import Album, User, UserRole
+from models import Album, Song, User, UserRole
 from schemas import AlbumCreate, AlbumResponse
 from dependencies import get_current_user, require_role
+from facets import adjust_counts, approved_song_facets
+from search_index import ALBUM, index_songs, suggest_index, unindex_songs
+from moderation import approve_albums
+from tasks import enqueue_delete_media
+import events
 
 router = APIRouter(prefix="/albums", tags=["albums"])
 
@@ -58,6 +61,8 @@ async def create_album(
     db.add(new_album)
     db.commit()
     db.refresh(new_album)
+    if new_album.is_approved:
+        suggest_index.add(ALBUM, new_album.id, new_album.title)
     
     return new_album
 
@@ -75,8 +80,15 @@ async def approve_album(
             detail="Album not found"
         )
     
-    album.is_approved = True
+    # También aprueba sus canciones pendientes (ver moderation.py)
+    albums, songs = approve_albums(db, [album_id])
     db.commit()
+    if albums:
+        suggest_index.add(ALBUM, album.id, album.title)
+    index_songs(songs)
+    events.albums_approved(albums)
+    events.songs_approved(songs)
+    db.refresh(album)
     
     return {"message": "Album approved successfully", "album": album}
 
@@ -119,6 +131,9 @@ async def update_album(
     
     db.commit()
     db.refresh(album)
+    if 'title' in album_data and album.is_approved:
+        plays = db.query(func.coalesce(func.sum(Song.play_count), 0)).filter(Song.album_id == album.id).scalar()
+        suggest_index.add(ALBUM, album.id, album.title, plays, replace=True)
     
     return album
 
@@ -142,7 +157,19 @@ async def delete_album(
             detail="Not authorized to delete this album"
         )
     
-    db.delete(album)
+    # Las canciones del álbum (y lo que cuelga de ellas) las borra la base en cascada
+    adjust_counts(db, approved_song_facets(db, Song.album_id == album.id), -1)
+    was_approved = album.is_approved
+    songs = db.query(Song.id, Song.is_approved, Song.file_path, Song.cover_url).filter(Song.album_id == album.id).all()
+    song_ids = [song.id for song in songs]
+    media = [album.cover_image] + [url for song in songs for url in (song.file_path, song.cover_url)]
+    db.execute(delete(Album).where(Album.id == album_id))
+    enqueue_delete_media(db, media, current_user.id)
     db.commit()
+    suggest_index.remove(ALBUM, album_id)
+    unindex_songs(song_ids)
+    if was_approved:
+        events.albums_removed([album_id])
+    events.songs_removed([song.id for song in songs if song.is_approved])
     
     return {"message": "Album deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,58 @@
+import re
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import get_db
+from dependencies import optional_oauth2_scheme, user_from_token
+from events import EventStreamResponse, events
+from routes.playlists import get_visible_playlist
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+TOPIC_PATTERN = re.compile(r"^(catalog|song:\d+|playlist:(\d+))$")
+
+
+@router.get("/", response_class=EventStreamResponse)
+async def subscribe(
+    topics: str = Query(..., description="Temas separados por comas: catalog, song:<id>, playlist:<id>"),
+    token: Optional[str] = Query(None, description="Token de acceso, para EventSource (no envía cabeceras)"),
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream text/event-stream con los eventos de los temas pedidos (ver events.py).
+    catalog y song:<id> son públicos; playlist:<id> requiere poder ver la playlist
+    """
+    requested = {topic.strip() for topic in topics.split(",") if topic.strip()}
+    if not requested:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No topics requested")
+    if len(requested) > settings.EVENTS_MAX_TOPICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.EVENTS_MAX_TOPICS} topics per stream"
+        )
+
+    playlist_ids = []
+    for topic in requested:
+        match = TOPIC_PATTERN.match(topic)
+        if match is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown topic: {topic}")
+        if match.group(2) is not None:
+            playlist_ids.append(int(match.group(2)))
+
+    if playlist_ids:
+        current_user = user_from_token(db, header_token or token)
+        if current_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        for playlist_id in playlist_ids:
+            get_visible_playlist(db, playlist_id, current_user)
+
+    # La sesión se cierra al terminar las dependencias, antes de abrir el stream
+    return EventStreamResponse(events, requested)
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List
+from database import get_db
+from models import Genre, Artist
+from schemas import FacetCount
+
+router = APIRouter(prefix="/facets", tags=["facets"])
+
+
+def facet_counts(db: Session, model, limit: int):
+    """Facetas con canciones aprobadas, de la más a la menos poblada"""
+    return db.query(model).filter(model.song_count > 0).order_by(
+        model.song_count.desc(), model.name
+    ).limit(limit).all()
+
+
+@router.get("/genres", response_model=List[FacetCount])
+async def get_genre_facets(
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Géneros del catálogo aprobado con su número de canciones"""
+    return facet_counts(db, Genre, limit)
+
+
+@router.get("/artists", response_model=List[FacetCount])
+async def get_artist_facets(
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Artistas del catálogo aprobado con su número de canciones"""
+    return facet_counts(db, Artist, limit)
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from database import get_db
+from models import Job, User, UserRole
+from schemas import JobResponse
+from dependencies import get_current_user, require_role
+import jobs
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def get_visible_job(db: Session, job_id: int, current_user: User) -> Job:
+    """El trabajo si es del usuario o este es admin; 404 en otro caso, para no revelar ids ajenos"""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job or (job.owner_id != current_user.id and current_user.role != UserRole.ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+
+@router.get("/", response_model=List[JobResponse])
+async def get_jobs(
+    job_status: Optional[str] = Query(None, alias="status", pattern="^(queued|running|succeeded|failed)$"),
+    kind: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Trabajos más recientes del usuario (todos, si es admin)"""
+    query = db.query(Job)
+    if current_user.role != UserRole.ADMIN:
+        query = query.filter(Job.owner_id == current_user.id)
+    if job_status:
+        query = query.filter(Job.status == job_status)
+    if kind:
+        query = query.filter(Job.kind == kind)
+    return query.order_by(Job.id.desc()).limit(limit).all()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Estado de un trabajo; las subidas devuelven el id en job_id o jobs"""
+    return get_visible_job(db, job_id, current_user)
+
+
+@router.post("/{job_id}/retry", response_model=JobResponse)
+async def retry_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Vuelve a encolar un trabajo fallido"""
+    job = get_visible_job(db, job_id, current_user)
+    if not jobs.retry(db, job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Only failed jobs can be retried"
+        )
+    db.refresh(job)
+    return job
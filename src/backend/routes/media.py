@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Request
+from storage import storage
+
+router = APIRouter(tags=["media"])
+
+# CORS de los archivos subidos (audio y portadas desde cualquier origen). Son
+# fijas: se codifican una vez aquí en lugar de reescribirse en cada respuesta
+MEDIA_CORS_HEADERS = [
+    (name.encode("latin-1"), value.encode("latin-1"))
+    for name, value in {
+        "access-control-allow-origin": "*",
+        "access-control-allow-methods": "GET, HEAD, OPTIONS",
+        "access-control-allow-headers": "*",
+        "access-control-expose-headers": "Content-Length, Content-Range",
+    }.items()
+]
+
+
+# Archivos subidos: el almacenamiento local los sirve con soporte de Range y
+# S3 redirige al bucket, así las URLs /uploads/... no cambian con el backend.
+# Los nombres por contenido se sirven con caché inmutable (ver storage.py)
+@router.api_route("/uploads/{key:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_media(key: str, request: Request):
+    return storage.response(request, key, MEDIA_CORS_HEADERS)
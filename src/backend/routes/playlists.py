@@ -1,16 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from typing import List, Optional
 from database import get_db
 from models import Playlist, PlaylistSong, User, Song
-from schemas import PlaylistCreate, PlaylistResponse, PlaylistWithSongs
+from schemas import PlaylistCreate, PlaylistResponse, PlaylistWithSongs, PlaylistOrderUpdate, PlaylistSongsPage
 from dependencies import get_current_user
+from rate_limit import rate_limit
+from playlist_order import lock_playlist, insert_song, move_songs
+import events
+from serialization import (
+    SONG_RESPONSE_COLUMNS, FastJSONResponse, row_serializer, schema_columns, serialize_song_row
+)
 
 router = APIRouter(prefix="/playlists", tags=["playlists"])
 
+# Tamaño de las ventanas de canciones que se devuelven por petición
+PLAYLIST_WINDOW_SIZE = 100
+MAX_PLAYLIST_WINDOW_SIZE = 500
+
+PLAYLIST_RESPONSE_COLUMNS = schema_columns(PlaylistResponse, Playlist)
+serialize_playlist_row = row_serializer(PlaylistResponse)
+
 
 @router.get("/", response_model=List[PlaylistResponse])
 async def get_playlists(
@@ -34,30 +46,81 @@ async def get_my_playlists(
     return playlists
 
 
-@router.get("/{playlist_id}", response_model=PlaylistWithSongs)
-async def get_playlist(
-    playlist_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
-    if not playlist:
+def get_visible_playlist(db: Session, playlist_id: int, current_user: User) -> dict:
+    """Metadatos de la playlist (sin objetos ORM) si el usuario puede verla"""
+    row = db.query(*PLAYLIST_RESPONSE_COLUMNS).filter(Playlist.id == playlist_id).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Playlist not found"
         )
     
-    if not playlist.is_public and playlist.owner_id != current_user.id:
+    playlist = serialize_playlist_row(row)
+    if not playlist["is_public"] and playlist["owner_id"] != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to access this playlist"
         )
+    return playlist
+
+
+def get_song_window(db: Session, playlist_id: int, after: Optional[int], limit: int) -> tuple:
+    """
+    Devuelve hasta `limit` canciones con posición mayor que `after` y el cursor
+    para pedir la siguiente ventana (None si no hay más)
+    """
+    query = db.query(*SONG_RESPONSE_COLUMNS, PlaylistSong.position).join(
+        PlaylistSong, PlaylistSong.song_id == Song.id
+    ).filter(PlaylistSong.playlist_id == playlist_id)
+    if after is not None:
+        query = query.filter(PlaylistSong.position > after)
     
-    playlist_songs = db.query(Song).join(PlaylistSong).filter(
+    rows = query.order_by(PlaylistSong.position).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].position if len(rows) > limit else None
+    return [serialize_song_row(row) for row in rows[:limit]], next_cursor
+
+
+@router.get("/{playlist_id}", response_model=PlaylistWithSongs)
+async def get_playlist(
+    playlist_id: int,
+    limit: int = Query(PLAYLIST_WINDOW_SIZE, ge=1, le=MAX_PLAYLIST_WINDOW_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Metadatos de la playlist con la primera ventana de canciones y el total.
+    El resto se pide a /playlists/{playlist_id}/songs con next_cursor
+    """
+    playlist = get_visible_playlist(db, playlist_id, current_user)
+    songs, next_cursor = get_song_window(db, playlist_id, None, limit)
+    total_songs = db.query(func.count(PlaylistSong.id)).filter(
         PlaylistSong.playlist_id == playlist_id
-    ).order_by(PlaylistSong.position).all()
+    ).scalar()
+    
+    return FastJSONResponse({
+        **playlist,
+        "songs": songs,
+        "total_songs": total_songs,
+        "next_cursor": next_cursor,
+    })
+
+
+@router.get("/{playlist_id}/songs", response_model=PlaylistSongsPage)
+async def get_playlist_songs(
+    playlist_id: int,
+    after: Optional[int] = None,
+    limit: int = Query(PLAYLIST_WINDOW_SIZE, ge=1, le=MAX_PLAYLIST_WINDOW_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Siguiente ventana de canciones de la playlist
+    - after: next_cursor de la respuesta anterior (omitir para empezar desde el inicio)
+    """
+    get_visible_playlist(db, playlist_id, current_user)
+    songs, next_cursor = get_song_window(db, playlist_id, after, limit)
     
-    return {**playlist.__dict__, "songs": playlist_songs}
+    return FastJSONResponse({"items": songs, "next_cursor": next_cursor})
 
 
 @router.post("/", response_model=PlaylistResponse, status_code=status.HTTP_201_CREATED)
@@ -80,14 +143,31 @@ async def create_playlist(
     return new_playlist
 
 
-@router.post("/{playlist_id}/songs/{song_id}")
+def commit_playlist_edit(db: Session):
+    """Confirma una edición de orden; una colisión de posiciones indica una edición concurrente"""
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Playlist was modified concurrently, please retry"
+        )
+
+
+@router.post("/{playlist_id}/songs/{song_id}", dependencies=[Depends(rate_limit("playlist_songs"))])
 async def add_song_to_playlist(
     playlist_id: int,
     song_id: int,
+    index: Optional[int] = Query(None, ge=0),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    """
+    Agrega una canción a la playlist
+    - index: posición (0 = inicio) donde insertarla; por defecto al final
+    """
+    playlist = lock_playlist(db, playlist_id)
     if not playlist:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -118,23 +198,52 @@ async def add_song_to_playlist(
             detail="Song already in playlist"
         )
     
-    max_position = db.query(PlaylistSong).filter(
-        PlaylistSong.playlist_id == playlist_id
-    ).count()
+    insert_song(db, playlist_id, song_id, index)
+    commit_playlist_edit(db)
+    events.playlist_changed(playlist_id, "songs")
     
-    playlist_song = PlaylistSong(
-        playlist_id=playlist_id,
-        song_id=song_id,
-        position=max_position
-    )
+    return {"message": "Song added to playlist successfully"}
+
+
+@router.patch("/{playlist_id}/order")
+async def reorder_playlist(
+    playlist_id: int,
+    order: PlaylistOrderUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Mueve varias canciones en una sola transacción.
+    Los movimientos se aplican en orden; to_index es la posición final (0 = inicio)
+    """
+    playlist = lock_playlist(db, playlist_id)
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found"
+        )
     
-    db.add(playlist_song)
-    db.commit()
+    if playlist.owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to modify this playlist"
+        )
     
-    return {"message": "Song added to playlist successfully"}
+    try:
+        moved = move_songs(db, playlist_id, [(move.song_id, move.to_index) for move in order.moves])
+    except KeyError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Songs not in playlist: {e.args[0]}"
+        )
+    commit_playlist_edit(db)
+    events.playlist_changed(playlist_id, "order")
+    
+    return {"message": "Playlist reordered successfully", "moved": moved}
 
 
-@router.delete("/{playlist_id}/songs/{song_id}")
+@router.delete("/{playlist_id}/songs/{song_id}", dependencies=[Depends(rate_limit("playlist_songs"))])
 async def remove_song_from_playlist(
     playlist_id: int,
     song_id: int,
@@ -167,6 +276,7 @@ async def remove_song_from_playlist(
     
     db.delete(playlist_song)
     db.commit()
+    events.playlist_changed(playlist_id, "songs")
     
     return {"message": "Song removed from playlist successfully"}
 
@@ -192,5 +302,6 @@ async def delete_playlist(
     
     db.delete(playlist)
     db.commit()
+    events.playlist_changed(playlist_id, "deleted")
     
     return {"message": "Playlist deleted successfully"}
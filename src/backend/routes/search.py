@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Query
+from typing import List
+from schemas import SearchSuggestion
+from search_index import KIND_NAMES, MAX_SUGGESTIONS, suggest_index
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("/suggest", response_model=List[SearchSuggestion])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS)
+):
+    """
+    Sugerencias por prefijo para el buscador (canciones, artistas y álbumes),
+    de la más a la menos escuchada. Se responde desde el índice en memoria,
+    sin consultar la base de datos
+    """
+    return [
+        {"type": KIND_NAMES[item.kind], "id": item.id, "label": item.label}
+        for item in suggest_index.suggest(q, limit)
+    ]
@@ -1,32 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
-from models import Song, User, UserRole, LikedSong
-from schemas import SongCreate, SongResponse
-from dependencies import get_current_user, require_role
+from models import Song, User, UserRole, LikedSong, SongSimilarity
+from schemas import SongCreate, SongResponse, SongWithLikeResponse, LikedCheckResponse
+from dependencies import get_current_user, require_role, optional_oauth2_scheme, user_from_token
+from serialization import SONG_RESPONSE_COLUMNS, FastJSONResponse, song_list_response, song_rows_to_dicts
+from liked_cache import liked_songs_cache
+from facets import adjust_counts, assign_facets
+from search_index import index_songs, unindex_songs
+from rate_limit import rate_limit
+from tasks import enqueue_delete_media, enqueue_probe_audio
+from storage import key_from_url
+import events
 
 router = APIRouter(prefix="/songs", tags=["songs"])
 
 
-@router.get("/", response_model=List[SongResponse])
+@router.get("/", response_model=List[SongWithLikeResponse])
 async def get_songs(
     skip: int = 0,
     limit: int = 50,
     approved_only: bool = True,
     order_by: str = "play_count",  # play_count, created_at, title
     search: Optional[str] = None,
+    genre_id: Optional[int] = None,
+    artist_id: Optional[int] = None,
+    with_liked: bool = False,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
     db: Session = Depends(get_db)
 ):
     """
     Obtiene lista de canciones con filtros y ordenamiento
     - order_by: play_count (default), created_at, title
     - search: busca por título o artista
+    - genre_id, artist_id: filtran por faceta (ver /facets)
+    - with_liked: agrega is_liked a cada canción (requiere token; 401 sin él)
     """
-    query = db.query(Song)
+    current_user = None
+    if with_liked:
+        current_user = user_from_token(db, token)
+        if current_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    
+    # Solo las columnas de SongResponse, sin hidratar objetos ORM
+    query = db.query(*SONG_RESPONSE_COLUMNS)
     
     if approved_only:
         query = query.filter(Song.is_approved == True)
@@ -38,6 +62,11 @@ async def get_songs(
             (Song.title.ilike(search_term)) | (Song.artist.ilike(search_term))
         )
     
+    if genre_id is not None:
+        query = query.filter(Song.genre_id == genre_id)
+    if artist_id is not None:
+        query = query.filter(Song.artist_id == artist_id)
+    
     # Ordenamiento
     if order_by == "play_count":
         query = query.order_by(Song.play_count.desc())
@@ -49,7 +78,85 @@ async def get_songs(
         query = query.order_by(Song.play_count.desc())  # Default
     
     songs = query.offset(skip).limit(limit).all()
-    return songs
+    
+    if current_user is None:
+        return song_list_response(songs)
+    
+    items = song_rows_to_dicts(songs)
+    liked = liked_songs_cache.contains_many(db, current_user.id, (item["id"] for item in items))
+    for item in items:
+        item["is_liked"] = item["id"] in liked
+    return FastJSONResponse(items)
+
+
+@router.get("/{song_id}/similar", response_model=List[SongResponse])
+async def get_similar_songs(
+    song_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Canciones más parecidas según favoritos y playlists en común (ver recommendations.py)"""
+    songs = db.query(*SONG_RESPONSE_COLUMNS).join(
+        SongSimilarity, SongSimilarity.similar_song_id == Song.id
+    ).filter(
+        SongSimilarity.song_id == song_id,
+        Song.is_approved == True
+    ).order_by(SongSimilarity.rank).limit(limit).all()
+    
+    return song_list_response(songs)
+
+
+@router.get("/{song_id}/radio", response_model=List[SongResponse])
+async def get_song_radio(
+    song_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    """
+    Cola de reproducción a partir de una canción: sus vecinos y luego los
+    vecinos de esos vecinos, ordenados por similitud acumulada.
+    Sin datos de similitud se usan las más escuchadas del mismo género o artista
+    """
+    seed = db.query(Song.id, Song.genre, Song.artist).filter(Song.id == song_id).first()
+    if not seed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found"
+        )
+    
+    first_hop = db.query(SongSimilarity.similar_song_id, SongSimilarity.score).filter(
+        SongSimilarity.song_id == song_id
+    ).order_by(SongSimilarity.rank).all()
+    scores = {row.similar_song_id: row.score for row in first_hop}
+    
+    if scores and len(scores) < limit:
+        second_hop = db.query(
+            SongSimilarity.song_id, SongSimilarity.similar_song_id, SongSimilarity.score
+        ).filter(SongSimilarity.song_id.in_(list(scores))).order_by(
+            SongSimilarity.song_id, SongSimilarity.rank
+        ).all()
+        first_hop_ids = set(scores)
+        for row in second_hop:
+            candidate = row.similar_song_id
+            if candidate == song_id or candidate in first_hop_ids:
+                continue
+            # Puntaje del camino semilla -> vecino -> candidato, se queda el mejor
+            scores[candidate] = max(scores.get(candidate, 0.0), scores[row.song_id] * row.score)
+    
+    if scores:
+        rows = db.query(*SONG_RESPONSE_COLUMNS).filter(
+            Song.id.in_(list(scores)),
+            Song.is_approved == True
+        ).all()
+        rows.sort(key=lambda row: (-scores[row.id], row.id))
+        return song_list_response(rows[:limit])
+    
+    rows = db.query(*SONG_RESPONSE_COLUMNS).filter(
+        Song.id != song_id,
+        Song.is_approved == True,
+        (Song.genre == seed.genre) | (Song.artist == seed.artist)
+    ).order_by(Song.play_count.desc()).limit(limit).all()
+    return song_list_response(rows)
 
 
 @router.get("/{song_id}", response_model=SongResponse)
@@ -71,7 +178,8 @@ async def create_song(
 ):
     """
     Crea una nueva canción
-    El file_path y cover_url deben ser obtenidos primero usando /upload/song y /upload/cover
+    El file_path y cover_url deben ser obtenidos primero usando /upload/song y /upload/cover.
+    La duración se corrige en segundo plano con la del archivo (tarea probe_audio)
     """
     # Los creators y admins aprueban automáticamente sus propias canciones
     is_approved = current_user.role in [UserRole.CREATOR, UserRole.ADMIN]
@@ -87,10 +195,20 @@ async def create_song(
         genre=song.genre if hasattr(song, 'genre') else None,
         is_approved=is_approved
     )
+    assign_facets(db, new_song)
     
     db.add(new_song)
+    if new_song.is_approved:
+        adjust_counts(db, [new_song], 1)
+    db.flush()
+    # Como en /upload/album: el worker sustituye la duración del formulario por la real
+    song_key = key_from_url(new_song.file_path)
+    if song_key:
+        enqueue_probe_audio(db, song_key, current_user.id, [new_song.id])
     db.commit()
     db.refresh(new_song)
+    if new_song.is_approved:
+        index_songs([new_song])
     
     return new_song
 
@@ -108,8 +226,14 @@ async def approve_song(
             detail="Song not found"
         )
     
-    song.is_approved = True
+    newly_approved = not song.is_approved
+    if newly_approved:
+        song.is_approved = True
+        adjust_counts(db, [song], 1)
     db.commit()
+    index_songs([song])
+    if newly_approved:
+        events.songs_approved([song])
     
     return {"message": "Song approved successfully", "song": song}
 
@@ -133,13 +257,19 @@ async def delete_song(
             detail="Not authorized to delete this song"
         )
     
-    db.delete(song)
+    if song.is_approved:
+        adjust_counts(db, [song], -1)
+    # Una sola sentencia: la base borra en cascada favoritos, entradas de playlists y similitudes
+    db.execute(delete(Song).where(Song.id == song_id))
+    enqueue_delete_media(db, [song.file_path, song.cover_url], current_user.id)
     db.commit()
+    unindex_songs([song_id])
+    events.songs_removed([song_id])
     
     return {"message": "Song deleted successfully"}
 
 
-@router.post("/{song_id}/play")
+@router.post("/{song_id}/play", dependencies=[Depends(rate_limit("play"))])
 async def increment_play_count(
     song_id: int,
     db: Session = Depends(get_db),
@@ -155,11 +285,12 @@ async def increment_play_count(
     
     song.play_count += 1
     db.commit()
+    events.song_counters(song.id, song.play_count)
     
     return {"message": "Play count incremented", "play_count": song.play_count}
 
 
-@router.post("/{song_id}/like")
+@router.post("/{song_id}/like", dependencies=[Depends(rate_limit("like"))])
 async def like_song(
     song_id: int,
     db: Session = Depends(get_db),
@@ -174,50 +305,50 @@ async def like_song(
             detail="Song not found"
         )
     
-    # Verificar si ya está en favoritos
-    existing_like = db.query(LikedSong).filter(
-        LikedSong.user_id == current_user.id,
-        LikedSong.song_id == song_id
-    ).first()
-    
-    if existing_like:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Song already liked"
-        )
-    
-    # Agregar a favoritos
+    # Agregar a favoritos. Si ya estaba, lo dice el índice único (no la caché, que
+    # puede estar desfasada respecto a lo que otro worker escribió)
     new_like = LikedSong(
         user_id=current_user.id,
         song_id=song_id
     )
     
     db.add(new_like)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        liked_songs_cache.invalidate(current_user.id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Song already liked"
+        )
+    liked_songs_cache.add(current_user.id, song_id)
+    events.liked_changed(current_user.id)
     
     return {"message": "Song liked successfully", "song_id": song_id}
 
 
-@router.delete("/{song_id}/like")
+@router.delete("/{song_id}/like", dependencies=[Depends(rate_limit("like"))])
 async def unlike_song(
     song_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Elimina una canción de favoritos del usuario"""
-    liked_song = db.query(LikedSong).filter(
+    deleted = db.query(LikedSong).filter(
         LikedSong.user_id == current_user.id,
         LikedSong.song_id == song_id
-    ).first()
+    ).delete()
     
-    if not liked_song:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Song not in liked songs"
         )
     
-    db.delete(liked_song)
     db.commit()
+    liked_songs_cache.remove(current_user.id, song_id)
+    events.liked_changed(current_user.id)
     
     return {"message": "Song unliked successfully", "song_id": song_id}
 
@@ -230,11 +361,11 @@ async def get_liked_songs(
     current_user: User = Depends(get_current_user)
 ):
     """Obtiene todas las canciones favoritas del usuario"""
-    liked_songs = db.query(Song).join(LikedSong).filter(
+    liked_songs = db.query(*SONG_RESPONSE_COLUMNS).join(LikedSong).filter(
         LikedSong.user_id == current_user.id
     ).order_by(LikedSong.liked_at.desc()).offset(skip).limit(limit).all()
     
-    return liked_songs
+    return song_list_response(liked_songs)
 
 
 @router.get("/{song_id}/is-liked")
@@ -244,12 +375,21 @@ async def check_if_liked(
     current_user: User = Depends(get_current_user)
 ):
     """Verifica si una canción está en favoritos del usuario"""
-    liked = db.query(LikedSong).filter(
-        LikedSong.user_id == current_user.id,
-        LikedSong.song_id == song_id
-    ).first()
+    is_liked = liked_songs_cache.contains(db, current_user.id, song_id)
+    
+    return {"is_liked": is_liked, "song_id": song_id}
+
+
+@router.get("/liked/check", response_model=LikedCheckResponse)
+async def check_liked_batch(
+    ids: List[int] = Query(..., max_length=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Devuelve cuáles de las canciones indicadas (?ids=1&ids=2...) están en favoritos"""
+    liked = liked_songs_cache.contains_many(db, current_user.id, ids)
     
-    return {"is_liked": liked is not None, "song_id": song_id}
+    return {"liked": sorted(liked)}
 
 
 @router.post("/{song_id}/play")
@@ -266,5 +406,6 @@ async def increment_play_count(
     
     song.play_count += 1
     db.commit()
+    events.song_counters(song.id, song.play_count)
     
     return {"message": "Play count incremented", "play_count": song.play_count}
\ No newline at end of file
@@ -1,33 +1,28 @@
-import os
-import sys
-from pathlib import Path
+from datetime import datetime, timedelta
 
-# Add parent directory to path for imports
-sys.path.append(str(Path(__file__).parent.parent))
-
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form, Response
 from sqlalchemy.orm import Session
-from typing import List
-import uuid
-import shutil
+from starlette.concurrency import run_in_threadpool
+from typing import List, Tuple
 
+from auth import create_upload_token, verify_upload_token
 from database import get_db
 from dependencies import get_current_user
 from models import User, Song, Album
-from datetime import datetime
+from schemas import DirectUploadComplete, DirectUploadRequest
+from facets import adjust_counts, assign_facets
+from search_index import ALBUM, index_songs, suggest_index
+from storage import LocalStorage, content_key, file_sha256, key_hash, public_url, storage
+from tasks import enqueue_cover_thumbnail, enqueue_delete_media, enqueue_probe_audio, referenced_urls
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
-# Configuración de directorios con estructura organizada
-UPLOAD_DIR = Path("uploads")
-SONGS_DIR = UPLOAD_DIR / "songs"
-COVERS_SONGS_DIR = UPLOAD_DIR / "covers" / "songs"
-COVERS_ALBUMS_DIR = UPLOAD_DIR / "covers" / "albums"
-AVATARS_DIR = UPLOAD_DIR / "avatars"
+# Prefijos de las claves en el almacenamiento (ver storage.py), con estructura organizada
+SONGS_PREFIX = "songs"
+COVERS_SONGS_PREFIX = "covers/songs"
+COVERS_ALBUMS_PREFIX = "covers/albums"
+AVATARS_PREFIX = "avatars"
 
-# Crear directorios si no existen con estructura organizada
-for directory in [SONGS_DIR, COVERS_SONGS_DIR, COVERS_ALBUMS_DIR, AVATARS_DIR]:
-    directory.mkdir(parents=True, exist_ok=True)
 
 # Configuración de tipos de archivo permitidos
 ALLOWED_AUDIO_TYPES = ["audio/mpeg", "audio/mp3", "audio/wav", "audio/ogg"]
@@ -59,14 +54,15 @@ def validate_file_size(file: UploadFile, max_size: int, file_type: str):
         )
 
 
-def save_upload_file(upload_file: UploadFile, destination: Path) -> str:
-    """Guarda el archivo subido y retorna la ruta relativa con barras correctas para URLs"""
+def save_upload_file(upload_file: UploadFile, prefix: str, name_prefix: str = "") -> Tuple[str, int]:
+    """
+    Guarda el archivo subido con el hash de su contenido en el nombre (ver
+    storage.py) y retorna su clave y su tamaño.
+    Bloquea mientras copia: se llama en el threadpool
+    """
+    file_extension = upload_file.filename.split(".")[-1]
     try:
-        with destination.open("wb") as buffer:
-            shutil.copyfileobj(upload_file.file, buffer)
-        # Convertir a string y reemplazar backslashes con forward slashes para URLs
-        relative_path = str(destination.relative_to(UPLOAD_DIR))
-        return relative_path.replace("\\", "/")
+        return storage.save_hashed(prefix, upload_file.file, file_extension, upload_file.content_type, name_prefix)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al guardar archivo: {str(e)}")
     finally:
@@ -94,19 +90,19 @@ async def upload_song(
     validate_file_type(file, ALLOWED_AUDIO_TYPES, "Audio")
     validate_file_size(file, MAX_AUDIO_SIZE, "Audio")
     
-    # Generar nombre único
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = SONGS_DIR / unique_filename
+    # Guardar archivo (el nombre es el hash del contenido)
+    key, size = await run_in_threadpool(save_upload_file, file, SONGS_PREFIX)
     
-    # Guardar archivo
-    relative_path = save_upload_file(file, file_path)
+    # Duración y hash en segundo plano; el cliente consulta /jobs/{job_id}
+    job_id = enqueue_probe_audio(db, key, current_user.id)
+    db.commit()
     
     return {
         "message": "Canción subida exitosamente",
-        "filename": unique_filename,
-        "path": f"/uploads/{relative_path}",
-        "size": file_path.stat().st_size
+        "filename": key.rsplit("/", 1)[-1],
+        "path": public_url(key),
+        "size": size,
+        "job_id": job_id
     }
 
 
@@ -131,26 +127,27 @@ async def upload_cover(
     validate_file_type(file, ALLOWED_IMAGE_TYPES, "Imagen")
     validate_file_size(file, MAX_IMAGE_SIZE, "Imagen")
     
-    # Generar nombre único y guardar en covers/songs (para portadas de canciones)
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = COVERS_SONGS_DIR / unique_filename
+    # Guardar en covers/songs (para portadas de canciones), con el hash del contenido como nombre
+    key, size = await run_in_threadpool(save_upload_file, file, COVERS_SONGS_PREFIX)
     
-    # Guardar archivo
-    relative_path = save_upload_file(file, file_path)
+    # Miniatura en segundo plano
+    job_id = enqueue_cover_thumbnail(db, key, current_user.id)
+    db.commit()
     
     return {
         "message": "Cover subido exitosamente",
-        "filename": unique_filename,
-        "path": f"/uploads/{relative_path}",
-        "size": file_path.stat().st_size
+        "filename": key.rsplit("/", 1)[-1],
+        "path": public_url(key),
+        "size": size,
+        "job_id": job_id
     }
 
 
 @router.post("/album-cover")
 async def upload_album_cover(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     Sube una portada de álbum.
@@ -167,19 +164,19 @@ async def upload_album_cover(
     validate_file_type(file, ALLOWED_IMAGE_TYPES, "Imagen")
     validate_file_size(file, MAX_IMAGE_SIZE, "Imagen")
     
-    # Generar nombre único y guardar en covers/albums
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = COVERS_ALBUMS_DIR / unique_filename
+    # Guardar en covers/albums, con el hash del contenido como nombre
+    key, size = await run_in_threadpool(save_upload_file, file, COVERS_ALBUMS_PREFIX)
     
-    # Guardar archivo
-    relative_path = save_upload_file(file, file_path)
+    # Miniatura en segundo plano
+    job_id = enqueue_cover_thumbnail(db, key, current_user.id)
+    db.commit()
     
     return {
         "message": "Portada de álbum subida exitosamente",
-        "filename": unique_filename,
-        "path": f"/uploads/{relative_path}",
-        "size": file_path.stat().st_size
+        "filename": key.rsplit("/", 1)[-1],
+        "path": public_url(key),
+        "size": size,
+        "job_id": job_id
     }
 
 
@@ -196,32 +193,21 @@ async def upload_avatar(
     validate_file_type(file, ALLOWED_IMAGE_TYPES, "Imagen")
     validate_file_size(file, MAX_IMAGE_SIZE, "Imagen")
     
-    # Generar nombre único
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"user_{current_user.id}_{uuid.uuid4()}.{file_extension}"
-    file_path = AVATARS_DIR / unique_filename
-    
-    # Si el usuario ya tiene un avatar, eliminar el anterior
-    if current_user.avatar_url:
-        try:
-            old_avatar_path = UPLOAD_DIR / current_user.avatar_url.replace("/uploads/", "")
-            if old_avatar_path.exists():
-                old_avatar_path.unlink()
-        except Exception:
-            pass  # Ignorar errores al eliminar avatar anterior
-    
-    # Guardar archivo
-    relative_path = save_upload_file(file, file_path)
+    # Guardar archivo (nombre con el id del usuario y el hash del contenido)
+    key, _ = await run_in_threadpool(save_upload_file, file, AVATARS_PREFIX, f"user_{current_user.id}_")
     
-    # Actualizar usuario en BD
-    current_user.avatar_url = f"/uploads/{relative_path}"
+    # Actualizar usuario en BD; el avatar anterior se borra en segundo plano si ya nadie lo usa
+    old_avatar = current_user.profile_picture
+    current_user.profile_picture = public_url(key)
+    if old_avatar != current_user.profile_picture:
+        enqueue_delete_media(db, [old_avatar], current_user.id)
     db.commit()
     
     return {
         "message": "Avatar subido exitosamente",
-        "filename": unique_filename,
-        "path": f"/uploads/{relative_path}",
-        "avatar_url": current_user.avatar_url
+        "filename": key.rsplit("/", 1)[-1],
+        "path": public_url(key),
+        "avatar_url": current_user.profile_picture
     }
 
 
@@ -229,10 +215,13 @@ async def upload_avatar(
 async def delete_file(
     file_type: str,
     filename: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
-    Elimina un archivo subido
+    Elimina un archivo subido que ya no usa ninguna canción, álbum, playlist
+    o usuario (los archivos por contenido se comparten). El borrado se hace en
+    segundo plano, respetando el margen de las subidas recientes (ver tasks.delete_media).
     Solo accesible para creators y admins
     """
     # Verificar permisos
@@ -242,13 +231,13 @@ async def delete_file(
             detail="No tienes permisos para eliminar archivos"
         )
     
-    # Determinar directorio según tipo
+    # Determinar prefijo según tipo
     type_map = {
-        "song": SONGS_DIR,
-        "cover_song": COVERS_SONGS_DIR,
-        "cover_album": COVERS_ALBUMS_DIR,
-        "cover": COVERS_SONGS_DIR,  # Alias para compatibilidad
-        "avatar": AVATARS_DIR
+        "song": SONGS_PREFIX,
+        "cover_song": COVERS_SONGS_PREFIX,
+        "cover_album": COVERS_ALBUMS_PREFIX,
+        "cover": COVERS_SONGS_PREFIX,  # Alias para compatibilidad
+        "avatar": AVATARS_PREFIX
     }
     
     if file_type not in type_map:
@@ -257,24 +246,26 @@ async def delete_file(
             detail="Tipo de archivo inválido"
         )
     
-    file_path = type_map[file_type] / filename
+    key = f"{type_map[file_type]}/{filename}"
     
     # Verificar si el archivo existe
-    if not file_path.exists():
+    if await run_in_threadpool(storage.head, key) is None:
         raise HTTPException(
             status_code=404,
             detail="Archivo no encontrado"
         )
     
-    # Eliminar archivo
-    try:
-        file_path.unlink()
-        return {"message": "Archivo eliminado exitosamente"}
-    except Exception as e:
+    url = public_url(key)
+    if referenced_urls(db, [url]):
         raise HTTPException(
-            status_code=500,
-            detail=f"Error al eliminar archivo: {str(e)}"
+            status_code=409,
+            detail="El archivo está en uso"
         )
+    
+    job_id = enqueue_delete_media(db, [url], current_user.id)
+    db.commit()
+    
+    return {"message": "Eliminación del archivo programada", "job_id": job_id}
 
 
 @router.post("/album")
@@ -335,10 +326,7 @@ async def upload_album(
     validate_file_type(album_cover, ALLOWED_IMAGE_TYPES, "Portada de álbum")
     validate_file_size(album_cover, MAX_IMAGE_SIZE, "Portada de álbum")
     
-    cover_extension = album_cover.filename.split(".")[-1]
-    cover_filename = f"{uuid.uuid4()}.{cover_extension}"
-    cover_path = COVERS_ALBUMS_DIR / cover_filename
-    cover_relative_path = save_upload_file(album_cover, cover_path)
+    cover_key, _ = await run_in_threadpool(save_upload_file, album_cover, COVERS_ALBUMS_PREFIX)
     
     # Crear álbum en la base de datos
     release_date = datetime(release_year, 1, 1) if release_year else None
@@ -346,7 +334,7 @@ async def upload_album(
     
     new_album = Album(
         title=album_title,
-        cover_image=f"/uploads/{cover_relative_path}",
+        cover_image=public_url(cover_key),
         release_date=release_date,
         creator_id=current_user.id,
         is_approved=is_approved
@@ -358,16 +346,15 @@ async def upload_album(
     
     # Subir y crear canciones
     uploaded_songs = []
+    new_songs = []
+    song_keys = []
     for idx, song_file in enumerate(songs):
         # Validar archivo de audio
         validate_file_type(song_file, ALLOWED_AUDIO_TYPES, f"Canción {idx + 1}")
         validate_file_size(song_file, MAX_AUDIO_SIZE, f"Canción {idx + 1}")
         
         # Guardar archivo de audio
-        song_extension = song_file.filename.split(".")[-1]
-        song_filename = f"{uuid.uuid4()}.{song_extension}"
-        song_path = SONGS_DIR / song_filename
-        song_relative_path = save_upload_file(song_file, song_path)
+        song_key, _ = await run_in_threadpool(save_upload_file, song_file, SONGS_PREFIX)
         
         # Obtener metadata de la canción con conversión segura de tipos
         title = song_titles[idx] if song_titles and idx < len(song_titles) else f"Track {idx + 1}"
@@ -379,33 +366,44 @@ async def upload_album(
         except (ValueError, TypeError):
             duration = 180
             
+        # Los géneros vacíos o "sin género" se normalizan a None en assign_facets
         genre = song_genres[idx] if song_genres and idx < len(song_genres) else None
         
-        # Evitar géneros vacíos
-        if genre and genre.strip().lower() in ['', 'sin género', 'none']:
-            genre = None
-        
         # Crear canción en la base de datos
         new_song = Song(
             title=title,
             artist=artist,
             duration=duration,
             genre=genre,
-            file_path=f"/uploads/{song_relative_path}",
-            cover_url=f"/uploads/{cover_relative_path}",  # Usar la misma portada del álbum
+            file_path=public_url(song_key),
+            cover_url=public_url(cover_key),  # Usar la misma portada del álbum
             album_id=new_album.id,
             creator_id=current_user.id,
             is_approved=is_approved
         )
+        assign_facets(db, new_song)
         
         db.add(new_song)
+        new_songs.append(new_song)
+        song_keys.append(song_key)
         uploaded_songs.append({
             "title": title,
             "artist": artist,
-            "file_path": f"/uploads/{song_relative_path}"
+            "file_path": public_url(song_key)
         })
     
+    if is_approved:
+        adjust_counts(db, new_songs, 1)
+    
+    # Portada y duraciones reales en segundo plano, en la misma transacción que las canciones
+    db.flush()
+    job_ids = [enqueue_cover_thumbnail(db, cover_key, current_user.id)]
+    for new_song, song_key in zip(new_songs, song_keys):
+        job_ids.append(enqueue_probe_audio(db, song_key, current_user.id, [new_song.id]))
     db.commit()
+    if is_approved:
+        suggest_index.add(ALBUM, new_album.id, new_album.title)
+        index_songs(new_songs)
     
     return {
         "message": "Álbum subido exitosamente",
@@ -416,5 +414,179 @@ async def upload_album(
             "release_date": str(new_album.release_date) if new_album.release_date else None
         },
         "songs": uploaded_songs,
-        "total_songs": len(uploaded_songs)
-    }
\ No newline at end of file
+        "total_songs": len(uploaded_songs),
+        "jobs": job_ids
+    }
+
+
+# Subidas directas al almacenamiento (ver storage.py): el cliente pide un
+# formulario firmado, envía el archivo sin pasar por la API y después avisa
+# a /upload/complete, que valida el objeto y lo registra
+DIRECT_UPLOAD_EXPIRES = timedelta(minutes=15)
+SNIFF_LENGTH = 16
+
+# tipo -> (prefijo, tipos MIME, tamaño máximo, familia esperada)
+DIRECT_UPLOAD_KINDS = {
+    "song": (SONGS_PREFIX, ALLOWED_AUDIO_TYPES, MAX_AUDIO_SIZE, "audio"),
+    "cover": (COVERS_SONGS_PREFIX, ALLOWED_IMAGE_TYPES, MAX_IMAGE_SIZE, "image"),
+    "album_cover": (COVERS_ALBUMS_PREFIX, ALLOWED_IMAGE_TYPES, MAX_IMAGE_SIZE, "image"),
+}
+
+
+def sniff_media_family(head: bytes) -> str:
+    """'audio' o 'image' según los primeros bytes del archivo; '' si no se reconoce"""
+    if head.startswith((b"ID3", b"OggS")) or (head[:4] == b"RIFF" and head[8:12] == b"WAVE"):
+        return "audio"
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:  # trama MPEG sin ID3
+        return "audio"
+    if head.startswith((b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff")) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP"):
+        return "image"
+    return ""
+
+
+def read_upload_token(token: str) -> dict:
+    claims = verify_upload_token(token)
+    if claims is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Token de subida inválido o expirado"
+        )
+    return claims
+
+
+@router.post("/presign")
+async def presign_upload(
+    upload_request: DirectUploadRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Prepara una subida directa al almacenamiento.
+    El cliente envía un POST multipart a upload.url con upload.fields más el
+    campo "file" y luego llama a /upload/complete con upload_token.
+    Solo accesible para creators y admins
+    """
+    if current_user.role not in ["creator", "admin"]:
+        raise HTTPException(
+            status_code=403,
+            detail="Solo creators y admins pueden subir archivos"
+        )
+    
+    prefix, allowed_types, max_size, _ = DIRECT_UPLOAD_KINDS[upload_request.kind]
+    if upload_request.content_type not in allowed_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El archivo debe ser uno de: {', '.join(allowed_types)}"
+        )
+    
+    # El cliente declara el sha256 y la clave se deriva de él; el almacenamiento lo verifica al subir
+    file_extension = upload_request.filename.split(".")[-1]
+    key = content_key(prefix, upload_request.sha256, file_extension)
+    upload_token = create_upload_token(
+        {
+            "key": key,
+            "kind": upload_request.kind,
+            "uid": current_user.id,
+            "ct": upload_request.content_type,
+            "sha": upload_request.sha256,
+        },
+        DIRECT_UPLOAD_EXPIRES
+    )
+    upload = await run_in_threadpool(
+        storage.presign_upload, key, upload_request.content_type, max_size, upload_request.sha256, upload_token
+    )
+    
+    return {
+        "key": key,
+        "path": public_url(key),
+        "upload": upload,
+        "upload_token": upload_token,
+        "expires_in": int(DIRECT_UPLOAD_EXPIRES.total_seconds())
+    }
+
+
+@router.post("/direct", status_code=204)
+async def direct_upload(
+    token: str = Form(...),
+    file: UploadFile = File(...)
+):
+    """
+    Destino de las subidas directas con el almacenamiento local (en S3 el
+    cliente sube al bucket). El token hace de firma, como en S3
+    """
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    claims = read_upload_token(token)
+    _, _, max_size, _ = DIRECT_UPLOAD_KINDS[claims["kind"]]
+    if file.content_type != claims["ct"]:
+        raise HTTPException(
+            status_code=400,
+            detail="El tipo del archivo no coincide con el declarado"
+        )
+    validate_file_size(file, max_size, "Archivo")
+    if await run_in_threadpool(file_sha256, file.file) != claims["sha"]:
+        raise HTTPException(
+            status_code=400,
+            detail="El sha256 del archivo no coincide con el declarado"
+        )
+    
+    try:
+        await run_in_threadpool(storage.save, claims["key"], file.file, file.content_type)
+    finally:
+        file.file.close()
+    return Response(status_code=204)
+
+
+@router.post("/complete")
+async def complete_upload(
+    completion: DirectUploadComplete,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Valida un archivo subido directamente (existe, tamaño y contenido del tipo
+    esperado) y encola su procesamiento. Si no es válido se borra.
+    Llamarlo otra vez con el mismo token devuelve el mismo trabajo
+    """
+    claims = read_upload_token(completion.upload_token)
+    if claims["uid"] != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="El token de subida pertenece a otro usuario"
+        )
+    
+    key, kind = claims["key"], claims["kind"]
+    _, _, max_size, family = DIRECT_UPLOAD_KINDS[kind]
+    stored = await run_in_threadpool(storage.head, key)
+    if stored is None:
+        raise HTTPException(
+            status_code=400,
+            detail="El archivo no se ha subido"
+        )
+    
+    if stored.size > max_size or stored.size == 0:
+        error = f"El archivo debe tener entre 1 byte y {max_size / (1024 * 1024)} MB"
+    elif stored.sha256 is not None and not stored.sha256.startswith(key_hash(key)):
+        # Solo si el almacenamiento no verificó el checksum al subir
+        error = "El sha256 del archivo no coincide con el declarado"
+    elif sniff_media_family(await run_in_threadpool(storage.read_prefix, key, SNIFF_LENGTH)) != family:
+        error = f"El contenido no es de tipo {family}"
+    else:
+        error = None
+    if error:
+        await run_in_threadpool(storage.delete, key)
+        raise HTTPException(status_code=400, detail=error)
+    
+    if kind == "song":
+        job_id = enqueue_probe_audio(db, key, current_user.id)
+    else:
+        job_id = enqueue_cover_thumbnail(db, key, current_user.id)
+    db.commit()
+    
+    return {
+        "message": "Archivo registrado exitosamente",
+        "filename": key.rsplit("/", 1)[-1],
+        "path": public_url(key),
+        "size": stored.size,
+        "job_id": job_id
+    }
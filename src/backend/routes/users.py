@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import delete, or_
 from sqlalchemy.orm import Session
 from typing import List
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
-from models import User, UserRole
+from models import Album, Playlist, Song, User, UserRole
 from schemas import UserResponse
 from dependencies import get_current_user, require_role
+from facets import adjust_counts, approved_song_facets
+from liked_cache import liked_songs_cache
+from search_index import ALBUM, suggest_index, unindex_songs
+from tasks import enqueue_delete_media
+import events
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -80,4 +83,51 @@ async def deactivate_user(
     user.is_active = False
     db.commit()
     
-    return {"message": "User deactivated successfully"}
\ No newline at end of file
+    return {"message": "User deactivated successfully"}
+
+@router.delete("/{user_id}")
+async def delete_user(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([UserRole.ADMIN]))
+):
+    """Elimina la cuenta con sus playlists, favoritos, álbumes y canciones"""
+    if user_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot delete your own account"
+        )
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    # Canciones que desaparecen: las suyas y las de sus álbumes
+    album_ids = db.query(Album.id).filter(Album.creator_id == user_id)
+    removed_songs = or_(Song.creator_id == user_id, Song.album_id.in_(album_ids))
+    adjust_counts(db, approved_song_facets(db, removed_songs), -1)
+    songs = db.query(Song.id, Song.is_approved, Song.file_path, Song.cover_url).filter(removed_songs).all()
+    albums = db.query(Album.id, Album.is_approved, Album.cover_image).filter(Album.creator_id == user_id).all()
+    playlists = db.query(Playlist.id, Playlist.cover_image).filter(Playlist.owner_id == user_id).all()
+    media = [user.profile_picture]
+    media += [url for song in songs for url in (song.file_path, song.cover_url)]
+    media += [album.cover_image for album in albums] + [playlist.cover_image for playlist in playlists]
+    
+    # Una sola sentencia: todo lo demás lo borra la base en cascada
+    db.execute(delete(User).where(User.id == user_id))
+    enqueue_delete_media(db, media, current_user.id)
+    db.commit()
+    
+    liked_songs_cache.invalidate(user_id)
+    events.liked_changed(user_id)
+    unindex_songs([song.id for song in songs])
+    for album in albums:
+        suggest_index.remove(ALBUM, album.id)
+    events.albums_removed([album.id for album in albums if album.is_approved])
+    events.songs_removed([song.id for song in songs if song.is_approved])
+    for playlist in playlists:
+        events.playlist_changed(playlist.id, "deleted")
+    
+    return {"message": "User deleted successfully"}
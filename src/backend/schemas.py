@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -72,6 +72,24 @@ class SongResponse(SongBase):
         from_attributes = True
 
 
+class SongWithLikeResponse(SongResponse):
+    is_liked: Optional[bool] = None  # solo con GET /songs?with_liked=true
+
+
+class FacetCount(BaseModel):
+    id: int
+    name: str
+    slug: str
+    song_count: int
+    
+    class Config:
+        from_attributes = True
+
+
+class LikedCheckResponse(BaseModel):
+    liked: List[int]
+
+
 class AlbumBase(BaseModel):
     title: str
     description: Optional[str] = None
@@ -82,12 +100,18 @@ class AlbumCreate(AlbumBase):
     pass
 
 
-class AlbumResponse(AlbumBase):
+class AlbumSummaryResponse(AlbumBase):
     id: int
     cover_image: Optional[str] = None
     creator_id: int
     is_approved: bool
     created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class AlbumResponse(AlbumSummaryResponse):
     songs: List[SongResponse] = []
     
     class Config:
@@ -114,8 +138,80 @@ class PlaylistResponse(PlaylistBase):
         from_attributes = True
 
 
+class PlaylistMove(BaseModel):
+    song_id: int
+    to_index: int = Field(ge=0)
+
+
+class PlaylistOrderUpdate(BaseModel):
+    moves: List[PlaylistMove] = Field(min_length=1)
+
+
 class PlaylistWithSongs(PlaylistResponse):
+    # Primera ventana de canciones; el resto se pagina con next_cursor
     songs: List[SongResponse] = []
+    total_songs: int = 0
+    next_cursor: Optional[int] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class PlaylistSongsPage(BaseModel):
+    items: List[SongResponse] = []
+    next_cursor: Optional[int] = None
+
+
+class SearchSuggestion(BaseModel):
+    type: str  # song, artist o album
+    id: int
+    label: str
+
+
+class DirectUploadRequest(BaseModel):
+    kind: str = Field(pattern="^(song|cover|album_cover)$")
+    filename: str
+    content_type: str
+    sha256: str = Field(pattern="^[0-9a-f]{64}$")  # del contenido, en hexadecimal
+
+
+class DirectUploadComplete(BaseModel):
+    upload_token: str
+
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str  # queued, running, succeeded o failed
+    payload: dict
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str] = None
+    result: Optional[Any] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class PendingSongsPage(BaseModel):
+    items: List[SongResponse] = []
+    next_cursor: Optional[int] = None
+
+
+class PendingAlbumsPage(BaseModel):
+    items: List[AlbumSummaryResponse] = []
+    next_cursor: Optional[int] = None
+
+
+class ModerationRequest(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=500)
+
+
+class ModerationResult(BaseModel):
+    """Ids que cambiaron; los que ya no estaban pendientes se ignoran"""
+    songs: List[int] = []
+    albums: List[int] = []
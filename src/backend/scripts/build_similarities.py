@@ -0,0 +1,41 @@
+"""
+Recalcula la tabla song_similarities (canciones similares).
+
+Pensado para correr periódicamente (cron o similar), por ejemplo un cálculo
+incremental cada hora y uno completo cada noche:
+    python scripts/build_similarities.py --incremental
+    python scripts/build_similarities.py --method pmi --top-k 50
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine
+from recommendations import build_similarities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula las canciones similares")
+    parser.add_argument("--incremental", action="store_true",
+                        help="solo canciones con interacciones nuevas desde el último cálculo y sus vecinas; "
+                             "no recoge favoritos ni canciones de playlists quitados (eso lo hace el cálculo completo)")
+    parser.add_argument("--top-k", type=int, help="vecinos por canción (SIMILAR_SONGS_TOP_K)")
+    parser.add_argument("--method", choices=["cosine", "pmi"], help="normalización (SIMILARITY_METHOD)")
+    parser.add_argument("--block-size", type=int, help="canciones por bloque (SIMILARITY_BLOCK_SIZE)")
+    args = parser.parse_args()
+
+    summary = build_similarities(
+        engine,
+        incremental=args.incremental,
+        top_k=args.top_k,
+        method=args.method,
+        block_size=args.block_size,
+    )
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
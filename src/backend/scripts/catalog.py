@@ -0,0 +1,64 @@
+"""
+Exporta o importa el catálogo completo en NDJSON (ver catalog_io.py).
+
+    python scripts/catalog.py export catalog.ndjson.gz
+    python scripts/catalog.py export - --tables songs,albums > songs.ndjson
+    python scripts/catalog.py import catalog.ndjson.gz
+
+Los archivos terminados en .gz se comprimen/descomprimen al vuelo. Tras una
+importación conviene recalcular las canciones similares y reiniciar la API
+(o esperar a que expiren sus cachés).
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_io import BATCH_SIZE, CATALOG_TABLES, export_lines, import_lines
+from database import engine
+
+
+def open_file(path: str, mode: str):
+    if path == "-":
+        return sys.stdin.buffer if "r" in mode else sys.stdout.buffer
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o importa el catálogo en NDJSON")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="archivo NDJSON (.gz opcional) o - para stdin/stdout")
+    parser.add_argument("--tables", help=f"solo estas tablas al exportar (por defecto {','.join(CATALOG_TABLES)})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="filas por lote al importar")
+    args = parser.parse_args()
+
+    if args.action == "export":
+        tables = args.tables.split(",") if args.tables else CATALOG_TABLES
+        unknown = set(tables) - set(CATALOG_TABLES)
+        if unknown:
+            parser.error(f"tablas desconocidas: {', '.join(sorted(unknown))}")
+        output = open_file(args.path, "wb")
+        try:
+            for chunk in export_lines(engine, tables):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        return
+
+    source = open_file(args.path, "rb")
+    try:
+        summary = import_lines(engine, source, batch_size=args.batch_size)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
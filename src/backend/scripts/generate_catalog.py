@@ -0,0 +1,59 @@
+"""
+Genera y carga un catálogo sintético determinista (ver synthetic_catalog.py).
+
+    python scripts/generate_catalog.py --songs 1000000
+    python scripts/generate_catalog.py --songs 50000 --users 20000 --media --audio-size 5000000
+
+Los usuarios generados entran con <email>/password (admin@example.com es
+admin). Si la base no está vacía los ids se desplazan, como en una
+importación. Después conviene recalcular las canciones similares.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from database import engine
+from synthetic_catalog import CatalogGenerator, create_media, load_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un catálogo sintético para pruebas de escala")
+    parser.add_argument("--songs", type=int, default=100_000)
+    parser.add_argument("--users", type=int, help="por defecto songs / 10")
+    parser.add_argument("--albums", type=int, help="por defecto songs / 10")
+    parser.add_argument("--playlists", type=int, help="por defecto users / 2")
+    parser.add_argument("--mean-likes", type=float, default=20, help="favoritos medios por usuario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--media", action="store_true", help="crear audio y portadas de relleno en uploads/")
+    parser.add_argument("--media-files", type=int, default=8, help="archivos distintos de cada tipo")
+    parser.add_argument("--audio-size", type=int, default=1024 * 1024, help="bytes por audio")
+    parser.add_argument("--cover-size", type=int, default=32 * 1024, help="bytes por portada")
+    parser.add_argument("--upload-dir", default=settings.UPLOAD_DIR)
+    args = parser.parse_args()
+
+    media_files = cover_files = None
+    if args.media:
+        media_files, cover_files = create_media(
+            Path(args.upload_dir), args.media_files, args.audio_size, args.cover_size, args.seed
+        )
+
+    generator = CatalogGenerator(
+        songs=args.songs,
+        users=args.users,
+        albums=args.albums,
+        playlists=args.playlists,
+        mean_likes=args.mean_likes,
+        seed=args.seed,
+        media_files=media_files,
+        cover_files=cover_files,
+    )
+    print(json.dumps(load_catalog(engine, generator)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Índice de prefijos en memoria para las sugerencias de búsqueda.
+
+Indexa títulos de canciones, artistas y títulos de álbumes normalizados con
+facets.fold_text (minúsculas, sin acentos). Cada documento aporta una clave
+por cada palabra desde la que puede empezar la búsqueda ("bohemian rhapsody"
+se encuentra con "boh" y con "rhap"). Las claves están ordenadas y la búsqueda
+de un prefijo es un rango con bisect; los resultados se ordenan
+por peso (play_count, o la suma de reproducciones para artistas y álbumes).
+
+El índice se construye al arrancar en un hilo aparte. Las escrituras del
+catálogo se aplican al momento como un pequeño delta (altas) y lápidas
+(bajas); cuando crecen demasiado se reconstruye en segundo plano. Los pesos
+(reproducciones) solo se actualizan al reconstruir.
+
+El índice es por proceso y el delta solo lo ve el worker que atendió la
+escritura. Para que los demás no sigan sugiriendo canciones borradas ni
+tarden en mostrar las aprobadas, cada SUGGEST_INDEX_REFRESH_SECONDS se
+compara una firma barata del catálogo (número y suma de ids de las canciones y
+álbumes aprobados, última modificación de álbumes) con la de la última
+construcción, y si cambió se reconstruye. Las reproducciones no cambian la
+firma: con tráfico no se reconstruye en cada intervalo.
+
+Memoria: unos 190 MB por millón de títulos (benchmarks/bench_search_index.py),
+casi todo en las cadenas de los títulos; la construcción necesita casi el triple.
+"""
+import asyncio
+import heapq
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from facets import fold_text, normalize_artist
+from models import Album, Artist, Song
+
+logger = logging.getLogger(__name__)
+
+SONG, ARTIST, ALBUM = 0, 1, 2
+KIND_NAMES = ("song", "artist", "album")
+
+MAX_KEYS_PER_DOC = 4  # Palabras iniciales que se indexan por documento
+MAX_SUGGESTIONS = 20
+REBUILD_THRESHOLD = 1000  # Cambios pendientes antes de reconstruir en segundo plano
+FETCH_SIZE = 10_000
+
+
+class Suggestion(NamedTuple):
+    kind: int
+    id: int
+    label: str
+    weight: int
+
+
+def _key_offsets(folded: str) -> List[int]:
+    """Posiciones donde empiezan las primeras MAX_KEYS_PER_DOC palabras"""
+    offsets = [0]
+    position = folded.find(" ")
+    while position != -1 and len(offsets) < MAX_KEYS_PER_DOC:
+        offsets.append(position + 1)
+        position = folded.find(" ", position + 1)
+    return offsets
+
+
+def document_keys(label: str) -> List[str]:
+    """Claves de un documento: el texto normalizado desde cada una de sus primeras palabras"""
+    folded = fold_text(label)
+    return [folded[offset:] for offset in _key_offsets(folded)] if folded else []
+
+
+class _Snapshot:
+    """
+    Índice inmutable; se reemplaza completo al reconstruir.
+
+    Las claves no se guardan como cadenas: cada una es (documento, desplazamiento)
+    dentro del título normalizado, ordenadas por el texto que representan. Sobre
+    ese orden un árbol de segmentos guarda la clave de mayor peso de cada
+    tramo, así el top-k de un rango de prefijo cuesta O(k log n) sin importar
+    cuántas claves empiecen igual.
+    """
+
+    def __init__(self, documents):
+        self.kinds = array("b")
+        self.ids = array("i")
+        self.weights = array("q")
+        self.labels: List[str] = []
+        self.folded: List[str] = []
+        for kind, doc_id, label, weight in documents:
+            folded = fold_text(label or "")
+            if not folded:
+                continue
+            self.kinds.append(kind)
+            self.ids.append(doc_id)
+            self.weights.append(weight or 0)
+            self.labels.append(label)
+            self.folded.append(folded)
+
+        pairs = [
+            (folded[offset:], doc, offset)
+            for doc, folded in enumerate(self.folded)
+            for offset in _key_offsets(folded)
+        ]
+        pairs.sort()
+        self.key_docs = array("i", (doc for _, doc, _ in pairs))
+        self.key_offsets = array("I", (offset for _, _, offset in pairs))
+        del pairs
+        self._build_tree()
+
+    def _build_tree(self) -> None:
+        """Árbol de segmentos (de abajo hacia arriba) con la clave de mayor peso por tramo"""
+        size = len(self.key_docs)
+        weights, docs = self.weights, self.key_docs
+        self.key_weights = array("q", (weights[doc] for doc in docs))
+        tree = array("i", [0]) * size + array("i", range(size))
+        key_weights = self.key_weights
+        for node in range(size - 1, 0, -1):
+            left, right = tree[2 * node], tree[2 * node + 1]
+            tree[node] = left if key_weights[left] >= key_weights[right] else right
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _key(self, position: int) -> str:
+        return self.folded[self.key_docs[position]][self.key_offsets[position]:]
+
+    def _argmax(self, lo: int, hi: int) -> int:
+        """Clave de mayor peso en [lo, hi), o -1 si el tramo está vacío"""
+        tree, key_weights, size = self.tree, self.key_weights, len(self.key_docs)
+        best, best_weight = -1, -1
+        lo += size
+        hi += size
+        while lo < hi:
+            if lo & 1:
+                candidate = tree[lo]
+                if key_weights[candidate] > best_weight:
+                    best, best_weight = candidate, key_weights[candidate]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                candidate = tree[hi]
+                if key_weights[candidate] > best_weight:
+                    best, best_weight = candidate, key_weights[candidate]
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def candidates(self, prefix: str):
+        """Documentos con alguna clave que empieza por `prefix`, de mayor a menor peso"""
+        size = len(self.key_docs)
+        start = bisect_left(range(size), prefix, key=self._key)
+        end = bisect_left(range(size), prefix + "\uffff", start, key=self._key)
+        # Se extrae el máximo del rango y se parte en dos, con un heap de tramos
+        heap = []
+        best = self._argmax(start, end)
+        if best != -1:
+            heap.append((-self.key_weights[best], best, start, end))
+        while heap:
+            _, position, lo, hi = heapq.heappop(heap)
+            yield self.key_docs[position]
+            for lo, hi in ((lo, position), (position + 1, hi)):
+                best = self._argmax(lo, hi)
+                if best != -1:
+                    heapq.heappush(heap, (-self.key_weights[best], best, lo, hi))
+
+    def suggestion(self, doc: int) -> Suggestion:
+        return Suggestion(self.kinds[doc], self.ids[doc], self.labels[doc], self.weights[doc])
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._snapshot = _Snapshot([])
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._added: List[tuple] = []  # (secuencia, Suggestion, claves)
+        self._hidden = {}  # (kind, id) del snapshot que ya no se muestran -> secuencia
+        self._engine: Optional[Engine] = None
+        self._building = False
+        self._signature: Optional[tuple] = None  # firma del catálogo de la última construcción
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.ready = False
+
+    def _load_documents(self, engine: Engine):
+        """Proyección compacta del catálogo aprobado: (kind, id, etiqueta, peso)"""
+        statements = (
+            (SONG, select(Song.id, Song.title, Song.play_count).where(Song.is_approved == True)),
+            (ARTIST, select(Artist.id, Artist.name, func.coalesce(func.sum(Song.play_count), 0))
+                .join(Song, Song.artist_id == Artist.id)
+                .where(Song.is_approved == True)
+                .group_by(Artist.id, Artist.name)),
+            (ALBUM, select(Album.id, Album.title, func.coalesce(func.sum(Song.play_count), 0))
+                .outerjoin(Song, Song.album_id == Album.id)
+                .where(Album.is_approved == True)
+                .group_by(Album.id, Album.title)),
+        )
+        with engine.connect() as conn:
+            for kind, statement in statements:
+                result = conn.execution_options(stream_results=True).execute(statement)
+                for rows in result.partitions(FETCH_SIZE):
+                    for doc_id, label, weight in rows:
+                        yield kind, doc_id, label, weight
+
+    @staticmethod
+    def catalog_signature(engine: Engine) -> tuple:
+        """Cambia cuando se aprueba, borra o edita algo del catálogo indexado (no con las reproducciones)"""
+        with engine.connect() as conn:
+            songs = conn.execute(
+                select(func.count(), func.coalesce(func.sum(Song.id), 0)).where(Song.is_approved == True)
+            ).one()
+            albums = conn.execute(
+                select(func.count(), func.coalesce(func.sum(Album.id), 0), func.max(Album.updated_at))
+                .where(Album.is_approved == True)
+            ).one()
+        return (*songs, *albums)
+
+    def build(self, engine: Engine) -> None:
+        """Reconstruye el índice desde la base de datos y lo activa"""
+        with self._lock:
+            self._engine = engine
+            marker = self._sequence
+        # Antes de leer: lo que cambie durante la construcción se ve en la siguiente comprobación
+        signature = self.catalog_signature(engine)
+        snapshot = _Snapshot(self._load_documents(engine))
+        with self._lock:
+            self._snapshot = snapshot
+            self._signature = signature
+            # Las escrituras hechas durante la construcción se conservan
+            self._added = [entry for entry in self._added if entry[0] > marker]
+            self._hidden = {key: seq for key, seq in self._hidden.items() if seq > marker}
+            self.ready = True
+        logger.info("Suggest index built with %d documents", len(snapshot))
+
+    def _build_in_background(self, engine: Engine) -> None:
+        try:
+            self.build(engine)
+        except Exception:
+            logger.exception("Suggest index build failed")
+        finally:
+            self._building = False
+
+    def start_background_build(self, engine: Optional[Engine] = None) -> None:
+        with self._lock:
+            engine = engine or self._engine
+            if self._building or engine is None:
+                return
+            self._engine = engine
+            self._building = True
+        threading.Thread(
+            target=self._build_in_background, args=(engine,), name="suggest-index", daemon=True
+        ).start()
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            engine = self._engine
+            if engine is None or self._building or not self.ready:
+                continue  # la construcción inicial (o su reintento desde /ready) aún no terminó
+            try:
+                signature = await run_in_threadpool(self.catalog_signature, engine)
+            except Exception:
+                logger.exception("Could not check the catalog for suggest index changes")
+                continue
+            if signature != self._signature:
+                self.start_background_build()
+
+    def start_refresh(self, interval: float) -> None:
+        """Reconstruye cada `interval` segundos si el catálogo cambió en cualquier worker (0 = nunca)"""
+        if interval > 0 and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop(interval))
+
+    def stop_refresh(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    def _maybe_rebuild(self) -> None:
+        if len(self._added) + len(self._hidden) > REBUILD_THRESHOLD:
+            self.start_background_build()
+
+    def add(self, kind: int, doc_id: int, label: Optional[str], weight: int = 0, replace: bool = False) -> None:
+        """
+        Agrega un documento hasta la próxima reconstrucción. Si ya está en el
+        índice se conserva esa versión, salvo con `replace` (p. ej. un cambio
+        de título)
+        """
+        self.add_many([(kind, doc_id, label, weight)], replace)
+
+    def add_many(self, documents: Iterable[tuple], replace: bool = False) -> None:
+        """Agrega varios documentos (kind, id, etiqueta, peso) copiando las listas una sola vez"""
+        entries = [
+            (Suggestion(kind, doc_id, label, weight or 0), document_keys(label))
+            for kind, doc_id, label, weight in documents if label
+        ]
+        if not entries:
+            return
+        with self._lock:
+            self._sequence += 1
+            if replace:
+                keys = {(item.kind, item.id) for item, _ in entries}
+                self._hidden = {**self._hidden, **dict.fromkeys(keys, self._sequence)}
+                self._added = [entry for entry in self._added if (entry[1].kind, entry[1].id) not in keys]
+            self._added = self._added + [(self._sequence, item, keys) for item, keys in entries]
+        self._maybe_rebuild()
+
+    def remove(self, kind: int, doc_id: int) -> None:
+        self.remove_many([(kind, doc_id)])
+
+    def remove_many(self, keys: Iterable[tuple]) -> None:
+        """Oculta varios documentos (kind, id) copiando las listas una sola vez"""
+        keys = set(keys)
+        if not keys:
+            return
+        with self._lock:
+            self._sequence += 1
+            self._hidden = {**self._hidden, **dict.fromkeys(keys, self._sequence)}
+            self._added = [entry for entry in self._added if (entry[1].kind, entry[1].id) not in keys]
+        self._maybe_rebuild()
+
+    def suggest(self, query: str, limit: int = 10) -> List[Suggestion]:
+        prefix = fold_text(query)
+        if not prefix:
+            return []
+        if query[-1].isspace():
+            prefix += " "  # Palabra ya completa: "la " no sugiere "lamento"
+        # Las listas se reemplazan, nunca se modifican: basta con leer las referencias
+        with self._lock:
+            snapshot, added, hidden = self._snapshot, self._added, self._hidden
+
+        results, seen = [], set()
+        for doc in snapshot.candidates(prefix):
+            item = snapshot.suggestion(doc)
+            key = (item.kind, item.id)
+            if key not in seen and key not in hidden:
+                seen.add(key)
+                results.append(item)
+            if len(results) == limit:
+                break
+
+        for _, item, keys in added:
+            key = (item.kind, item.id)
+            if key not in seen and any(k.startswith(prefix) for k in keys):
+                seen.add(key)
+                results.append(item)
+
+        results.sort(key=lambda item: item.weight, reverse=True)
+        return results[:limit]
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "ready": self.ready,
+            "documents": len(snapshot),
+            "keys": len(snapshot.key_docs),
+            "pending_added": len(self._added),
+            "pending_hidden": len(self._hidden),
+        }
+
+
+suggest_index = SuggestIndex()
+
+
+def index_songs(songs: Iterable) -> None:
+    """Agrega canciones aprobadas recién guardadas (y su artista si es nuevo)"""
+    documents = []
+    for song in songs:
+        documents.append((SONG, song.id, song.title, song.play_count))
+        if song.artist_id is not None:
+            documents.append((ARTIST, song.artist_id, normalize_artist(song.artist), 0))
+    suggest_index.add_many(documents)
+
+
+def unindex_songs(song_ids: Iterable[int]) -> None:
+    suggest_index.remove_many((SONG, song_id) for song_id in song_ids)
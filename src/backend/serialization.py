@@ -0,0 +1,115 @@
+"""
+Ruta rápida de serialización para listados grandes.
+
+Los endpoints de listado seleccionan solo las columnas que necesita el schema
+de respuesta (tuplas, sin hidratar objetos ORM), construyen los diccionarios
+directamente y los codifican con orjson cuando está disponible. La salida es
+byte a byte la misma que produce FastAPI validando con el schema
+(`response_model`) y codificando con `JSONResponse`.
+"""
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Iterable, List, Sequence, Type, get_args
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from models import Song
+from schemas import SongResponse
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional, sin él se usa json de la stdlib
+    orjson = None
+
+
+def format_datetime(value: datetime) -> str:
+    """Formatea un datetime igual que Pydantic en modo JSON (UTC como 'Z')"""
+    text = value.isoformat()
+    if value.tzinfo is not None and text.endswith("+00:00"):
+        return text[:-6] + "Z"
+    return text
+
+
+def _format_enum(value: Enum) -> Any:
+    return value.value
+
+
+def _converter_for(annotation: Any) -> Callable[[Any], Any] | None:
+    """Devuelve la conversión que necesita un campo del schema, si la hay"""
+    candidates = get_args(annotation) or (annotation,)
+    for candidate in candidates:
+        if candidate is datetime:
+            return format_datetime
+        if isinstance(candidate, type) and issubclass(candidate, Enum):
+            return _format_enum
+    return None
+
+
+def schema_columns(schema: Type[BaseModel], model: Any) -> tuple:
+    """Columnas del modelo en el mismo orden que los campos del schema"""
+    return tuple(getattr(model, field) for field in schema.model_fields)
+
+
+def row_serializer(schema: Type[BaseModel]) -> Callable[[Sequence[Any]], dict]:
+    """
+    Crea una función que convierte una fila (tupla de columnas en el orden de
+    `schema_columns`) en el diccionario que produciría el schema en modo JSON
+    """
+    fields = tuple(schema.model_fields)
+    conversions = [
+        (index, converter)
+        for index, (name, info) in enumerate(schema.model_fields.items())
+        if (converter := _converter_for(info.annotation)) is not None
+    ]
+
+    def serialize(row: Sequence[Any]) -> dict:
+        item = dict(zip(fields, row))
+        for index, converter in conversions:
+            value = row[index]
+            if value is not None:
+                item[fields[index]] = converter(value)
+        return item
+
+    return serialize
+
+
+def dumps(content: Any) -> bytes:
+    """Codifica igual que JSONResponse de Starlette (compacto, UTF-8 sin escapar)"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def loads(content: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class FastJSONResponse(Response):
+    """Respuesta JSON para contenido ya serializable (sin jsonable_encoder)"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+SONG_RESPONSE_COLUMNS = schema_columns(SongResponse, Song)
+serialize_song_row = row_serializer(SongResponse)
+
+
+def song_rows_to_dicts(rows: Iterable[Sequence[Any]]) -> List[dict]:
+    return [serialize_song_row(row) for row in rows]
+
+
+def song_list_response(rows: Iterable[Sequence[Any]]) -> FastJSONResponse:
+    """Respuesta para una lista de filas seleccionadas con SONG_RESPONSE_COLUMNS"""
+    return FastJSONResponse(song_rows_to_dicts(rows))
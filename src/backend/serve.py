@@ -0,0 +1,150 @@
+"""
+Servidor de producción con varios workers.
+
+Uso (desde src/backend, con el esquema ya migrado):
+    python serve.py
+    WEB_WORKERS=4 python serve.py
+
+Con gunicorn instalado (Linux/macOS) levanta un master de gunicorn con
+workers de uvicorn:
+- WEB_WORKERS procesos (0 = uno por CPU),
+- la app se importa en el master antes de hacer fork (WEB_PRELOAD) y los
+  workers comparten esas páginas de memoria. Es seguro porque importar main
+  no abre conexiones ni lanza hilos (el índice y el monitor del bucle
+  arrancan en el lifespan de cada worker); aun así, después del fork cada
+  worker descarta el pool heredado,
+- cada worker se recicla tras WEB_MAX_REQUESTS peticiones (más un jitter
+  aleatorio para que no se reinicien todos a la vez), lo que acota el
+  crecimiento de memoria,
+- uvloop y httptools si están instalados (uvicorn[standard]),
+- keep-alive y backlog de la configuración,
+- en cuanto el servidor decide salir se ejecuta `lifecycle.stopping()`, que
+  cierra los streams de eventos abiertos; si no, ocuparían todo el plazo de
+  apagado (ver lifecycle.py).
+
+Sin gunicorn (Windows) se usa el modo multiproceso de uvicorn, que no
+precarga la app ni recicla workers, y los streams de eventos se cortan al
+vencer timeout_graceful_shutdown. Para desarrollo sigue `python main.py`,
+con recarga automática.
+"""
+import logging
+import multiprocessing
+import sys
+from importlib.util import find_spec
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+LOOP = "uvloop" if find_spec("uvloop") else "asyncio"
+HTTP = "httptools" if find_spec("httptools") else "h11"
+
+try:
+    from gunicorn.arbiter import Arbiter
+    from uvicorn.server import Server
+    from uvicorn.workers import UvicornWorker
+except ImportError:  # gunicorn no está instalado
+    UvicornWorker = None
+
+# Segundos que se reservan dentro de graceful_timeout para el shutdown del lifespan
+SHUTDOWN_MARGIN = 5
+
+if UvicornWorker is not None:
+    class StoppingServer(Server):
+        """Server que avisa a la app (lifecycle.stopping) en cuanto deja de aceptar conexiones"""
+
+        async def on_tick(self, counter: int) -> bool:
+            should_exit = await super().on_tick(counter)
+            if should_exit:
+                from lifecycle import lifecycle
+                lifecycle.stopping()
+            return should_exit
+
+    class ProductionWorker(UvicornWorker):
+        CONFIG_KWARGS = {"loop": LOOP, "http": HTTP, "lifespan": "on"}
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # Sin esto uvicorn espera indefinidamente a las peticiones en curso y gunicorn
+            # lo mata con SIGKILL al vencer graceful_timeout, sin pasar por el lifespan
+            self.config.timeout_graceful_shutdown = max(1, self.cfg.graceful_timeout - SHUTDOWN_MARGIN)
+
+        async def _serve(self) -> None:
+            # Igual que UvicornWorker._serve, con StoppingServer
+            self.config.app = self.wsgi
+            server = StoppingServer(config=self.config)
+            self._install_sigquit_handler()
+            await server.serve(sockets=self.sockets)
+            if not server.started:
+                sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+
+def worker_count() -> int:
+    return settings.WEB_WORKERS or multiprocessing.cpu_count()
+
+
+def post_fork(server, worker) -> None:
+    # Conexiones abiertas por el master (no debería haber) no se comparten entre procesos
+    from database import engine
+    engine.dispose(close=False)
+
+
+def gunicorn_options(workers: int) -> dict:
+    return {
+        "bind": f"{settings.BACKEND_HOST}:{settings.BACKEND_PORT}",
+        "workers": workers,
+        "worker_class": "serve.ProductionWorker",
+        "preload_app": settings.WEB_PRELOAD,
+        "keepalive": settings.WEB_KEEPALIVE,
+        "backlog": settings.WEB_BACKLOG,
+        "max_requests": settings.WEB_MAX_REQUESTS,
+        "max_requests_jitter": settings.WEB_MAX_REQUESTS_JITTER,
+        "timeout": settings.WEB_TIMEOUT,
+        "graceful_timeout": settings.WEB_GRACEFUL_TIMEOUT,
+        "post_fork": post_fork,
+    }
+
+
+def run_gunicorn(workers: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options(workers).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    Application().run()
+
+
+def run_uvicorn(workers: int) -> None:
+    import uvicorn
+
+    if settings.WEB_MAX_REQUESTS:
+        logger.warning("gunicorn is not installed: workers will not be recycled")
+    uvicorn.run(
+        "main:app",
+        host=settings.BACKEND_HOST,
+        port=settings.BACKEND_PORT,
+        workers=workers,
+        loop=LOOP,
+        http=HTTP,
+        backlog=settings.WEB_BACKLOG,
+        timeout_keep_alive=settings.WEB_KEEPALIVE,
+        timeout_graceful_shutdown=max(1, settings.WEB_GRACEFUL_TIMEOUT - SHUTDOWN_MARGIN),
+    )
+
+
+def main():
+    workers = worker_count()
+    if UvicornWorker is not None:
+        run_gunicorn(workers)
+    else:
+        run_uvicorn(workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Perfilador de SQL por petición (opcional, SQL_PROFILER_ENABLED).
+
+Con eventos del engine cuenta, para cada petición HTTP, las consultas, el
+tiempo total en la base de datos y cuántas veces se ejecutó cada huella
+(fingerprint): la sentencia con los literales y marcadores de parámetros
+reemplazados por "?" y las listas "IN (?, ?, ...)" y los VALUES de varias filas
+colapsados, así "WHERE songs.album_id = 3" y "= 7" cuentan como la misma
+consulta.
+
+Al terminar la petición:
+- si alguna huella se repitió más de SQL_PROFILER_REPEAT_THRESHOLD veces se
+  registra una advertencia de posible N+1 con la ruta y la huella,
+- con SQL_SERVER_TIMING la respuesta lleva la cabecera Server-Timing
+  (db;dur=...;desc="N queries" y app;dur=... hasta las cabeceras), que las
+  herramientas de desarrollo del navegador muestran junto a la petición.
+
+Las consultas que tardan más de SQL_SLOW_QUERY_MS se registran siempre (también
+fuera de peticiones) con la huella y la forma de los parámetros (nombres y
+tipos, nunca los valores).
+
+Desactivado no se registra ningún evento ni middleware, así que no cuesta nada.
+"""
+import logging
+import re
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAMS = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\?")
+_ROWS = re.compile(r"(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+")
+_LISTS = re.compile(r"\(\?(?:, \?)+\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Sentencia normalizada: mismos valores de forma distinta dan la misma huella"""
+    normalized = _SPACES.sub(" ", statement).strip()
+    normalized = _STRINGS.sub("?", normalized)
+    normalized = _NUMBERS.sub("?", normalized)
+    normalized = _PARAMS.sub("?", normalized)
+    normalized = _ROWS.sub(r"\1, ...", normalized)
+    return _LISTS.sub("(?, ...)", normalized)
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """Nombres y tipos de los parámetros, sin valores"""
+    if executemany:
+        if not parameters:
+            return "[]"
+        return f"{len(parameters)} x {parameter_shape(parameters[0], False)}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+class RequestProfile:
+    __slots__ = ("queries", "seconds", "fingerprints")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.fingerprints: Dict[str, int] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        key = fingerprint(statement)
+        self.queries += 1
+        self.seconds += seconds
+        self.fingerprints[key] = self.fingerprints.get(key, 0) + 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        return {key: count for key, count in self.fingerprints.items() if count > threshold}
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+
+def install(engine: Engine, slow_query_ms: float) -> None:
+    """Registra los eventos del perfilador en el engine"""
+    slow_seconds = slow_query_ms / 1000 if slow_query_ms > 0 else None
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["profiler_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("profiler_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(statement, elapsed)
+        if slow_seconds is not None and elapsed >= slow_seconds:
+            logger.warning(
+                "Slow query (%.1f ms): %s params=%s",
+                elapsed * 1000, fingerprint(statement), parameter_shape(parameters, executemany),
+            )
+
+
+class SQLProfilerMiddleware:
+    def __init__(self, app, repeat_threshold: int, server_timing: bool):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if self.server_timing and message["type"] == "http.response.start":
+                app_ms = (time.perf_counter() - started) * 1000
+                value = (
+                    f'db;dur={profile.seconds * 1000:.2f};desc="{profile.queries} queries", '
+                    f"app;dur={app_ms:.2f}"
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else scope["path"]
+            for key, count in profile.repeated(self.repeat_threshold).items():
+                logger.warning(
+                    "Possible N+1 in %s %s: %d executions of %s", scope["method"], path, count, key
+                )
+            logger.debug(
+                "%s %s: %d queries, %.1f ms in the database",
+                scope["method"], path, profile.queries, profile.seconds * 1000,
+            )
@@ -0,0 +1,79 @@
+"""
+Respuestas en streaming para listados completos (herramientas de admin).
+
+La consulta se recorre con un cursor del lado del servidor (yield_per) en una
+conexión propia, y cada lote de filas se serializa y se envía en cuanto llega,
+así la memoria no depende del tamaño del resultado. La conexión no puede ser
+la sesión de la petición: FastAPI cierra las dependencias antes de enviar el
+cuerpo.
+
+El generador síncrono avanza en el threadpool, un lote a la vez. Si el
+cliente se desconecta, Starlette cancela el envío y el `finally` de
+iterate_closing cierra el generador, lo que cierra el cursor y devuelve la
+conexión al pool en ese momento, sin esperar al recolector de basura.
+"""
+from typing import AsyncIterator, Callable, Iterator, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from serialization import dumps
+
+STREAM_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+async def iterate_closing(iterator: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Recorre un generador síncrono en el threadpool y lo cierra siempre al terminar"""
+    try:
+        while True:
+            chunk = await run_in_threadpool(next, iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # run_in_threadpool no se interrumpe a medias: aquí ningún hilo usa el generador
+        iterator.close()
+
+
+def query_chunks(
+    engine: Engine,
+    statement,
+    serialize: Callable[[Sequence], dict],
+    json_array: bool = False,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """Un trozo de bytes por lote: líneas NDJSON o fragmentos de un arreglo JSON"""
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(statement)
+        if json_array:
+            yield b"["
+        separator = b""
+        for rows in result.partitions():
+            if json_array:
+                yield separator + b",".join(dumps(serialize(row)) for row in rows)
+                separator = b","
+            else:
+                yield b"".join(dumps(serialize(row)) + b"\n" for row in rows)
+        if json_array:
+            yield b"]"
+
+
+def streaming_response(chunks: Iterator[bytes], format: str = "ndjson", **kwargs) -> StreamingResponse:
+    return StreamingResponse(iterate_closing(chunks), media_type=MEDIA_TYPES[format], **kwargs)
+
+
+def stream_query(
+    engine: Engine,
+    statement,
+    serialize: Callable[[Sequence], dict],
+    format: str = "ndjson",
+) -> StreamingResponse:
+    """Respuesta NDJSON (o arreglo JSON con format="json") con las filas de la consulta"""
+    chunks = query_chunks(engine, statement, serialize, json_array=format == "json")
+    return streaming_response(chunks, format)
@@ -0,0 +1,281 @@
+"""
+Generador determinista de catálogos sintéticos para pruebas de escala.
+
+Con la misma semilla produce siempre los mismos datos:
+- Usuarios: admin@example.com (id 1), ~1% creators y el resto usuarios, todos
+  con la contraseña PASSWORD (un solo hash bcrypt compartido).
+- Canciones con play_count tipo Zipf: la canción de rango r de popularidad
+  tiene ~MAX_PLAYS / r^ZIPF_EXPONENT reproducciones (el rango se baraja con
+  los ids). Agrupadas en álbumes por creator, con ~10% de sencillos sin álbum
+  y ~2% pendientes de aprobación.
+- Playlists de tamaño con cola larga (Pareto: muchas cortas, pocas enormes)
+  y favoritos por usuario también de cola larga. Ambos eligen canciones según
+  su popularidad, como los usuarios reales.
+- Géneros y artistas normalizados con sus facetas.
+
+Las filas se generan en streaming y se cargan con catalog_io.CatalogImporter
+(COPY en PostgreSQL, executemany en lotes con Core en otros motores), así que
+la memoria no crece con el número de filas salvo por las tablas de pesos de
+popularidad (unos bytes por canción).
+
+Opcionalmente crea archivos de audio y portada de relleno de tamaño
+configurable en uploads/. Son unos pocos archivos compartidos por todas las
+canciones, para probar el streaming sin llenar el disco.
+"""
+import bisect
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+
+from auth import get_password_hash
+from catalog_io import CatalogImporter
+from facets import facet_slug
+from playlist_order import POSITION_GAP
+
+PASSWORD = "password"
+ZIPF_EXPONENT = 1.0
+MAX_PLAYS = 5_000_000
+SONGS_PER_ALBUM = 10
+PLAYLIST_SIZE_ALPHA = 1.2  # Pareto: cuanto menor, más larga la cola
+MAX_PLAYLIST_SIZE = 5_000
+EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+SPAN_SECONDS = 3 * 365 * 24 * 3600
+
+GENRES = [
+    "Rock", "Pop", "Hip Hop", "Jazz", "Blues", "Electrónica", "Reggaetón", "Salsa", "Cumbia",
+    "Bachata", "Metal", "Punk", "Indie", "Folk", "Country", "Clásica", "R&B", "Soul", "Funk",
+    "Techno", "House", "Trap", "Bolero", "Ranchera", "Tango", "Flamenco", "K-Pop", "Ska",
+    "Reggae", "Lo-Fi",
+]
+WORDS = [
+    "amor", "noche", "luz", "mar", "corazón", "fuego", "sol", "luna", "cielo", "tiempo", "sueño",
+    "camino", "ciudad", "lluvia", "viento", "canción", "baile", "azul", "rojo", "silencio",
+    "love", "night", "fire", "dream", "heart", "city", "rain", "dance", "blue", "gold", "wild",
+    "ghost", "river", "summer", "echo", "neon", "paradise", "midnight", "forever", "shadow",
+]
+
+Table = Tuple[str, List[str], Iterator[list]]
+
+
+class CatalogGenerator:
+    def __init__(
+        self,
+        songs: int,
+        users: Optional[int] = None,
+        albums: Optional[int] = None,
+        playlists: Optional[int] = None,
+        mean_likes: float = 20,
+        seed: int = 42,
+        media_files: Optional[List[str]] = None,
+        cover_files: Optional[List[str]] = None,
+    ):
+        self.songs = songs
+        self.users = users or max(songs // 10, 10)
+        self.albums = albums if albums is not None else max(songs // SONGS_PER_ALBUM, 1)
+        self.playlists = playlists if playlists is not None else self.users // 2
+        self.mean_likes = mean_likes
+        self.seed = seed
+        self.artists = max(songs // 15, 1)
+        self.creators = list(range(2, self.users + 1, 100)) or [1]
+        self.media_files = media_files or ["/uploads/songs/placeholder.mp3"]
+        self.cover_files = cover_files or []
+
+    def _rng(self, table: str) -> random.Random:
+        # Una secuencia por tabla: cambiar el tamaño de una no altera las demás
+        return random.Random(f"{self.seed}:{table}")
+
+    def _timestamp(self, rng: random.Random) -> datetime:
+        return EPOCH + timedelta(seconds=rng.randrange(SPAN_SECONDS))
+
+    def _title(self, rng: random.Random) -> str:
+        return " ".join(rng.choices(WORDS, k=rng.randint(1, 4))).capitalize()
+
+    def _popularity(self) -> Tuple[List[int], List[float]]:
+        """Rango de popularidad de cada canción (1 = la más escuchada) y pesos acumulados por id"""
+        ranks = list(range(1, self.songs + 1))
+        self._rng("popularity").shuffle(ranks)
+        cumulative = list(itertools.accumulate(rank ** -ZIPF_EXPONENT for rank in ranks))
+        return ranks, cumulative
+
+    def _pick_songs(self, rng: random.Random, cumulative: List[float], count: int) -> List[int]:
+        """
+        `count` canciones distintas elegidas según su popularidad. Si se repiten
+        demasiado (listas grandes frente al catálogo) se completa al azar
+        """
+        count = min(count, self.songs // 2 or 1)
+        total = cumulative[-1]
+        picked = set()
+        draws = 0
+        while len(picked) < count:
+            if draws < 4 * count:
+                picked.add(bisect.bisect(cumulative, rng.random() * total) + 1)
+            else:
+                picked.add(rng.randint(1, self.songs))
+            draws += 1
+        return list(picked)
+
+    # ------------------------------------------------------------- tablas
+
+    def users_table(self) -> Table:
+        columns = ["id", "email", "username", "hashed_password", "role", "is_active", "created_at"]
+        hashed = get_password_hash(PASSWORD)
+        creators = set(self.creators)
+
+        def rows():
+            rng = self._rng("users")
+            yield [1, "admin@example.com", "admin", hashed, "ADMIN", True, EPOCH]
+            for user_id in range(2, self.users + 1):
+                role = "CREATOR" if user_id in creators else "USER"
+                yield [user_id, f"user{user_id}@example.com", f"user{user_id}", hashed, role, True,
+                       self._timestamp(rng)]
+        return "users", columns, rows()
+
+    def genres_table(self) -> Table:
+        rows = ([i, name, facet_slug(name), 0] for i, name in enumerate(GENRES, 1))
+        return "genres", ["id", "name", "slug", "song_count"], rows
+
+    def _artist_name(self, artist_id: int) -> str:
+        rng = random.Random(f"{self.seed}:artist:{artist_id}")
+        return f"{self._title(rng)} {artist_id}"
+
+    def artists_table(self) -> Table:
+        def rows():
+            for artist_id in range(1, self.artists + 1):
+                name = self._artist_name(artist_id)
+                yield [artist_id, name, facet_slug(name), 0]
+        return "artists", ["id", "name", "slug", "song_count"], rows()
+
+    def _album_creator(self, album_id: int) -> int:
+        return self.creators[album_id % len(self.creators)]
+
+    def albums_table(self) -> Table:
+        columns = ["id", "title", "cover_image", "release_date", "creator_id", "is_approved", "created_at"]
+
+        def rows():
+            rng = self._rng("albums")
+            for album_id in range(1, self.albums + 1):
+                created = self._timestamp(rng)
+                cover = self.cover_files[album_id % len(self.cover_files)] if self.cover_files else None
+                yield [album_id, self._title(rng), cover, created, self._album_creator(album_id),
+                       rng.random() > 0.02, created]
+        return "albums", columns, rows()
+
+    def songs_table(self, ranks: List[int]) -> Table:
+        columns = ["id", "title", "artist", "duration", "file_path", "cover_url", "genre", "genre_id",
+                   "artist_id", "album_id", "creator_id", "is_approved", "play_count", "created_at"]
+
+        def rows():
+            rng = self._rng("songs")
+            for song_id in range(1, self.songs + 1):
+                # ~90% en álbumes consecutivos, el resto sencillos
+                album_id = None
+                if self.albums and rng.random() < 0.9:
+                    album_id = min((song_id - 1) // SONGS_PER_ALBUM + 1, self.albums)
+                creator_id = self._album_creator(album_id) if album_id else rng.choice(self.creators)
+                artist_id = rng.randint(1, self.artists)
+                genre_id = rng.randint(1, len(GENRES))
+                cover = self.cover_files[song_id % len(self.cover_files)] if self.cover_files else None
+                yield [
+                    song_id, self._title(rng), self._artist_name(artist_id), rng.randint(90, 420),
+                    self.media_files[song_id % len(self.media_files)], cover, GENRES[genre_id - 1],
+                    genre_id, artist_id, album_id, creator_id, rng.random() > 0.02,
+                    int(MAX_PLAYS / ranks[song_id - 1] ** ZIPF_EXPONENT), self._timestamp(rng),
+                ]
+        return "songs", columns, rows()
+
+    def playlists_table(self) -> Table:
+        columns = ["id", "name", "is_public", "owner_id", "created_at"]
+
+        def rows():
+            rng = self._rng("playlists")
+            for playlist_id in range(1, self.playlists + 1):
+                yield [playlist_id, self._title(rng), rng.random() < 0.7, rng.randint(1, self.users),
+                       self._timestamp(rng)]
+        return "playlists", columns, rows()
+
+    def playlist_songs_table(self, cumulative: List[float]) -> Table:
+        columns = ["id", "playlist_id", "song_id", "position", "added_at"]
+
+        def rows():
+            rng = self._rng("playlist_songs")
+            row_id = itertools.count(1)
+            for playlist_id in range(1, self.playlists + 1):
+                size = min(int(rng.paretovariate(PLAYLIST_SIZE_ALPHA) * 5), MAX_PLAYLIST_SIZE)
+                added = self._timestamp(rng)
+                for index, song_id in enumerate(self._pick_songs(rng, cumulative, size)):
+                    yield [next(row_id), playlist_id, song_id, (index + 1) * POSITION_GAP, added]
+        return "playlist_songs", columns, rows()
+
+    def liked_songs_table(self, cumulative: List[float]) -> Table:
+        columns = ["id", "user_id", "song_id", "liked_at"]
+        # Pareto con media mean_likes: media = alpha / (alpha - 1) * escala
+        alpha = 1.5
+        scale = self.mean_likes * (alpha - 1) / alpha
+
+        def rows():
+            rng = self._rng("liked_songs")
+            row_id = itertools.count(1)
+            for user_id in range(1, self.users + 1):
+                count = int(rng.paretovariate(alpha) * scale)
+                liked = self._timestamp(rng)
+                for song_id in sorted(self._pick_songs(rng, cumulative, count)):
+                    yield [next(row_id), user_id, song_id, liked]
+        return "liked_songs", columns, rows()
+
+    def tables(self) -> Iterator[Table]:
+        """Tablas en orden de dependencias, cada una con sus filas en streaming"""
+        ranks, cumulative = self._popularity()
+        yield self.users_table()
+        yield self.genres_table()
+        yield self.artists_table()
+        yield self.albums_table()
+        yield self.songs_table(ranks)
+        yield self.playlists_table()
+        yield self.playlist_songs_table(cumulative)
+        yield self.liked_songs_table(cumulative)
+
+
+def create_media(upload_dir: Path, files: int, audio_bytes: int, cover_bytes: int, seed: int) -> tuple:
+    """Crea archivos de relleno y devuelve sus URLs (/uploads/...) de audio y portada"""
+    rng = random.Random(f"{seed}:media")
+    songs_dir, covers_dir = upload_dir / "songs", upload_dir / "covers" / "songs"
+    songs_dir.mkdir(parents=True, exist_ok=True)
+    covers_dir.mkdir(parents=True, exist_ok=True)
+    audio, covers = [], []
+    for index in range(files):
+        for directory, size, extension, urls in (
+            (songs_dir, audio_bytes, "mp3", audio),
+            (covers_dir, cover_bytes, "png", covers),
+        ):
+            path = directory / f"placeholder-{index}.{extension}"
+            if not path.exists() or path.stat().st_size != size:
+                with open(path, "wb") as output:
+                    output.write(rng.randbytes(size))
+            urls.append(f"/uploads/{path.relative_to(upload_dir).as_posix()}")
+    return audio, covers
+
+
+def load_catalog(engine: Engine, generator: CatalogGenerator) -> dict:
+    """Genera y carga el catálogo en una transacción; devuelve filas por tabla y tiempos"""
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        importer = CatalogImporter(conn)
+        for name, columns, rows in generator.tables():
+            importer.start_table(name, columns)
+            for row in rows:
+                importer.add_row(row)
+        importer.finish()
+
+    seconds = time.perf_counter() - started
+    rows = sum(importer.summary.values())
+    return {
+        "tables": importer.summary,
+        "rows": rows,
+        "seconds": round(seconds, 1),
+        "rows_per_sec": round(rows / seconds) if seconds else rows,
+    }
@@ -0,0 +1,187 @@
+"""
+Trabajos que se encolan después de una subida (ver jobs.py); los ejecuta worker.py.
+
+- probe_audio: tamaño, sha256 y duración del audio. Si el payload trae
+  song_ids (POST /songs y /upload/album), corrige la duración de esas
+  canciones (la del formulario es opcional y por defecto 180 s). La duración se lee con la librería estándar
+  para WAV y con mutagen, si está instalado, para el resto.
+- cover_thumbnail: tamaño, sha256 y dimensiones de una portada, y una
+  miniatura WebP en <directorio>/thumbs/, también con nombre por contenido
+  (requiere Pillow).
+- delete_media: borra del almacenamiento los archivos de filas ya eliminadas
+  (canciones, álbumes, usuarios). Como las claves son por contenido y dos
+  filas pueden compartir archivo, solo borra los que ya no referencia ninguna
+  fila. Un archivo escrito (o vuelto a subir) hace menos de
+  MEDIA_DELETE_GRACE_SECONDS puede ser de una subida cuya fila aún no existe
+  (el cliente sube y después crea la canción): esos se dejan para un trabajo
+  posterior, que vuelve a comprobarlo.
+
+El payload lleva la clave del archivo en el almacenamiento (ver storage.py);
+con S3 el worker lo descarga a un temporal. Los handlers se pueden ejecutar
+más de una vez con el mismo payload.
+"""
+import hashlib
+import tempfile
+import time
+import wave
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Session
+
+from config import settings
+from jobs import PermanentError, enqueue, task
+from models import Album, Playlist, Song, User
+from storage import key_from_url, public_url, storage
+
+PROBE_AUDIO = "probe_audio"
+COVER_THUMBNAIL = "cover_thumbnail"
+DELETE_MEDIA = "delete_media"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+THUMBNAIL_SIZE = (300, 300)
+THUMBNAILS_DIR = "thumbs"
+
+# Columnas que guardan URLs de archivos subidos
+MEDIA_COLUMNS = (Song.file_path, Song.cover_url, Album.cover_image, Playlist.cover_image, User.profile_picture)
+
+
+def enqueue_probe_audio(db: Session, key: str, owner_id: int, song_ids: Optional[List[int]] = None) -> int:
+    payload = {"path": key, "song_ids": song_ids or []}
+    # El mismo archivo (mismo contenido) puede llegar otra vez para canciones nuevas
+    idempotency_key = f"{PROBE_AUDIO}:{key}:{','.join(map(str, song_ids or []))}"
+    return enqueue(db, PROBE_AUDIO, payload, idempotency_key=idempotency_key, owner_id=owner_id)
+
+
+def enqueue_cover_thumbnail(db: Session, key: str, owner_id: int) -> int:
+    payload = {"path": key}
+    return enqueue(db, COVER_THUMBNAIL, payload, idempotency_key=f"{COVER_THUMBNAIL}:{key}", owner_id=owner_id)
+
+
+def enqueue_delete_media(
+    db: Session, urls: Iterable[Optional[str]], owner_id: Optional[int] = None, delay: float = 0
+) -> Optional[int]:
+    """Encola el borrado de los archivos de las URLs dadas (None o externas se ignoran); None si no hay ninguno"""
+    keys = sorted({key for key in map(key_from_url, urls) if key})
+    if not keys:
+        return None
+    return enqueue(db, DELETE_MEDIA, {"keys": keys}, owner_id=owner_id, delay=delay)
+
+
+def referenced_urls(db: Session, urls: List[str]) -> Set[str]:
+    """Las URLs que todavía aparecen en alguna fila"""
+    statement = union_all(*(select(column).where(column.in_(urls)) for column in MEDIA_COLUMNS))
+    return set(db.execute(statement).scalars())
+
+
+@contextmanager
+def uploaded_file(key: str) -> Iterator[Path]:
+    """Ruta local del archivo subido; falla sin reintentar si ya no existe"""
+    try:
+        with storage.local_copy(key) as path:
+            yield path
+    except FileNotFoundError:
+        raise PermanentError(f"Upload not found: {key}")
+
+
+def file_digest(path: Path) -> Tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    with path.open("rb") as source:
+        while chunk := source.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def audio_duration(path: Path) -> Optional[int]:
+    """Duración en segundos redondeada, o None si no se puede leer"""
+    if path.suffix.lower() == ".wav":
+        try:
+            with wave.open(str(path), "rb") as audio:
+                return round(audio.getnframes() / audio.getframerate())
+        except (wave.Error, EOFError, ZeroDivisionError):
+            return None
+    try:
+        import mutagen
+    except ImportError:
+        return None
+    try:
+        audio = mutagen.File(str(path))
+    except mutagen.MutagenError:
+        return None
+    if audio is None or not getattr(audio.info, "length", None):
+        return None
+    return round(audio.info.length)
+
+
+@task(PROBE_AUDIO)
+def probe_audio(db: Session, payload: dict) -> dict:
+    with uploaded_file(payload["path"]) as path:
+        size, sha256 = file_digest(path)
+        duration = audio_duration(path)
+
+    updated = 0
+    if duration and payload.get("song_ids"):
+        updated = db.query(Song).filter(
+            Song.id.in_(payload["song_ids"]),
+            Song.duration != duration
+        ).update({Song.duration: duration}, synchronize_session=False)
+    return {"size": size, "sha256": sha256, "duration": duration, "songs_updated": updated}
+
+
+@task(COVER_THUMBNAIL)
+def cover_thumbnail(db: Session, payload: dict) -> dict:
+    try:
+        from PIL import Image, UnidentifiedImageError
+    except ImportError:
+        raise PermanentError("Pillow is not installed")
+
+    thumbnails_prefix = str(PurePosixPath(payload["path"]).parent / THUMBNAILS_DIR)
+    with uploaded_file(payload["path"]) as path, tempfile.TemporaryFile() as thumbnail:
+        size, sha256 = file_digest(path)
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+                image.thumbnail(THUMBNAIL_SIZE)
+                image.convert("RGB").save(thumbnail, "WEBP")
+        except UnidentifiedImageError:
+            raise PermanentError(f"Not an image: {payload['path']}")
+        thumbnail.seek(0)
+        thumbnail_key, _ = storage.save_hashed(thumbnails_prefix, thumbnail, "webp", "image/webp")
+
+    return {
+        "size": size,
+        "sha256": sha256,
+        "width": width,
+        "height": height,
+        "thumbnail": public_url(thumbnail_key),
+    }
+
+
+@task(DELETE_MEDIA)
+def delete_media(db: Session, payload: dict) -> dict:
+    urls = [public_url(key) for key in payload["keys"]]
+    in_use = referenced_urls(db, urls)
+    recent = time.time() - settings.MEDIA_DELETE_GRACE_SECONDS
+    deleted = kept = missing = 0
+    postponed = []
+    for url in urls:
+        if url in in_use:
+            kept += 1
+            continue
+        key = key_from_url(url)
+        stored = storage.head(key)
+        if stored is None:
+            missing += 1
+        elif stored.modified is not None and stored.modified > recent:
+            postponed.append(url)
+        elif storage.delete(key):
+            deleted += 1
+        else:
+            missing += 1
+    # Se confirma junto con este trabajo
+    enqueue_delete_media(db, postponed, delay=settings.MEDIA_DELETE_GRACE_SECONDS)
+    return {"deleted": deleted, "kept": kept, "missing": missing, "postponed": len(postponed)}
@@ -0,0 +1,203 @@
+"""
+Worker de la cola de trabajos en segundo plano (ver jobs.py y tasks.py).
+
+Uso (desde src/backend, con el esquema ya migrado):
+    python worker.py
+    python worker.py --kinds probe_audio,cover_thumbnail
+    python worker.py --once        # vacía la cola y termina
+
+Es un proceso aparte de la API: toma un trabajo, lo ejecuta y vuelve a
+consultar; si no hay trabajo espera JOB_POLL_INTERVAL. Para más paralelismo se
+levantan más procesos (sobre PostgreSQL; con SQLite, uno). Con SIGTERM o
+SIGINT termina el trabajo en curso y sale. Cada STALE_CHECK_INTERVAL devuelve
+a la cola los trabajos abandonados por workers que murieron.
+
+Con WORKER_METRICS_PORT sirve en ese puerto /metrics con la espera en cola
+(desde que el trabajo pudo ejecutarse hasta que lo tomó un worker), la
+duración y el resultado de los trabajos de este proceso. La profundidad de la
+cola la publica la API en su propio /metrics.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+
+import tasks  # noqa: F401  registra los handlers
+from config import settings
+from database import SessionLocal, engine
+from jobs import FAILED, QUEUED, PermanentError, as_utc, claim, complete, fail, get_handler, requeue_stale
+from metrics import CONTENT_TYPE, Histogram
+
+logger = logging.getLogger("worker")
+
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+RUN_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STALE_CHECK_INTERVAL = 60
+
+# Resultado de un trabajo para las métricas
+OUTCOMES = {QUEUED: "retried", FAILED: "failed"}
+
+
+class WorkerMetrics:
+    """Métricas del worker; se escriben en el hilo principal y se leen en el del servidor HTTP"""
+
+    def __init__(self):
+        self.wait: Dict[str, Histogram] = {}
+        self.run: Dict[str, Histogram] = {}
+        self.outcomes: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind: str, wait: float, run: float, outcome: str) -> None:
+        with self._lock:
+            if kind not in self.wait:
+                self.wait[kind] = Histogram(WAIT_BUCKETS)
+                self.run[kind] = Histogram(RUN_BUCKETS)
+            self.wait[kind].observe(wait)
+            self.run[kind].observe(run)
+            self.outcomes[(kind, outcome)] = self.outcomes.get((kind, outcome), 0) + 1
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            lines.append("# HELP jobs_processed_total Jobs finished by this worker, by kind and outcome.")
+            lines.append("# TYPE jobs_processed_total counter")
+            for (kind, outcome), count in sorted(self.outcomes.items()):
+                lines.append(f'jobs_processed_total{{kind="{kind}",outcome="{outcome}"}} {count}')
+            lines.append("# HELP job_wait_seconds Time from when a job became runnable until a worker took it.")
+            lines.append("# TYPE job_wait_seconds histogram")
+            for kind, histogram in sorted(self.wait.items()):
+                histogram.render("job_wait_seconds", f'kind="{kind}"', lines)
+            lines.append("# HELP job_run_seconds Time spent running a job.")
+            lines.append("# TYPE job_run_seconds histogram")
+            for kind, histogram in sorted(self.run.items()):
+                histogram.render("job_run_seconds", f'kind="{kind}"', lines)
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(registry: WorkerMetrics, port: int) -> ThreadingHTTPServer:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", f"{CONTENT_TYPE}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="worker-metrics", daemon=True).start()
+    return server
+
+
+class Worker:
+    def __init__(
+        self,
+        kinds: Optional[List[str]] = None,
+        poll_interval: float = settings.JOB_POLL_INTERVAL,
+        lease_seconds: float = settings.JOB_LEASE_SECONDS,
+        registry: Optional[WorkerMetrics] = None,
+    ):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.kinds = kinds
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.metrics = registry or WorkerMetrics()
+        self._stop = threading.Event()
+        self._last_stale_check = 0.0
+
+    def stop(self, *args) -> None:
+        self._stop.set()
+
+    def run_job(self, db, job) -> str:
+        """Ejecuta un trabajo ya reclamado; devuelve el resultado para las métricas"""
+        kind = job.kind
+        wait = (as_utc(job.started_at) - as_utc(job.run_at)).total_seconds()
+        started = time.perf_counter()
+        handler = get_handler(kind)
+        if handler is None:
+            outcome = OUTCOMES[fail(db, job, f"No handler for job kind {kind!r}", retry=False)]
+        else:
+            try:
+                result = handler(db, job.payload)
+                outcome = "succeeded" if complete(db, job, result) else "lost"
+            except PermanentError as exc:
+                db.rollback()
+                outcome = OUTCOMES[fail(db, job, str(exc), retry=False)]
+            except Exception:
+                db.rollback()
+                logger.exception("Job %s (%s) failed", job.id, kind)
+                outcome = OUTCOMES[fail(db, job, traceback.format_exc())]
+        self.metrics.observe(kind, max(0.0, wait), time.perf_counter() - started, outcome)
+        logger.info("Job %s (%s) %s", job.id, kind, outcome)
+        return outcome
+
+    def run_once(self) -> bool:
+        """Toma y ejecuta un trabajo; False si no había ninguno listo"""
+        db = SessionLocal()
+        try:
+            if time.monotonic() - self._last_stale_check >= STALE_CHECK_INTERVAL:
+                self._last_stale_check = time.monotonic()
+                requeued = requeue_stale(db, self.lease_seconds)
+                if requeued:
+                    logger.warning("Requeued %d abandoned jobs", requeued)
+            job = claim(db, self.worker_id, self.kinds)
+            if job is None:
+                return False
+            self.run_job(db, job)
+            return True
+        finally:
+            db.close()
+
+    def run(self, once: bool = False) -> None:
+        logger.info("Worker %s started", self.worker_id)
+        while not self._stop.is_set():
+            try:
+                ran = self.run_once()
+            except OperationalError:
+                # La base no responde o (SQLite) está bloqueada por otro proceso
+                logger.exception("Database error, retrying in %ss", self.poll_interval)
+                ran = False
+            if not ran:
+                if once:
+                    break
+                self._stop.wait(self.poll_interval)
+        logger.info("Worker %s stopped", self.worker_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuta los trabajos en segundo plano")
+    parser.add_argument("--kinds", help="tipos de trabajo separados por comas; por defecto todos")
+    parser.add_argument("--once", action="store_true", help="termina cuando no quedan trabajos listos")
+    parser.add_argument("--poll-interval", type=float, default=settings.JOB_POLL_INTERVAL,
+                        help="segundos de espera cuando la cola está vacía (JOB_POLL_INTERVAL)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    kinds = [kind.strip() for kind in args.kinds.split(",")] if args.kinds else None
+    worker = Worker(kinds=kinds, poll_interval=args.poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    if settings.WORKER_METRICS_PORT:
+        serve_metrics(worker.metrics, settings.WORKER_METRICS_PORT)
+    try:
+        worker.run(once=args.once)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()